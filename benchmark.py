@@ -0,0 +1,300 @@
+"""Headless benchmarks for the simulation: `python benchmark.py [memory|ticks|herd|paths|pathfinders|repair|lod|worldgen|worlds|digest|all]`."""
+import argparse
+import gc
+import logging
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Dict
+
+from config import *
+from simulation import World
+from pathfinding import PATHFINDERS, SharedGrid, BLOCKED, OPEN, ROAD
+from objects import Agent, Resource, Deer, Wolf, Shelter, Farm, ConstructionSite
+from worldgen import WorldgenCache
+from worlds import SharedTerrain, make_worlds, step_all
+from digest import StateDigest, REFERENCE
+from utils import Inventory, Point, AgentRole, AgentState, Gender, ResourceType, StructureType, TerrainType
+
+def _bytes_per_instance(factory, count: int) -> float:
+    gc.collect(); tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = [factory(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop(); del keep
+    return (after - before) / count
+
+_UNSLOTTED: Dict[type, type] = {} # Slotted class -> a plain class of the same name, so instances share dict keys as before
+
+def _unslotted(obj):
+    """Copies obj's slot values into an instance of a plain class, as the pre-__slots__ classes stored them: every
+    attribute in the instance __dict__ and inventories as a defaultdict(int) of their non-zero counts."""
+    cls = type(obj); legacy_cls = _UNSLOTTED.get(cls)
+    if legacy_cls is None: legacy_cls = _UNSLOTTED[cls] = type(cls.__name__, (), {})
+    legacy = legacy_cls()
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            value = getattr(obj, name, None)
+            setattr(legacy, name, defaultdict(int, value.items()) if isinstance(value, Inventory) else value)
+    return legacy
+
+def bench_memory(count: int = 20000):
+    """Reports the traced heap bytes per instance of each entity type, including its own Point, next to the same
+    instances rebuilt in the unslotted layout as a baseline."""
+    pos = lambda i: Point(i % 1000, i // 1000)
+    factories = {
+        "Point": pos,
+        "Resource": lambda i: Resource(pos(i), ResourceType.WOOD),
+        "Deer": lambda i: Deer(pos(i)),
+        "Wolf": lambda i: Wolf(pos(i)),
+        "Agent": lambda i: Agent(pos(i), i, AgentRole.BUILDER, Gender.MALE),
+        "Shelter": lambda i: Shelter(pos(i)),
+        "Farm": lambda i: Farm(pos(i)),
+        "ConstructionSite": lambda i: ConstructionSite(pos(i), StructureType.SHELTER),
+    }
+    print(f"{'entity':<18}{'bytes/entity':>14}{'unslotted':>12}")
+    for name, factory in factories.items():
+        slotted = _bytes_per_instance(factory, count); unslotted = _bytes_per_instance(lambda i: _unslotted(factory(i)), count)
+        print(f"{name:<18}{slotted:>14.1f}{unslotted:>12.1f}")
+
+def bench_ticks(ticks: int = 1000, seed: int = 1, width: int = WORLD_WIDTH, height: int = WORLD_HEIGHT):
+    """Runs a headless world and reports time and the heap churn (peak bytes allocated above the tick's baseline) per tick."""
+    random.seed(seed); world = World(width, height); world.initialize_world()
+    gc.collect(); tracemalloc.start(); churn = 0; start = time.perf_counter()
+    for _ in range(ticks):
+        tracemalloc.reset_peak(); base = tracemalloc.get_traced_memory()[0]
+        world.update()
+        churn += tracemalloc.get_traced_memory()[1] - base
+    elapsed = time.perf_counter() - start; current = tracemalloc.get_traced_memory()[0]; tracemalloc.stop()
+    print(f"ticks: {ticks}  objects: {len(world.get_all_objects())}  agents: {len(world.get_all_agents())}")
+    print(f"ms/tick (traced): {elapsed / ticks * 1000:.3f}")
+    print(f"allocation churn per tick: {churn / ticks:.0f} bytes")
+    print(f"retained heap after run: {current} bytes")
+
+def bench_herd(animals: int = 20000, ticks: int = 100, seed: int = 1, width: int = 400, height: int = 300):
+    """Compares per-object Deer/Wolf updates with the event-scheduled HerdEngine on a large, animal-heavy map.
+    Only the animals are stepped, but the clock advances as in World.update so cooldowns and timers run out."""
+    from herd import HERD_TYPES
+    for engine in (False, True):
+        random.seed(seed); world = World(width, height, herd_engine=engine); world.initialize_world()
+        center = Point(width // 2, height // 2)
+        for i in range(animals):
+            pos = world.find_empty_spot_near(center, max(width, height) // 2)
+            if pos: world.add_object(Wolf(pos) if i % 50 == 0 else Deer(pos))
+        start = time.perf_counter()
+        for _ in range(ticks):
+            world.step_count += 1
+            if world.herd is not None: world.herd.step(world)
+            else:
+                for obj in world.get_all_objects():
+                    if isinstance(obj, HERD_TYPES): obj.update(world)
+        elapsed = time.perf_counter() - start
+        print(f"{'herd engine' if engine else 'per-object':<12} animals: {animals}  ms/tick: {elapsed / ticks * 1000:.2f}")
+
+def bench_paths(agents: int = 100, ticks: int = 30, seed: int = 1, width: int = 240, height: int = 160):
+    """Sends every agent on a cross-map trip to one site at once and reports tick latency, inline vs async."""
+    for engine in (False, True):
+        random.seed(seed); world = World(width, height, async_pathfinding=engine); world.initialize_world()
+        site = ConstructionSite(world.find_empty_spot_near(Point(width - 10, height // 2), 8, for_building=True), StructureType.WELL)
+        world.add_object(site); crowd = []
+        for i in range(agents):
+            pos = world.find_empty_spot_near(Point(10, height // 2), 20)
+            if pos: crowd.append(Agent(pos, 1000 + i, AgentRole.BUILDER, Gender.MALE, start_age=ADULT_AGE_THRESHOLD)); world.add_object(crowd[-1])
+        times = []
+        for tick in range(ticks):
+            start = time.perf_counter()
+            if tick == 0:
+                for agent in crowd: agent._set_target_object(world, site)
+            world.update(); times.append(time.perf_counter() - start)
+        moving = sum(1 for agent in crowd if agent.path)
+        print(f"{'async' if engine else 'inline':<8} agents: {len(crowd)}  first tick ms: {times[0] * 1000:.1f}  "
+              f"max ms/tick: {max(times) * 1000:.1f}  mean ms/tick: {sum(times) / ticks * 1000:.1f}  agents with paths: {moving}")
+        world.close()
+
+def bench_pathfinders(maps: int = 6, queries: int = 60, seed: int = 1, width: int = 120, height: int = 90):
+    """Latency and nodes expanded for every PATHFINDERS backend answering the same queries on random
+    obstacle-and-road maps and on a generated world (tests/test_pathfinding.py checks their answers)."""
+    rng = random.Random(seed); cases = []
+    for m in range(maps):
+        density = 0.15 + 0.05 * m
+        cells = [BLOCKED if rng.random() < density else (ROAD if rng.random() < 0.1 else OPEN) for _ in range(width * height)]
+        for _ in range(8): # Some walls with gaps, so searches have to go around
+            x0 = rng.randrange(width); y0 = rng.randrange(height); horizontal = rng.random() < 0.5
+            for i in range(rng.randint(10, 60)):
+                x, y = (x0 + i, y0) if horizontal else (x0, y0 + i)
+                if x < width and y < height and i % 17: cells[y * width + x] = BLOCKED
+        cases.append(SharedGrid(cells, width, height))
+    random.seed(seed); world = World(width, height); world.initialize_world()
+    cases.append(SharedGrid([SharedGrid.cell(world, x, y) for y in range(height) for x in range(width)], width, height))
+    tiles = [(x, y) for y in range(height) for x in range(width)]
+    queries_per = [[(rng.choice(tiles), rng.choice(tiles)) for _ in range(queries)] for _ in cases]
+    for name, backend in PATHFINDERS.items():
+        pathfinder = backend(); expanded = 0; elapsed = 0.0; found = 0
+        for grid, pairs in zip(cases, queries_per):
+            for start, goal in pairs:
+                if not grid.open(*start): continue
+                t = time.perf_counter(); path = pathfinder.find_path(grid, start, goal); elapsed += time.perf_counter() - t
+                expanded += pathfinder.expanded; found += path is not None
+        total = sum(1 for grid, pairs in zip(cases, queries_per) for start, _ in pairs if grid.open(*start))
+        print(f"{name:<14} queries: {total}  found: {found}  mean expanded: {expanded / total:8.1f}  mean ms: {elapsed / total * 1000:6.3f}")
+
+def _route_problem(world: World, agent: Agent) -> str:
+    """'invalid' if a walking agent's remaining route is not an 8-connected chain from where it stands, 'stale' if it
+    crosses a blocked tile (other than a target object's), else ''."""
+    x, y = agent.x, agent.y
+    for p in agent.path:
+        if max(abs(p.x - x), abs(p.y - y)) != 1: return "invalid"
+        x, y = p.x, p.y
+    return "stale" if any(not world.is_passable(p, ignore_agents=True) for p in agent.path[:-1 if agent.target_object else None]) else ""
+
+def bench_repair(agents: int = 60, block_rate: float = 0.05, ticks: int = 400, seed: int = 1, width: int = 200, height: int = 140):
+    """Sends agents across the map while structures keep landing on tiles of their remaining routes (block_rate per
+    walking agent per tick), and compares repairing routes in place (PathRepair) with dropping them and planning
+    again from scratch. Agents are stepped directly so only route following is timed. Every route is checked after
+    every tick: replanning leaves stale routes through new structures until the agent walks into them, repair
+    should leave none."""
+    for engine in (False, True):
+        random.seed(seed); world = World(width, height, path_repair=engine); world.initialize_world(); rng = random.Random(seed)
+        site = ConstructionSite(world.find_empty_spot_near(Point(width - 12, height // 2), 8, for_building=True), StructureType.WELL)
+        world.add_object(site); crowd = []
+        for i in range(agents):
+            pos = world.find_empty_spot_near(Point(12, height // 2), 25)
+            if pos: crowd.append(Agent(pos, 1000 + i, AgentRole.BUILDER, Gender.MALE, start_age=ADULT_AGE_THRESHOLD)); world.add_object(crowd[-1])
+        for agent in crowd: agent._set_target_object(world, site)
+        elapsed = 0.0; blocked = replans = expanded = arrived = 0; problems = Counter()
+        for tick in range(ticks):
+            for agent in [a for a in crowd if len(a.path) > 2 and rng.random() < block_rate]: # A new structure lands on the route ahead
+                if len(agent.path) <= 2: continue # Already cut short by an earlier structure this tick
+                tile = agent.path[rng.randrange(1, len(agent.path) - 1)]
+                if world.is_passable(tile) and tile.distance_to(site.pos) > 6: # Never wall in the site itself
+                    start = time.perf_counter(); world.add_object(Shelter(tile)); elapsed += time.perf_counter() - start; blocked += 1
+            start = time.perf_counter()
+            for agent in crowd:
+                if agent.state != AgentState.MOVING: continue
+                if agent._execute_move(world): continue
+                agent.reset_task(); agent.state = AgentState.IDLE
+                if max(abs(agent.x - site.x), abs(agent.y - site.y)) <= 1: arrived += 1; continue
+                agent._set_target_object(world, site); replans += 1; expanded += world.pathfinder.expanded
+            elapsed += time.perf_counter() - start
+            problems.update(_route_problem(world, agent) for agent in crowd if agent.state == AgentState.MOVING)
+            if not any(a.state == AgentState.MOVING for a in crowd): break
+        repair = world.path_repair
+        if repair is not None: expanded += repair.expanded
+        print(f"{'repair' if engine else 'replan':<7} agents: {len(crowd)}  blocked routes: {blocked}  arrived: {arrived}  ticks: {tick + 1}  "
+              f"full replans: {replans}  local repairs: {repair.repairs if repair else 0} (failed {repair.failures if repair else 0})  "
+              f"nodes expanded per blocking: {expanded / max(1, blocked):.1f}  ms: {elapsed * 1000:.1f}  "
+              f"stale route-ticks: {problems['stale']}  invalid route-ticks: {problems['invalid']}")
+
+def _lod_outcome(world: World) -> dict:
+    return {"agents": len(world.get_all_agents()), "structures": len(world.get_all_structures()), "deer": world.count_objects(Deer),
+            "stock": sum(world.global_inventory.values()), "roads": sum(row.count(TerrainType.ROAD) for row in world.terrain)}
+
+def bench_lod(seeds: int = 8, ticks: int = 2000, agents: int = 60, width: int = 160, height: int = 120):
+    """Runs the same seeds with full-detail and level-of-detail stepping and compares tick cost and aggregate
+    outcomes. Colonies are chaotic, so each outcome is reported as mean and standard error over the seeds."""
+    results = {}
+    for engine in (False, True):
+        elapsed = 0.0; outcomes = []
+        for seed in range(1, seeds + 1):
+            random.seed(seed); world = World(width, height, lod=engine); world.initialize_world()
+            center = Point(width // 2, height // 2)
+            for i in range(agents):
+                pos = world.find_empty_spot_near(center, 30)
+                if pos: world.spawn_agent(Gender.MALE if i % 2 else Gender.FEMALE, random.choice(list(AgentRole)), pos, start_age=ADULT_AGE_THRESHOLD)
+            for _ in range(MAX_ANIMALS): world.spawn_animal()
+            start = time.perf_counter()
+            for _ in range(ticks): world.update()
+            elapsed += time.perf_counter() - start; outcomes.append(_lod_outcome(world))
+        stats = {}
+        for key in outcomes[0]:
+            values = [o[key] for o in outcomes]; mean = sum(values) / seeds
+            stats[key] = (mean, (sum((v - mean) ** 2 for v in values) / max(1, seeds - 1) / seeds) ** 0.5)
+        results[engine] = stats
+        print(f"{'lod' if engine else 'full':<6} ms/tick: {elapsed / (seeds * ticks) * 1000:.3f}  "
+              + "  ".join(f"{key}: {mean:.1f}±{err:.1f}" for key, (mean, err) in stats.items()))
+    drift = {key: (results[True][key][0] - mean) / ((err ** 2 + results[True][key][1] ** 2) ** 0.5 or 1) for key, (mean, err) in results[False].items()}
+    print("outcome drift in standard errors (|z| < 2 is statistically matched): " + "  ".join(f"{key}: {z:+.1f}" for key, z in drift.items()))
+    for engine in (False, True): # A distant, mostly routine region: thousands of wandering deer and no viewport
+        random.seed(1); world = World(300, 200, lod=engine); world.initialize_world()
+        for _ in range(5000):
+            pos = world.find_empty_spot_near(Point(150, 100), 150)
+            if pos: world.add_object(Deer(pos))
+        start = time.perf_counter()
+        for _ in range(200): world.update()
+        print(f"{'lod' if engine else 'full':<6} 5000 wandering deer, ms/tick: {(time.perf_counter() - start) / 200 * 1000:.2f}")
+
+def _layout(world: World) -> tuple:
+    objects = sorted((type(o).__name__, o.x, o.y, getattr(o, 'agent_id', -1)) for o in world.get_all_objects())
+    return (world.terrain, world.water_distance_map, world.placement.near_water, objects, list(world.global_inventory.counts), world.next_agent_id, world.rng.getstate())
+
+def bench_worldgen(seeds: int = 3, sizes=((60, 45), (200, 150), (400, 300))):
+    """Times cold generation against worldgen cache hits, and checks that a hit matches a fresh world, random streams included."""
+    directory = tempfile.mkdtemp(); cache = WorldgenCache(directory)
+    try:
+        for width, height in sizes:
+            timings = {"fresh": 0.0, "miss": 0.0, "hit": 0.0}; mismatches = 0
+            for seed in range(1, seeds + 1):
+                for mode in timings:
+                    world = World(width, height); start = time.perf_counter()
+                    if mode == "fresh": world.rng.seed(seed); world.initialize_world()
+                    else: cache.initialize(world, seed)
+                    timings[mode] += time.perf_counter() - start
+                    if mode == "fresh": expected = _layout(world)
+                    elif _layout(world) != expected: mismatches += 1
+            print(f"{width}x{height}: " + "  ".join(f"{mode} {t / seeds * 1000:.1f} ms" for mode, t in timings.items())
+                  + f"  speedup {timings['fresh'] / timings['hit']:.0f}x  mismatches: {mismatches}")
+    finally: shutil.rmtree(directory)
+
+def bench_worlds(count: int = 50, ticks: int = 100, width: int = 200, height: int = 150):
+    """Traced heap per colony for worlds that each own a copy of one map against worlds sharing it through
+    SharedTerrain, and the per-world tick cost of the interleaving step_all driver."""
+    for shared in (False, True):
+        gc.collect(); tracemalloc.start(); before = tracemalloc.get_traced_memory()[0]
+        terrain = SharedTerrain.generate(width, height, seed=0) # Without sharing, every world gets a private copy of the same map
+        worlds = make_worlds(terrain, range(count)) if shared else [make_worlds(SharedTerrain.generate(width, height, seed=0), [seed])[0] for seed in range(count)]
+        step_all(worlds, ticks); gc.collect(); per_world = (tracemalloc.get_traced_memory()[0] - before) / count; tracemalloc.stop()
+        start = time.perf_counter(); step_all(worlds, ticks); elapsed = time.perf_counter() - start
+        print(f"{'shared' if shared else 'own':<7} {count} worlds of {width}x{height}: {per_world / 1e6:.2f} MB/world  "
+              f"{elapsed / (ticks * count) * 1000:.2f} ms/world-tick")
+        del worlds, terrain
+
+def bench_digest(ticks: int = 500, seed: int = 1, width: int = 120, height: int = 90):
+    """Per-tick cost of a StateDigest next to the tick itself, and whether each engine mode reproduces its own
+    final digest when run twice from the same seed."""
+    modes = {"reference": REFERENCE, "default": {}, "herd": dict(herd_engine=True), "lod": dict(lod=True), "jps": dict(pathfinder="jps"),
+             "async": dict(async_pathfinding=True)}
+    for name, options in modes.items():
+        finals = []; tick_time = digest_time = 0.0
+        for _ in range(2):
+            world = World(width, height, seed=seed, **options); world.initialize_world(); digest = StateDigest(world)
+            for _ in range(ticks):
+                start = time.perf_counter(); world.update(); mid = time.perf_counter(); digest.digest()
+                tick_time += mid - start; digest_time += time.perf_counter() - mid
+            finals.append(digest.digest()); world.close()
+        print(f"{name:<10} ms/tick: {tick_time / (2 * ticks) * 1000:.3f}  ms/digest: {digest_time / (2 * ticks) * 1000:.3f}  "
+              f"reproducible: {'yes' if finals[0] == finals[1] else 'no'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless simulation benchmarks.")
+    parser.add_argument("suite", choices=["memory", "ticks", "herd", "paths", "pathfinders", "repair", "lod", "worldgen", "worlds", "digest", "all"], nargs="?", default="all")
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    if args.suite in ("memory", "all"): bench_memory(args.count)
+    if args.suite in ("ticks", "all"): bench_ticks(args.ticks, args.seed)
+    if args.suite in ("herd", "all"): bench_herd(seed=args.seed)
+    if args.suite in ("paths", "all"): bench_paths(seed=args.seed)
+    if args.suite in ("pathfinders", "all"): bench_pathfinders(seed=args.seed)
+    if args.suite in ("repair", "all"): bench_repair(seed=args.seed)
+    if args.suite in ("lod", "all"): bench_lod()
+    if args.suite in ("worldgen", "all"): bench_worldgen()
+    if args.suite in ("worlds", "all"): bench_worlds()
+    if args.suite in ("digest", "all"): bench_digest(seed=args.seed)
+
+if __name__ == "__main__":
+    main()
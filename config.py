@@ -8,9 +8,12 @@ WORLD_HEIGHT = 45
 STARTING_AGENTS = 8
 RESOURCE_REGEN_INTERVAL = 15
 ANIMAL_SPAWN_INTERVAL = 100
-MAX_ANIMALS = 15
+MAX_ANIMALS = 15 # Default deer cap (World max_animals, main.py --animals)
 MAX_WOLVES = 0 # Wolves are disabled as requested
 ANIMAL_MOVE_COOLDOWN = 5 # Ticks between animal moves
+HERD_ENGINE_ENABLED = False # Step Deer and Wolves with the event-scheduled columnar HerdEngine (see herd.py)
+LOD_ENABLED = False # Advance unobserved agents and deer doing routine things in coarse steps (see lod.py)
+LOD_STEP = 10 # Ticks covered by one coarse level-of-detail step
 
 # --- AGENT CONFIGURATION ---
 AGENT_VIEW_DISTANCE = 10
@@ -30,6 +33,7 @@ ACTION_COOLDOWN = 10 # Ticks to wait after some actions
 
 # --- BUILDING & CRAFTING ---
 FARM_PRODUCTION_CYCLE = 300
+FISHING_HUT_PRODUCTION_CYCLE = 100
 BLACKSMITH_SMELT_TIME = 150
 BLACKSMITH_CRAFT_TIME = 200
 TOOL_DURABILITY = 50
@@ -38,4 +42,35 @@ TOOL_DURABILITY = 50
 DAY_NIGHT_DURATION = 2400
 ROAD_UPDATE_INTERVAL = 100 
 ROAD_BUILD_THRESHOLD = 50
-PATH_DECAY_RATE = 0.95
\ No newline at end of file
+PATH_DECAY_RATE = 0.95
+PATHFINDER = "astar" # Backend used by World.find_path: "astar", "jps", "bidirectional" or "road" (see pathfinding.py); "jps" expands fewer nodes but runs ~1.2-1.5x slower than "astar" here
+JPS_MAX_JUMP = 4 # Tiles a jump point search scans in one run before stopping at an intermediate jump point
+ROAD_STEP_COST = 0.5 # Cost of stepping onto a road tile for the "road" pathfinder; every other move costs 1
+PATH_REPAIR = True # Splice local detours into routes that get blocked instead of dropping them (see pathfinding.PathRepair)
+PATH_REPAIR_LOOKAHEAD = 12 # How far along the remaining path a detour may rejoin it
+PATH_REPAIR_MAX_EXPANSIONS = 200 # Search budget of one detour; past it the route is replanned as before
+ASYNC_PATHFINDING = False # Solve agent paths in a background PathfindingService and deliver them on a later tick
+PATHFINDING_WORKERS = 2 # Worker processes for the async service; 0 solves inline at the end of each tick
+PATHFINDING_MAX_WAIT_TICKS = 5 # Ticks after which an unfinished batch of path requests is waited for
+
+# --- STATISTICS ---
+STATS_INTERVAL = 1 # Ticks between StatsRecorder samples
+STATS_CHUNK_ROWS = 4096 # Rows buffered per resolution before a chunk is written
+STATS_DOWNSAMPLE = 16 # Each stats level averages this many rows of the level below
+STATS_LEVELS = 4 # Resolutions kept: 1, 16, 256 and 4096 samples per row
+STATS_MAX_POINTS = 2000 # Default row budget of a StatsReader query
+
+# --- SOAK & COMPACTION ---
+COMPACTION_INTERVAL = 1000 # Ticks between World.compact passes that clear references to removed objects; 0 disables
+SOAK_SAMPLE_INTERVAL = 10000 # Ticks between soak-mode memory samples
+SOAK_WARMUP_FRACTION = 0.25 # Leading share of samples ignored by growth detection while the colony settles
+SOAK_GROWTH_TOLERANCE = 0.10 # Relative growth between the early and late halves of a run that counts as unbounded
+
+# --- STREAMING ---
+STREAM_HOST = "127.0.0.1"
+STREAM_PORT = 8765
+STREAM_MAX_BACKLOG = 1 << 20 # Unsent bytes after which a viewer is skipped until it can take a fresh keyframe
+
+# --- PLACEMENT ---
+PLACEMENT_MAX_ANCHORS = 8 # Anchor points with a maintained distance-band index; others fall back to a scan
+PLACEMENT_SAMPLE_ATTEMPTS = 8 # Random draws from the index before an exhaustive pass over the candidates
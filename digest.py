@@ -0,0 +1,138 @@
+"""Canonical per-tick state digests and a differential harness for checking optimized engines against the reference.
+
+`python digest.py --candidate herd_engine=True lod=True --ticks 2000` steps a reference World and a candidate World
+from the same seed in lockstep and reports the first tick, and the sections, at which their digests differ.
+"""
+import argparse
+import ast
+import logging
+from typing import Dict, List, Optional, Sequence
+
+from config import *
+from objects import Agent, Resource, Deer, Wolf, Storage, ProductionBuilding, ConstructionSite
+from simulation import World, WorldObserver
+from utils import AgentRole, AgentState, Directive, ResourceType, StructureType, TerrainType, ToolType, RNG_STREAMS
+
+MASK = (1 << 64) - 1
+OBJECT_SECTIONS = ("agents", "animals", "resources", "structures")
+SECTIONS = ("clock", "terrain") + OBJECT_SECTIONS + ("inventory", "directive") + tuple(f"rng.{name}" for name in RNG_STREAMS)
+REFERENCE = dict(herd_engine=False, lod=False, async_pathfinding=False, pathfinder="astar", path_repair=False) # Every fast path off
+
+def _codes(members) -> Dict[int, int]: return {id(m): i for i, m in enumerate(members)} # id(): Enum.__hash__ is slow and str-seeded
+ROLE, STATE, TOOL, RESOURCE = _codes(AgentRole), _codes(AgentState), _codes(ToolType), _codes(ResourceType)
+STRUCTURE, TERRAIN, DIRECTIVE = _codes(StructureType), _codes(TerrainType), _codes(Directive)
+KINDS = {cls: i for i, cls in enumerate(s.get_class() for s in StructureType)}; KINDS[ConstructionSite] = len(KINDS)
+
+def _row(obj) -> Optional[tuple]:
+    """(section, tuple of numbers) for one object. Only ints and floats go in, so hash() of the tuple is the same in
+    every process regardless of PYTHONHASHSEED."""
+    if isinstance(obj, Agent):
+        tool = obj.tool
+        return ("agents", (obj.agent_id, obj.x, obj.y, ROLE[id(obj.role)], STATE[id(obj.state)], obj.age, obj.energy, obj.hydration,
+                obj.health, obj.state_timer, obj.is_pregnant, obj.pregnancy_timer, obj.partner.agent_id if obj.partner else -1,
+                TOOL[id(tool.tool_type)] if tool else -1, tool.durability if tool else 0) + tuple(obj.inventory.counts))
+    if isinstance(obj, (Deer, Wolf)): return ("animals", (isinstance(obj, Wolf), obj.x, obj.y, obj.health))
+    if isinstance(obj, Resource): return ("resources", (RESOURCE[id(obj.resource_type)], obj.x, obj.y))
+    kind = KINDS.get(type(obj))
+    if kind is None: return None
+    if isinstance(obj, ConstructionSite):
+        return ("structures", (kind, obj.x, obj.y, STRUCTURE[id(obj.structure_type)], obj.failed_path_attempts) + tuple(obj.needed_resources.counts))
+    extra = (obj.worker.agent_id if obj.worker else -1,) if isinstance(obj, ProductionBuilding) else ()
+    if isinstance(obj, Storage): extra = extra + (len(getattr(obj, 'occupants', ())),) + tuple(obj.inventory.counts)
+    return ("structures", (kind, obj.x, obj.y) + extra)
+
+class StateDigest(WorldObserver):
+    """Order-independent 64-bit hashes of a world's state, one per section (see SECTIONS).
+
+    Object sections are the sum of the hashes of per-object rows (position, vitals, state, inventory, ...), so the
+    order a spatial index or engine keeps its objects in never matters. The terrain section is maintained through
+    on_terrain_changed instead of rescanning the map each tick, and every random stream contributes the number of
+    words it has drawn (see CountingRandom), which tells which subsystem drew differently. Production progress is
+    left out: the event-scheduled ProductionEngine banks it lazily, and only its outputs (the inventories) are observable.
+    """
+    def __init__(self, world: World):
+        self.world = world
+        self.tiles = bytearray(TERRAIN[id(t)] for row in world.terrain for t in row)
+        self.terrain = sum(hash((i, code)) for i, code in enumerate(self.tiles)) & MASK
+        world.add_observer(self)
+
+    def on_terrain_changed(self, pos):
+        i = pos.y * self.world.width + pos.x; code = TERRAIN[id(self.world.terrain[pos.y][pos.x])]
+        self.terrain = (self.terrain - hash((i, self.tiles[i])) + hash((i, code))) & MASK; self.tiles[i] = code
+
+    def rows(self) -> Dict[str, List[tuple]]:
+        """The per-object rows behind each object section, sorted, for reporting what differs."""
+        out = {name: [] for name in OBJECT_SECTIONS}
+        for obj in self.world.get_all_objects():
+            row = _row(obj)
+            if row: out[row[0]].append(row[1])
+        for rows in out.values(): rows.sort()
+        return out
+
+    def sections(self) -> Dict[str, int]:
+        world = self.world; sums = dict.fromkeys(OBJECT_SECTIONS, 0)
+        for obj in world.get_all_objects():
+            row = _row(obj)
+            if row: sums[row[0]] += hash(row[1])
+        out = {"clock": hash((world.step_count, world.time_of_day)), "terrain": self.terrain}
+        out.update((name, total & MASK) for name, total in sums.items())
+        out["inventory"] = hash(tuple(world.global_inventory.counts)); out["directive"] = DIRECTIVE[id(world.oracle.directive)]
+        for name in RNG_STREAMS: out[f"rng.{name}"] = getattr(world.rng, name).words
+        return out
+
+    def digest(self) -> int: return hash(tuple(self.sections().values())) & MASK
+    def close(self): self.world.remove_observer(self)
+
+def first_divergence(reference: World, candidate: World, ticks: int, interval: int = 1) -> Optional[tuple]:
+    """Steps both worlds in lockstep, comparing digests every `interval` ticks (and before the first). Returns
+    (tick, differing sections, reference rows, candidate rows) at the first mismatch, or None if none is found."""
+    digests = (StateDigest(reference), StateDigest(candidate))
+    try:
+        for tick in range(ticks + 1):
+            if tick:
+                reference.update(); candidate.update()
+            if tick % interval and tick != ticks: continue
+            a, b = (d.sections() for d in digests)
+            if a != b: return (reference.step_count, [name for name in SECTIONS if a[name] != b[name]], digests[0].rows(), digests[1].rows())
+        return None
+    finally:
+        for d in digests: d.close()
+
+def _options(pairs: Sequence[str]) -> dict:
+    options = {}
+    for pair in pairs:
+        key, _, value = pair.partition("=")
+        try: options[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError): options[key] = value
+    return options
+
+def main():
+    parser = argparse.ArgumentParser(description="Step a reference and a candidate World in lockstep and report the first divergent tick.")
+    parser.add_argument("--candidate", nargs="*", default=[], metavar="KEY=VALUE", help="World options of the candidate (default: the config defaults)")
+    parser.add_argument("--reference", nargs="*", default=[], metavar="KEY=VALUE", help="overrides of the reference options (default: every fast path off)")
+    parser.add_argument("--ticks", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--width", type=int, default=WORLD_WIDTH)
+    parser.add_argument("--height", type=int, default=WORLD_HEIGHT)
+    parser.add_argument("--interval", type=int, default=1, help="compare every this many ticks")
+    parser.add_argument("--show", type=int, default=5, help="differing rows to print per section")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    worlds = []
+    for options in ({**REFERENCE, **_options(args.reference)}, _options(args.candidate)):
+        world = World(args.width, args.height, seed=args.seed, **options); world.initialize_world(); worlds.append(world)
+    try: found = first_divergence(*worlds, args.ticks, args.interval)
+    finally:
+        for world in worlds: world.close()
+    if found is None: print(f"no divergence in {args.ticks} ticks"); return
+    tick, sections, ref_rows, cand_rows = found
+    print(f"first divergence at tick {tick}: {', '.join(sections)}")
+    for name in sections:
+        if name not in ref_rows: continue
+        ref, cand = set(ref_rows[name]), set(cand_rows[name])
+        for label, rows in (("reference only", sorted(ref - cand)), ("candidate only", sorted(cand - ref))):
+            for row in rows[:args.show]: print(f"  {name} {label}: {row}")
+    raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+from array import array
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from config import *
+from objects import Agent, Deer, Wolf
+from placement import WATER, STRUCTURE, AGENT
+from utils import Point
+
+if TYPE_CHECKING:
+    from simulation import World
+
+HERD_TYPES = (Deer, Wolf)
+DEER, WOLF = 0, 1
+WOLF_ATTACK_COOLDOWN = 10 # As in Wolf.update
+
+class HerdEngine:
+    """Event-scheduled columnar simulation of every Deer and Wolf.
+
+    Positions, timers and wander targets live in parallel arrays indexed by slot, and nothing runs per animal per
+    tick: each animal waits in the bucket of the next tick it can act (its move cooldown running out while it has
+    somewhere to go, its wander timer expiring, a wolf's cooldown ending), so a tick is one pass over the animals
+    that are due. Passability is read straight from PlacementIndex.mask, wolves that need prey share one
+    find_nearest_many query, and the pass's moves are written back to the spatial index together through
+    World.move_objects. Deer and wolves follow the rules of Deer.update and Wolf.update, but in slot order rather
+    than world order, so a run matches per-object stepping statistically, not draw for draw. The animals' own
+    timer and target attributes are not maintained while the engine owns them.
+    """
+    def __init__(self):
+        self.animals: List = []; self.slots: Dict[object, int] = {}
+        self.kind = array('b'); self.x = array('i'); self.y = array('i')
+        self.retarget_at = array('i'); self.ready_at = array('i'); self.wake_at = array('i') # Absolute ticks
+        self.target_x = array('i'); self.target_y = array('i'); self.has_target = array('b')
+        self.prey: List[Optional[Agent]] = []; self.detours: List[List[Point]] = [] # See objects.step_toward
+        self.due: Dict[int, List[object]] = {} # tick -> animals to act then; stale entries are skipped via wake_at
+        self.counts = [0, 0]; self.tick = 0 # Last tick stepped
+
+    def __len__(self): return len(self.animals)
+    def count(self, animal_type: type) -> int: return self.counts[WOLF if animal_type is Wolf else DEER]
+
+    def add(self, animal, tick: int):
+        if animal in self.slots: return
+        kind = WOLF if isinstance(animal, Wolf) else DEER; i = len(self.animals)
+        self.slots[animal] = i; self.animals.append(animal); self.counts[kind] += 1
+        self.kind.append(kind); self.x.append(animal.x); self.y.append(animal.y)
+        self.retarget_at.append(tick + max(1, getattr(animal, 'state_timer', 0))); self.ready_at.append(tick + max(1, animal.move_cooldown))
+        self.wake_at.append(0); self.target_x.append(0); self.target_y.append(0); self.has_target.append(0)
+        self.prey.append(None); self.detours.append([])
+        self._schedule(animal, i, self.ready_at[i] if kind == WOLF else self.retarget_at[i])
+
+    def discard(self, animal):
+        """Drops an animal with a swap-remove, keeping the columns dense."""
+        i = self.slots.pop(animal, None)
+        if i is None: return
+        self.counts[self.kind[i]] -= 1
+        last = len(self.animals) - 1
+        if i != last:
+            moved = self.animals[last]; self.animals[i] = moved; self.slots[moved] = i
+            for column in (self.kind, self.x, self.y, self.retarget_at, self.ready_at, self.wake_at, self.target_x, self.target_y,
+                           self.has_target, self.prey, self.detours):
+                column[i] = column[last]
+        self.animals.pop(); self.prey.pop(); self.detours.pop()
+        for column in (self.kind, self.x, self.y, self.retarget_at, self.ready_at, self.wake_at, self.target_x, self.target_y, self.has_target):
+            column.pop()
+
+    def _schedule(self, animal, i: int, tick: int):
+        tick = max(tick, self.tick + 1); self.wake_at[i] = tick
+        bucket = self.due.get(tick)
+        if bucket is None: self.due[tick] = [animal]
+        else: bucket.append(animal)
+
+    def step(self, world: 'World'):
+        tick = self.tick = world.step_count
+        due = self.due.pop(tick, None)
+        if not due: return
+        slots, kind, xs, ys, wake_at = self.slots, self.kind, self.x, self.y, self.wake_at
+        retarget_at, ready_at, txs, tys, has_target, detours = self.retarget_at, self.ready_at, self.target_x, self.target_y, self.has_target, self.detours
+        rand, randint = world.rng.animals.random, world.rng.animals.randint
+        mask, width, height = world.placement.mask, world.width, world.height; blockers = WATER | STRUCTURE | AGENT
+        moves: List[tuple] = []; wolves: List[int] = []
+        for animal in due:
+            i = slots.get(animal)
+            if i is None or wake_at[i] != tick: continue # Removed, or rescheduled since
+            if kind[i] == WOLF: wolves.append(i); continue
+            if tick >= retarget_at[i]: # Deer.update's draws, in its order
+                if rand() < 0.8: txs[i] = xs[i] + randint(-7, 7); tys[i] = ys[i] + randint(-7, 7); has_target[i] = 1
+                else: has_target[i] = 0
+                retarget_at[i] = tick + randint(50, 150); detours[i] = []
+            x, y = xs[i], ys[i]
+            if has_target[i] and (x != txs[i] or y != tys[i]):
+                if tick >= ready_at[i]:
+                    nx = x + (txs[i] > x) - (txs[i] < x); ny = y + (tys[i] > y) - (tys[i] < y)
+                    if not detours[i] and 0 <= nx < width and 0 <= ny < height and not mask[ny * width + nx] & blockers: moved = (nx, ny)
+                    else: moved = self._detour_step(world, i, nx, ny, txs[i], tys[i])
+                    if moved: xs[i], ys[i] = moved; moves.append((animal, moved)); ready_at[i] = tick + ANIMAL_MOVE_COOLDOWN
+                    else: has_target[i] = 0
+            self._schedule(animal, i, min(retarget_at[i], ready_at[i]) if has_target[i] and (xs[i] != txs[i] or ys[i] != tys[i]) else retarget_at[i])
+        if wolves: self._step_wolves(world, tick, wolves, moves)
+        if moves: world.move_objects([(animal, Point.at(x, y)) for animal, (x, y) in moves])
+
+    def _step_wolves(self, world: 'World', tick: int, wolves: List[int], moves: List[tuple]):
+        """Wolf.update for every wolf whose cooldown has run out; those without live prey share one nearest-agent query."""
+        xs, ys, prey, ready_at, animals = self.x, self.y, self.prey, self.ready_at, self.animals
+        hungry = []
+        for i in wolves:
+            target = prey[i]
+            if target and (target.health <= 0 or abs(target.x - xs[i]) + abs(target.y - ys[i]) > 10): prey[i] = None
+            if prey[i] is None: hungry.append(i); self.detours[i] = []
+        if hungry:
+            nearest = world.find_nearest_many([Point.at(xs[i], ys[i]) for i in hungry], Agent, lambda o: o.is_adult())
+            for i, found in zip(hungry, nearest): prey[i] = found[0] if found else None
+        for i in wolves:
+            target = prey[i]
+            if target is not None:
+                if abs(target.x - xs[i]) + abs(target.y - ys[i]) < 2:
+                    target.health -= 5
+                    if target.health <= 0: prey[i] = None
+                    ready_at[i] = tick + WOLF_ATTACK_COOLDOWN
+                else:
+                    nx = xs[i] + (target.x > xs[i]) - (target.x < xs[i]); ny = ys[i] + (target.y > ys[i]) - (target.y < ys[i])
+                    moved = (nx, ny) if not self.detours[i] and world.placement.is_passable(nx, ny) else self._detour_step(world, i, nx, ny, target.x, target.y)
+                    if moved: xs[i], ys[i] = moved; moves.append((animals[i], moved)); ready_at[i] = tick + ANIMAL_MOVE_COOLDOWN
+            self._schedule(animals[i], i, ready_at[i]) # A wolf that could not act tries again next tick
+
+    def _detour_step(self, world: 'World', i: int, nx: int, ny: int, tx: int, ty: int) -> Optional[tuple]:
+        """The rest of objects.step_toward for a slot whose straight step to (nx, ny) is blocked or that has a detour:
+        the tile to step to, or None if the animal is stuck."""
+        passable = world.placement.is_passable
+        if not self.detours[i]:
+            if world.path_repair is None or passable(nx, ny, ignore_agents=True): return None # Only agents in the way
+            self.detours[i] = world.path_repair.steer(Point.at(self.x[i], self.y[i]), Point(tx, ty)) or []
+            if not self.detours[i]: return None
+        step = self.detours[i].pop(0)
+        if passable(step.x, step.y): return (step.x, step.y)
+        self.detours[i] = []; return None
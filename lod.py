@@ -0,0 +1,106 @@
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from config import *
+from objects import Agent, Deer
+from utils import AgentRole, AgentState, Point
+
+if TYPE_CHECKING:
+    from simulation import World
+
+MOVING, WAITING, RESTING, WANDERING = 0, 1, 2, 3 # Coarse modes, see LODScheduler
+
+class LODScheduler:
+    """Level-of-detail stepping for unobserved entities doing routine things.
+
+    An Agent or Deer outside every World.viewports rectangle is parked when nothing it does in the next LOD_STEP
+    ticks can need a decision: an agent walking a path longer than the window, waiting out a long state_timer or
+    resting at its shelter through the night, with vitals that cannot cross a threshold meanwhile; or an unclaimed
+    deer wandering. A parked entity is skipped by World.update and caught up in one closed-form step at the start of
+    the tick its window ends (vitals drained in bulk, path steps taken in one jump, the deer's wander target
+    resampled at the window's end rather than the exact tick), after which it gets a full-detail update unless it
+    qualifies to be parked again. Entities that come into view are woken at once; a deer claimed by a hunter
+    finishes its window, which moves it at most LOD_STEP / ANIMAL_MOVE_COOLDOWN tiles.
+    """
+    def __init__(self, step: int = LOD_STEP):
+        self.step = step
+        self.parked: Dict[object, Tuple[int, int]] = {} # entity -> (tick parked, coarse mode)
+        self.due: Dict[int, List[object]] = {} # tick -> entities whose window ends then
+
+    def __len__(self): return len(self.parked)
+    def discard(self, obj): self.parked.pop(obj, None)
+
+    def wake(self, world: 'World'):
+        """Catches up every entity whose window ends this tick, plus any that came into view, before the object loop."""
+        tick = world.step_count
+        woken = [obj for obj in self.due.pop(tick, ()) if obj in self.parked and self.parked[obj][0] + self.step == tick] # Skip stale entries
+        if world.viewports: woken += [obj for obj in self.parked if self.parked[obj][0] + self.step != tick and self._observed(world, obj)]
+        for obj in woken:
+            since, mode = self.parked.pop(obj); self._catch_up(world, obj, mode, tick - since)
+
+    def park(self, world: 'World', obj) -> bool:
+        """Called for each awake entity in World.update; parks it and returns True if its full update can be skipped."""
+        mode = self._mode(world, obj)
+        if mode is None: return False
+        self.parked[obj] = (world.step_count, mode); self.due.setdefault(world.step_count + self.step, []).append(obj)
+        return True
+
+    def _observed(self, world: 'World', obj) -> bool:
+        return any(x0 <= obj.x <= x1 and y0 <= obj.y <= y1 for x0, y0, x1, y1 in world.viewports)
+
+    def _mode(self, world: 'World', obj):
+        if world.viewports and self._observed(world, obj): return None
+        n = self.step
+        if isinstance(obj, Deer): return WANDERING if obj.claimed_by is None and not obj.detour else None
+        if not isinstance(obj, Agent) or obj.workplace or obj.health <= 0: return None
+        if not obj.is_adult_val and obj.age + n >= ADULT_AGE_THRESHOLD: return None
+        if obj.energy - 0.6 * n <= 0 or obj.hydration - 0.12 * n <= 0: return None
+        if obj.state == AgentState.MOVING: return MOVING if len(obj.path) > n else None
+        if obj.state == AgentState.WAITING_FOR_PATH: return None
+        if obj.state_timer > n: return WAITING
+        if (obj.is_adult_val and obj.role != AgentRole.BUILDER and obj.home and obj.pos.distance_to(obj.home.pos) < 2
+                and world.is_night() and world.time_of_day + n < DAY_NIGHT_DURATION
+                and obj.energy >= AGENT_LOW_ENERGY_THRESHOLD and obj.hydration - 0.12 * n >= AGENT_LOW_HYDRATION_THRESHOLD):
+            return RESTING
+        return None
+
+    def _catch_up(self, world: 'World', obj, mode: int, ticks: int):
+        if ticks <= 0: return
+        if mode == WANDERING: self._wander(world, obj, ticks); return
+        obj.age += ticks; obj.energy -= 0.1 * ticks; obj.hydration -= 0.12 * ticks
+        if mode == RESTING: obj.energy = min(AGENT_MAX_ENERGY, obj.energy + 0.5 * ticks) # +1 per two-tick rest cycle
+        else: obj.state_timer = max(0, obj.state_timer - ticks)
+        if mode != MOVING: return
+        x, y = obj.x, obj.y; steps = 0
+        for pos in obj.path[:ticks]:
+            if not world.is_passable(pos, ignore_agents=True): break
+            world.record_path_usage(Point.at(x, y)); x, y = pos.x, pos.y; steps += 1
+        del obj.path[:steps]; obj.energy -= 0.5 * steps
+        if steps: world.move_object(obj, Point.at(x, y))
+        if steps < ticks: obj.reset_task(); obj.state = AgentState.IDLE; obj.state_timer = ACTION_COOLDOWN # Blocked, as in _execute_move
+
+    def _wander(self, world: 'World', deer: Deer, ticks: int):
+        """Takes every move the deer's cooldown allows in the window toward its target, steering around obstacles
+        as objects.step_toward does, then resamples the target if its timer ran out, drawing from the same
+        distribution as Deer.update."""
+        first = max(0, deer.move_cooldown - 1)
+        moves = 0 if first >= ticks else 1 + (ticks - 1 - first) // ANIMAL_MOVE_COOLDOWN
+        x, y = deer.x, deer.y; target = deer.target_pos; taken = 0; detour = deer.detour
+        while target and taken < moves and (x, y) != (target.x, target.y):
+            if not detour:
+                step = Point(x + (target.x > x) - (target.x < x), y + (target.y > y) - (target.y < y))
+                if world.is_passable(step): x, y = step.x, step.y; taken += 1; continue
+                if world.path_repair is None or world.is_passable(step, ignore_agents=True): target = None; break # Only agents in the way
+                detour = world.path_repair.steer(Point.at(x, y), target) or []
+                if not detour: target = None; break
+            step = detour.pop(0)
+            if not world.is_passable(step): detour = []; target = None; break
+            x, y = step.x, step.y; taken += 1
+        if (x, y) != (deer.x, deer.y): world.move_object(deer, Point.at(x, y))
+        deer.detour = detour
+        last = first + (taken - 1) * ANIMAL_MOVE_COOLDOWN if taken else None
+        deer.move_cooldown = max(0, ANIMAL_MOVE_COOLDOWN - (ticks - 1 - last)) if last is not None else max(0, deer.move_cooldown - ticks)
+        deer.target_pos = target; deer.state_timer -= ticks
+        if deer.state_timer <= 0:
+            rng = world.rng.animals
+            deer.target_pos = Point(deer.x + rng.randint(-7, 7), deer.y + rng.randint(-7, 7)) if rng.random() < 0.8 else None
+            deer.state_timer = max(1, rng.randint(50, 150) + deer.state_timer); deer.detour = []
@@ -1,3 +1,4 @@
+import argparse
 import tkinter as tk
 from tkinter import font as tkfont
 import math
@@ -11,10 +12,14 @@ from objects import (Agent, Resource, Shelter, Farm,
                      Well, FishingHut, HuntersLodge, Deer, Wolf)
 from utils import Point, TerrainType, Gender, AgentState
 from logger_setup import setup_logger
+from streaming import StreamServer, parse_address
+from stats import StatsRecorder
+from worldgen import WorldgenCache
 
 class CivilizationGUI:
     def __init__(self, root, world: World):
         self.root = root; self.world = world; self.is_running = True; self.root.title("AI Agent Civilization")
+        world.viewports = [(0, 0, world.width - 1, world.height - 1)] # The whole map is on screen
         main_frame = tk.Frame(root, bg="#2b2b2b"); main_frame.pack(fill=tk.BOTH, expand=True)
         main_frame.grid_rowconfigure(0, weight=1); main_frame.grid_columnconfigure(1, weight=1)
         inspector_frame = tk.Frame(main_frame, width=250, bg="#3c3f41", bd=1, relief=tk.SUNKEN)
@@ -111,7 +116,7 @@ class CivilizationGUI:
     def _draw_farm(self, farm: Farm):
         x, y = farm.x * CELL_SIZE, farm.y * CELL_SIZE
         self.canvas.create_rectangle(x+2, y+2, x+CELL_SIZE-2, y+CELL_SIZE-2, fill="#6b4423", outline="#4a2f19", width=1)
-        growth = farm.production_progress / FARM_PRODUCTION_CYCLE
+        growth = farm.progress_at(self.world.step_count) / FARM_PRODUCTION_CYCLE
         for i in range(3):
             cx = x + (i + 1.5) * (CELL_SIZE / 4); ch = (CELL_SIZE / 2.5) * growth
             self.canvas.create_line(cx, y+CELL_SIZE-5, cx, y+CELL_SIZE-5 - ch, fill="#5a945a", width=3)
@@ -196,9 +201,35 @@ class CivilizationGUI:
             elif not is_night: self.canvas.create_oval(p['x'], p['y'], p['x']+p['size'], p['y']+p['size'], fill=color, outline="")
 
 def main():
+    parser = argparse.ArgumentParser(description="AI Agent Civilization simulation.")
+    parser.add_argument("--headless", action="store_true", help="run without the tkinter GUI")
+    parser.add_argument("--ticks", type=int, default=0, help="stop a headless run after this many ticks (default: run forever)")
+    parser.add_argument("--stream", metavar="HOST:PORT|PATH", help="stream world state to remote viewers over TCP or a Unix socket")
+    parser.add_argument("--stats", metavar="PATH", help="record per-tick colony statistics to this file (read it with stats.py)")
+    parser.add_argument("--async-paths", action="store_true", default=ASYNC_PATHFINDING, help="solve agent paths in background worker processes")
+    parser.add_argument("--seed", type=int, help="seed the world's random streams for a reproducible run")
+    parser.add_argument("--width", type=int, default=WORLD_WIDTH, help="world width in tiles")
+    parser.add_argument("--height", type=int, default=WORLD_HEIGHT, help="world height in tiles")
+    parser.add_argument("--herd", action="store_true", default=HERD_ENGINE_ENABLED, help="step all deer and wolves with the batched HerdEngine")
+    parser.add_argument("--animals", type=int, default=MAX_ANIMALS, help="deer population cap, stocked up front when above the default (use with --herd and a larger map)")
+    parser.add_argument("--worldgen-cache", metavar="DIR", help="load the seeded world from this cache directory, generating and storing it on a miss")
+    args = parser.parse_args()
+    if args.worldgen_cache and args.seed is None: parser.error("--worldgen-cache requires --seed")
     setup_logger(); logging.info("Simulation starting...")
-    root = tk.Tk(); world = World(WORLD_WIDTH, WORLD_HEIGHT); world.initialize_world()
-    gui = CivilizationGUI(root, world); gui.update_simulation(); root.mainloop()
+    world = World(args.width, args.height, herd_engine=args.herd, async_pathfinding=args.async_paths, seed=args.seed, max_animals=args.animals)
+    if args.worldgen_cache: WorldgenCache(args.worldgen_cache).initialize(world, args.seed)
+    else: world.initialize_world()
+    if args.animals > MAX_ANIMALS:
+        for _ in range(args.animals): world.spawn_animal()
+    server = StreamServer(world, parse_address(args.stream)) if args.stream else None
+    recorder = StatsRecorder(world, args.stats) if args.stats else None
+    if args.headless:
+        while not args.ticks or world.step_count < args.ticks: world.update()
+    else:
+        root = tk.Tk(); gui = CivilizationGUI(root, world); gui.update_simulation(); root.mainloop()
+    if server: server.close()
+    if recorder: recorder.close()
+    world.close()
     logging.info("Simulation finished.")
 
 if __name__ == "__main__":
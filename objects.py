@@ -1,11 +1,11 @@
 from __future__ import annotations
-import random
 import logging
 import math
-from collections import defaultdict, deque
+from collections import deque
 from typing import TYPE_CHECKING, Optional, Dict, List, Callable
 
-from utils import Point, AgentRole, AgentState, ResourceType, ToolType, Gender, StructureType, a_star_search, TerrainType, Directive
+from utils import (Point, AgentRole, AgentState, ResourceType, ToolType, Gender, StructureType, TerrainType, Directive,
+                   Inventory, FOOD_TYPES, RESOURCE_BY_NAME, ITEM_IDS)
 from config import *
 
 if TYPE_CHECKING:
@@ -13,70 +13,87 @@ if TYPE_CHECKING:
 
 class WorldObject:
     """Base class for anything that exists in the world grid."""
+    __slots__ = ('x', 'y')
     def __init__(self, pos: Point):
         self.x, self.y = pos.x, pos.y
     @property
-    def pos(self) -> Point: return Point(self.x, self.y)
+    def pos(self) -> Point: return Point.at(self.x, self.y)
     def set_pos(self, new_pos: Point): self.x, self.y = new_pos.x, new_pos.y
 
 class Resource(WorldObject):
+    __slots__ = ('resource_type', 'name', 'sprite', 'claimed_by')
     def __init__(self, pos: Point, resource_type: ResourceType):
         super().__init__(pos)
         self.resource_type = resource_type; self.name = resource_type.resource_name; self.sprite = resource_type.sprite
         self.claimed_by: Optional[Agent] = None
 
 class Tool:
+    __slots__ = ('tool_type', 'name', 'sprite', 'durability')
     def __init__(self, tool_type: ToolType):
         self.tool_type = tool_type; self.name = tool_type.tool_name; self.sprite = tool_type.sprite
         self.durability = TOOL_DURABILITY
     def use(self): self.durability -= 1; return self.durability > 0
 
+def step_toward(world: 'World', animal, goal: Point) -> bool:
+    """Moves a Deer or Wolf one step straight at goal, or along its detour around whatever is in the way. False if stuck."""
+    if not animal.detour:
+        dx = goal.x - animal.x; dy = goal.y - animal.y
+        move_x = 1 if dx > 0 else -1 if dx < 0 else 0; move_y = 1 if dy > 0 else -1 if dy < 0 else 0
+        next_pos = Point(animal.x + move_x, animal.y + move_y)
+        if world.is_passable(next_pos): world.move_object(animal, next_pos); return True
+        if world.path_repair is None or world.is_passable(next_pos, ignore_agents=True): return False # Only agents in the way
+        animal.detour = world.path_repair.steer(animal.pos, goal) or []
+        if not animal.detour: return False
+    next_pos = animal.detour.pop(0)
+    if world.is_passable(next_pos): world.move_object(animal, next_pos); return True
+    animal.detour = []; return False
+
 class Deer(WorldObject):
+    __slots__ = ('state_timer', 'target_pos', 'move_cooldown', 'health', 'claimed_by', 'detour')
     def __init__(self, pos: Point):
         super().__init__(pos); self.state_timer = 0; self.target_pos: Optional[Point] = None
         self.move_cooldown = 0; self.health = 20
-        self.claimed_by: Optional[Agent] = None
+        self.claimed_by: Optional[Agent] = None; self.detour: List[Point] = []
 
     def update(self, world: 'World'):
         self.state_timer -= 1; self.move_cooldown = max(0, self.move_cooldown - 1)
         if self.state_timer <= 0:
-            self.target_pos = Point(self.x + random.randint(-7, 7), self.y + random.randint(-7, 7)) if random.random() < 0.8 else None
-            self.state_timer = random.randint(50, 150)
+            rng = world.rng.animals
+            self.target_pos = Point(self.x + rng.randint(-7, 7), self.y + rng.randint(-7, 7)) if rng.random() < 0.8 else None
+            self.state_timer = rng.randint(50, 150); self.detour = []
         if self.move_cooldown == 0 and self.target_pos and self.pos != self.target_pos:
-            dx = self.target_pos.x - self.x; dy = self.target_pos.y - self.y
-            move_x = 1 if dx > 0 else -1 if dx < 0 else 0; move_y = 1 if dy > 0 else -1 if dy < 0 else 0
-            next_pos = Point(self.x + move_x, self.y + move_y)
-            if world.is_passable(next_pos): world.move_object(self, next_pos); self.move_cooldown = ANIMAL_MOVE_COOLDOWN
+            if step_toward(world, self, self.target_pos): self.move_cooldown = ANIMAL_MOVE_COOLDOWN
             else: self.target_pos = None
 
 class Wolf(WorldObject):
+    __slots__ = ('move_cooldown', 'target', 'health', 'detour')
     def __init__(self, pos: Point):
-        super().__init__(pos); self.move_cooldown = 0; self.target: Optional[Agent] = None; self.health = 30
+        super().__init__(pos); self.move_cooldown = 0; self.target: Optional[Agent] = None; self.health = 30; self.detour: List[Point] = []
     
     def update(self, world: 'World'):
         self.move_cooldown = max(0, self.move_cooldown - 1)
         if self.move_cooldown > 0: return
         if self.target and (self.target.health <= 0 or self.pos.distance_to(self.target.pos) > 10): self.target = None
-        if not self.target: self.target = world.find_nearest(self.pos, lambda o: isinstance(o, Agent) and o.is_adult())
+        if not self.target: self.detour = []; self.target = world.find_nearest(self.pos, lambda o: o.is_adult(), Agent)
         if self.target:
             if self.pos.distance_to(self.target.pos) < 2:
                  self.target.health -= 5
                  if self.target.health <= 0: self.target = None
                  self.move_cooldown = 10
-            else:
-                dx = self.target.pos.x - self.x; dy = self.target.pos.y - self.y
-                move_x = 1 if dx > 0 else -1 if dx < 0 else 0; move_y = 1 if dy > 0 else -1 if dy < 0 else 0
-                next_pos = Point(self.x + move_x, self.y + move_y)
-                if world.is_passable(next_pos): world.move_object(self, next_pos); self.move_cooldown = ANIMAL_MOVE_COOLDOWN
+            elif step_toward(world, self, self.target.pos): self.move_cooldown = ANIMAL_MOVE_COOLDOWN
 
 class Agent(WorldObject):
+    __slots__ = ('agent_id', 'role', 'gender', 'age', 'is_adult_val', 'energy', 'hydration', 'health', 'state', 'state_timer',
+                 'path', 'target_object', 'target_pos', 'on_arrival', 'partner', 'home', 'is_pregnant', 'pregnancy_timer',
+                 'inventory', 'tool', 'workplace', 'path_ticket')
     def __init__(self, pos: Point, agent_id: int, role: AgentRole, gender: Gender, start_age: int = 0):
         super().__init__(pos); self.agent_id=agent_id; self.role=role; self.gender=gender; self.age=start_age
         self.is_adult_val = self.age >= ADULT_AGE_THRESHOLD; self.energy=AGENT_MAX_ENERGY; self.hydration=AGENT_MAX_HYDRATION
         self.health=AGENT_MAX_HEALTH; self.state=AgentState.IDLE; self.state_timer=0; self.path:List[Point]=[];
         self.target_object:Optional[WorldObject]=None; self.target_pos:Optional[Point]=None; self.on_arrival:Optional[Callable]=None
         self.partner:Optional[Agent]=None; self.home:Optional[Shelter]=None; self.is_pregnant=False; self.pregnancy_timer=0
-        self.inventory:Dict[str, int]=defaultdict(int); self.tool:Optional[Tool]=None
+        self.inventory:Inventory=Inventory(); self.tool:Optional[Tool]=None; self.workplace:Optional[ProductionBuilding]=None
+        self.path_ticket = 0 # Outstanding request to world.pathfinding while WAITING_FOR_PATH; cleared by World.remove_object
 
     def is_adult(self) -> bool: return self.is_adult_val
 
@@ -88,7 +105,7 @@ class Agent(WorldObject):
         if self.health <= 0 or self.energy <= 0 or self.hydration <= 0:
             reason = "health" if self.health<=0 else "energy" if self.energy<=0 else "hydration"
             logging.warning(f"AGENT DEATH: ID {self.agent_id} died from low {reason}.")
-            self.release_claim(); world.remove_object(self); return
+            self.release_claim(); self._leave_workplace(world); world.remove_object(self); return
         if self.state == AgentState.MOVING and not self._execute_move(world):
             arrived = self.on_arrival and ((self.target_object and self.pos.distance_to(self.target_object.pos)<2) or (self.target_pos and self.pos==self.target_pos))
             callback, target = self.on_arrival, self.target_object or self.target_pos
@@ -97,6 +114,11 @@ class Agent(WorldObject):
             if arrived and callback: callback(world, target)
             else: self.state = AgentState.IDLE; self.state_timer = ACTION_COOLDOWN
         if self.state_timer == 0: self.run_state_machine(world)
+        if self.workplace and (self.pos.distance_to(self.workplace.pos) > 2 or self.state not in (AgentState.WORKING, AgentState.MOVING)):
+            self._leave_workplace(world)
+
+    def _leave_workplace(self, world: 'World'):
+        if self.workplace: world.production.release_worker(self.workplace, self, world)
 
     def release_claim(self):
         if self.target_object and hasattr(self.target_object, 'claimed_by') and self.target_object.claimed_by == self:
@@ -107,7 +129,7 @@ class Agent(WorldObject):
         self.path, self.target_object, self.target_pos, self.on_arrival = [], None, None, None
 
     def run_state_machine(self, world: 'World'):
-        if self.state == AgentState.MOVING: return
+        if self.state in (AgentState.MOVING, AgentState.WAITING_FOR_PATH): return
         is_builder = self.role == AgentRole.BUILDER
         has_directive = isinstance(world.oracle.directive.value, StructureType)
         if is_builder and has_directive and self._do_builder_tasks(world): return
@@ -122,42 +144,40 @@ class Agent(WorldObject):
         next_pos = self.path[0]
         if world.is_passable(next_pos, ignore_agents=True) or (len(self.path) == 1 and self.target_object):
             world.record_path_usage(self.pos); world.move_object(self, self.path.pop(0)); self.energy -= 0.5; return bool(self.path)
+        elif world.path_repair is not None and world.path_repair.repair(self, 0): return self._execute_move(world)
         else:
             logging.debug(f"Agent {self.agent_id}: Path blocked at {next_pos}. Aborting move."); self.path = []; return False
 
     def _handle_child_state(self, world: 'World'):
-        if not self.home: self.home = world.find_nearest(self.pos, lambda o: isinstance(o, Shelter) and len(o.occupants) < 2)
+        if not self.home: self.home = world.find_nearest(self.pos, lambda o: len(o.occupants) < 2, Shelter)
         if self.home and self.pos.distance_to(self.home.pos) > CHILD_WANDER_RADIUS: self._set_target_pos(world, self.home.pos)
-        elif random.random() < 0.1:
-            target = Point(self.home.pos.x + random.randint(-CHILD_WANDER_RADIUS, CHILD_WANDER_RADIUS), self.home.pos.y + random.randint(-CHILD_WANDER_RADIUS, CHILD_WANDER_RADIUS))
+        elif world.rng.agents.random() < 0.1:
+            rng = world.rng.agents
+            target = Point(self.home.pos.x + rng.randint(-CHILD_WANDER_RADIUS, CHILD_WANDER_RADIUS), self.home.pos.y + rng.randint(-CHILD_WANDER_RADIUS, CHILD_WANDER_RADIUS))
             self._set_target_pos(world, target)
-        else: self.state_timer = random.randint(20, 50)
+        else: self.state_timer = world.rng.agents.randint(20, 50)
 
     def _seek_food(self, world: 'World'):
         self.state = AgentState.SEEKING_FOOD
-        food_key = ResourceType.FOOD.resource_name; meat_key = ResourceType.MEAT.resource_name; fish_key = ResourceType.FISH.resource_name
-        if self.home and self.home.inventory[food_key] > 0: self._eat_from_storage(world, self.home); return
-        if world.global_inventory[food_key] > 0 or world.global_inventory[meat_key] > 0 or world.global_inventory[fish_key] > 0:
-            self._eat_from_storage(world, None); return
+        if self.home and self.home.inventory.count(ResourceType.FOOD.item_id) > 0: self._eat_from_storage(world, self.home); return
+        if world.global_inventory.aggregate("food") > 0: self._eat_from_storage(world, None); return
         self.state_timer = 20
 
     def _eat_from_storage(self, world: 'World', storage):
-        food_key = ResourceType.FOOD.resource_name
         if storage:
-            storage.inventory[food_key] -= 1
+            storage.inventory.add(ResourceType.FOOD.item_id, -1)
             self.energy = min(AGENT_MAX_ENERGY, self.energy + ENERGY_PER_FOOD)
             logging.info(f"Agent {self.agent_id}: Ate food from shelter. Energy now {self.energy:.1f}.")
         else:
-            for food_type in [ResourceType.FOOD, ResourceType.MEAT, ResourceType.FISH]:
-                if world.global_inventory[food_type.resource_name] > 0:
-                    world.global_inventory[food_type.resource_name] -= 1
+            for food_type in FOOD_TYPES:
+                if world.global_inventory.transact(consume=((food_type.item_id, 1),)):
                     self.energy = min(AGENT_MAX_ENERGY, self.energy + ENERGY_PER_FOOD)
                     logging.info(f"Agent {self.agent_id}: Ate {food_type.resource_name}. Energy now {self.energy:.1f}."); break
         self.state = AgentState.IDLE
 
     def _seek_water(self, world: 'World'):
         self.state = AgentState.SEEKING_WATER
-        well = world.find_nearest(self.pos, lambda o: isinstance(o, Well))
+        well = world.find_nearest(self.pos, category=Well)
         if well: self._set_target_object(world, well, on_arrival=self._drink_water); return
         water_pos = self._find_nearest_water_source(world)
         if water_pos: self._set_target_pos(world, water_pos, on_arrival=self._drink_water); return
@@ -176,7 +196,7 @@ class Agent(WorldObject):
     def _perform_role_task(self, world: 'World') -> bool:
         if self.role.required_tool and not self.tool: self._get_tool(world); return True
         role_tasks={AgentRole.LUMBERJACK:lambda:self._gather_resource(world,ResourceType.WOOD),
-                    AgentRole.MINER:lambda:self._gather_resource(world,random.choice([ResourceType.STONE,ResourceType.IRON_ORE])),
+                    AgentRole.MINER:lambda:self._gather_resource(world,world.rng.agents.choice([ResourceType.STONE,ResourceType.IRON_ORE])),
                     AgentRole.BUILDER:lambda:self._do_builder_tasks(world),
                     AgentRole.FARMER:lambda:self._work_at_building(world,Farm,StructureType.FARM),
                     AgentRole.BLACKSMITH:lambda:self._work_at_building(world,Blacksmith,StructureType.BLACKSMITH),
@@ -186,53 +206,52 @@ class Agent(WorldObject):
 
     def _get_tool(self, world: 'World'):
         tool_type = self.role.required_tool
-        if world.global_inventory[tool_type.tool_name] > 0:
-            world.global_inventory[tool_type.tool_name] -= 1; self.tool = Tool(tool_type)
+        if world.global_inventory.transact(consume=((tool_type.item_id, 1),)):
+            self.tool = Tool(tool_type)
             logging.info(f"Agent {self.agent_id} took {tool_type.tool_name} from global inventory.")
         else: self.state_timer = 30
 
     def _gather_resource(self, world: 'World', res_type: ResourceType) -> bool:
-        resource = world.find_nearest(self.pos, lambda o: isinstance(o, Resource) and o.resource_type == res_type and o.claimed_by is None)
+        resource = world.find_nearest(self.pos, lambda o: o.resource_type == res_type and o.claimed_by is None, Resource)
         if resource: resource.claimed_by = self; self._set_target_object(world, resource, on_arrival=self._harvest_resource); return True
         return False
 
     def _harvest_resource(self, world: 'World', resource: Resource):
         if resource not in world.get_objects_at(resource.pos): return
         if self.tool and not self.tool.use(): self.tool = None
-        world.remove_object(resource); world.global_inventory[resource.name] += 1
-        logging.info(f"Agent {self.agent_id}: Harvested {resource.name}, global stock: {world.global_inventory[resource.name]}.")
+        world.remove_object(resource); world.global_inventory.add(resource.resource_type.item_id, 1)
+        logging.info(f"Agent {self.agent_id}: Harvested {resource.name}, global stock: {world.global_inventory.count(resource.resource_type.item_id)}.")
         self._gather_resource(world, resource.resource_type)
 
     def _hunt_animal(self, world: 'World') -> bool:
-        deer = world.find_nearest(self.pos, lambda o: isinstance(o, Deer) and o.claimed_by is None)
+        deer = world.find_nearest(self.pos, lambda o: o.claimed_by is None, Deer)
         if deer: deer.claimed_by = self; self._set_target_object(world, deer, on_arrival=self._harvest_animal); return True
         return False
 
     def _harvest_animal(self, world: 'World', deer: Deer):
         if deer not in world.get_objects_at(deer.pos): return
-        world.remove_object(deer); world.global_inventory[ResourceType.MEAT.resource_name] += 5
-        logging.info(f"Agent {self.agent_id}: Hunted deer, global meat stock: {world.global_inventory[ResourceType.MEAT.resource_name]}.")
+        world.remove_object(deer); world.global_inventory.add(ResourceType.MEAT.item_id, 5)
+        logging.info(f"Agent {self.agent_id}: Hunted deer, global meat stock: {world.global_inventory.count(ResourceType.MEAT.item_id)}.")
         
     def _do_builder_tasks(self, world: 'World') -> bool:
-        site = world.find_nearest(self.pos, lambda o: isinstance(o, ConstructionSite) and o.needed_resources)
+        site = world.find_nearest(self.pos, lambda o: o.needed_resources, ConstructionSite)
         if site:
-            needed_res_name = next(iter(site.needed_resources.keys()))
-            if self.inventory.get(needed_res_name, 0) > 0:
+            needed_res_name = next(iter(site.needed_resources.keys())); needed_id = ITEM_IDS[needed_res_name]
+            if self.inventory.count(needed_id) > 0:
                 self._set_target_object(world, site, on_arrival=self._deliver_to_site); return True
             else:
-                if world.global_inventory[needed_res_name] > 0:
-                    world.global_inventory[needed_res_name] -= 1; self.inventory[needed_res_name] += 1
+                if world.global_inventory.transact(consume=((needed_id, 1),)):
+                    self.inventory.add(needed_id, 1)
                     logging.info(f"Agent {self.agent_id} took {needed_res_name} for construction.")
                     self._set_target_object(world, site, on_arrival=self._deliver_to_site); return True
                 else:
-                    try:
-                        resource_to_gather = next(res for res in ResourceType if res.resource_name == needed_res_name)
+                    resource_to_gather = RESOURCE_BY_NAME.get(needed_res_name)
+                    if resource_to_gather:
                         logging.debug(f"Agent {self.agent_id}: No {needed_res_name} in inventory, will go gather it.")
                         return self._gather_resource(world, resource_to_gather)
-                    except StopIteration:
-                        logging.warning(f"Agent {self.agent_id}: Needed resource {needed_res_name} is not gatherable. Waiting.")
-                        self.state_timer = 30
-                        return True
+                    logging.warning(f"Agent {self.agent_id}: Needed resource {needed_res_name} is not gatherable. Waiting.")
+                    self.state_timer = 30
+                    return True
         directive = world.oracle.directive
         if isinstance(directive.value, StructureType):
             structure_to_build = directive.value
@@ -268,18 +287,18 @@ class Agent(WorldObject):
             self.state_timer = 50 
 
     def _work_at_building(self, world: 'World', building_class: type, structure_type: StructureType) -> bool:
-        building = world.find_nearest(self.pos, lambda o: isinstance(o, building_class) and not o.worker)
+        building = world.find_nearest(self.pos, lambda o: not o.worker, building_class)
         if building: self._set_target_object(world, building, on_arrival=self._arrive_at_workplace); return True
         if self.role == AgentRole.BUILDER: self._build_structure(world, structure_type); return True
         return False
 
     def _arrive_at_workplace(self, world: 'World', building):
-        building.set_worker(self); self.state = AgentState.WORKING
+        world.production.assign_worker(building, self, world); self.state = AgentState.WORKING
         logging.info(f"Agent {self.agent_id} has started working at {building.__class__.__name__}.")
         
     def _wander(self, world: 'World'):
-        if random.random() < 0.05:
-            target = Point(self.x + random.randint(-5, 5), self.y + random.randint(-5, 5))
+        if world.rng.agents.random() < 0.05:
+            target = Point(self.x + world.rng.agents.randint(-5, 5), self.y + world.rng.agents.randint(-5, 5))
             self._set_target_pos(world, target)
         else: self.state_timer = 20
 
@@ -287,10 +306,12 @@ class Agent(WorldObject):
         if self.pos.distance_to(target.pos) < 2:
             if on_arrival: self.reset_task(); on_arrival(world, target)
             return
-        path = a_star_search(world, self.pos, target.pos)
+        if world.pathfinding is not None: self._request_path(world, target.pos, target, None, on_arrival); return
+        path = world.find_path(self.pos, target.pos)
         if path: 
             self.reset_task()
             self.path, self.target_object, self.state, self.on_arrival = path, target, AgentState.MOVING, on_arrival
+            if world.path_repair is not None: world.path_repair.track(self)
         else: 
             logging.warning(f"Agent {self.agent_id}: Could not find path to {target.__class__.__name__} at {target.pos}.")
             if isinstance(target, ConstructionSite):
@@ -299,10 +320,32 @@ class Agent(WorldObject):
             self.reset_task(); self.state_timer = 10
 
     def _set_target_pos(self, world: 'World', target_pos: Point, on_arrival: Optional[Callable] = None):
-        path = a_star_search(world, self.pos, target_pos)
-        if path: self.reset_task(); self.path, self.target_pos, self.state, self.on_arrival = path, target_pos, AgentState.MOVING, on_arrival
+        if world.pathfinding is not None: self._request_path(world, target_pos, None, target_pos, on_arrival); return
+        path = world.find_path(self.pos, target_pos)
+        if path:
+            self.reset_task(); self.path, self.target_pos, self.state, self.on_arrival = path, target_pos, AgentState.MOVING, on_arrival
+            if world.path_repair is not None: world.path_repair.track(self)
         else: self.state_timer = 10
 
+    def _request_path(self, world: 'World', goal: Point, target_object: Optional[WorldObject], target_pos: Optional[Point], on_arrival: Optional[Callable]):
+        """Asks world.pathfinding for a route and waits in WAITING_FOR_PATH until _path_ready delivers it."""
+        if goal == self.pos:
+            if isinstance(target_object, ConstructionSite): target_object.failed_path_attempts += 1
+            self.state_timer = 10; return
+        self.reset_task()
+        self.target_object, self.target_pos, self.on_arrival, self.state = target_object, target_pos, on_arrival, AgentState.WAITING_FOR_PATH
+        self.path_ticket = world.pathfinding.request(self, self.pos, goal)
+
+    def _path_ready(self, world: 'World', ticket: int, path: Optional[List[Point]]):
+        if self.state != AgentState.WAITING_FOR_PATH or ticket != self.path_ticket: return
+        if path:
+            self.path, self.state = path, AgentState.MOVING
+            if world.path_repair is not None: world.path_repair.track(self)
+            return
+        if self.target_object: logging.warning(f"Agent {self.agent_id}: Could not find path to {self.target_object.__class__.__name__} at {self.target_object.pos}.")
+        if isinstance(self.target_object, ConstructionSite): self.target_object.failed_path_attempts += 1
+        self.reset_task(); self.state = AgentState.IDLE; self.state_timer = 10
+
     def _find_nearest_water_source(self, world: 'World') -> Optional[Point]:
         if not world.water_distance_map: return None
         best_pos, min_dist = None, float('inf')
@@ -314,13 +357,15 @@ class Agent(WorldObject):
         return best_pos
         
 class Storage(WorldObject):
+    __slots__ = ('inventory', 'capacity')
     def __init__(self, pos: Point, capacity: int = 10):
-        super().__init__(pos); self.inventory = defaultdict(int); self.capacity = capacity
+        super().__init__(pos); self.inventory = Inventory(); self.capacity = capacity
     def has_space(self) -> bool: return sum(self.inventory.values()) < self.capacity
     def add_item(self, name: str, amount: int): self.inventory[name] += amount
-    def remove_item(self, name: str, amount: int): self.inventory[name] -= amount; self.inventory = defaultdict(int, {k:v for k,v in self.inventory.items() if v>0})
+    def remove_item(self, name: str, amount: int): self.inventory[name] = max(0, self.inventory[name] - amount)
     
 class Shelter(Storage):
+    __slots__ = ('occupants',)
     def __init__(self, pos: Point):
         super().__init__(pos); self.occupants: List[Agent] = []
     def add_occupant(self, agent: Agent):
@@ -329,68 +374,66 @@ class Shelter(Storage):
         if agent in self.occupants: self.occupants.remove(agent)
 
 class ProductionBuilding(WorldObject):
+    """A workplace. Production is event-scheduled by World.production rather than ticked: subclasses report the
+    cycle length their current inputs allow via production_cycle and apply one finished cycle in complete_cycle."""
+    __slots__ = ('worker', 'production_progress', 'running_since', 'cycle')
     def __init__(self, pos: Point):
         super().__init__(pos); self.worker: Optional[Agent] = None; self.production_progress = 0
+        self.running_since: Optional[int] = None; self.cycle = 0
     def set_worker(self, agent: Agent): self.worker = agent
     def remove_worker(self): self.worker = None
-    def update(self, world: 'World'):
-        if self.worker and (self.worker.pos.distance_to(self.pos) > 2 or self.worker.state not in [AgentState.WORKING, AgentState.MOVING]):
-            self.remove_worker()
+    def progress_at(self, tick: int) -> int:
+        return self.production_progress + (tick - self.running_since + 1 if self.running_since is not None and tick >= self.running_since else 0)
+    def production_cycle(self, world: 'World') -> Optional[int]: return None
+    def complete_cycle(self, world: 'World'): pass
 
 class Farm(ProductionBuilding):
-    def update(self, world: 'World'):
-        super().update(world)
-        if self.worker and not world.is_night():
-            self.production_progress += 1
-            if self.production_progress >= FARM_PRODUCTION_CYCLE:
-                self.production_progress = 0; world.global_inventory[ResourceType.FOOD.resource_name] += 5
-                logging.info(f"Farm at ({self.pos.x},{self.pos.y}) produced 5 food.")
-
-class LumberMill(ProductionBuilding): pass
-class Mine(ProductionBuilding): pass
-class Well(WorldObject): pass
+    __slots__ = ()
+    def production_cycle(self, world: 'World') -> Optional[int]: return None if world.is_night() else FARM_PRODUCTION_CYCLE
+    def complete_cycle(self, world: 'World'):
+        world.global_inventory.add(ResourceType.FOOD.item_id, 5)
+        logging.info(f"Farm at ({self.pos.x},{self.pos.y}) produced 5 food.")
+
+class LumberMill(ProductionBuilding): __slots__ = ()
+class Mine(ProductionBuilding): __slots__ = ()
+class Well(WorldObject): __slots__ = ()
 class FishingHut(ProductionBuilding):
-     def update(self, world: 'World'):
-        super().update(world)
-        if self.worker and self._is_near_water(world):
-            self.production_progress += 1
-            if self.production_progress >= 100:
-                self.production_progress = 0; world.global_inventory[ResourceType.FISH.resource_name] += 2
-                logging.info(f"Fishing Hut at ({self.pos.x},{self.pos.y}) produced 2 fish.")
+     __slots__ = ('near_water',)
+     def __init__(self, pos: Point):
+        super().__init__(pos); self.near_water = False
+     def production_cycle(self, world: 'World') -> Optional[int]: return FISHING_HUT_PRODUCTION_CYCLE if self.near_water else None
+     def complete_cycle(self, world: 'World'):
+        world.global_inventory.add(ResourceType.FISH.item_id, 2)
+        logging.info(f"Fishing Hut at ({self.pos.x},{self.pos.y}) produced 2 fish.")
      def _is_near_water(self, world: 'World'):
         for dx, dy in [(-1,0),(1,0),(0,-1),(0,1)]:
             p = Point(self.x+dx, self.y+dy)
             if 0<=p.x<world.width and 0<=p.y<world.height and world.terrain[p.y][p.x]==TerrainType.WATER: return True
         return False
 
-class HuntersLodge(ProductionBuilding): pass
+class HuntersLodge(ProductionBuilding): __slots__ = ()
 
 class Blacksmith(ProductionBuilding):
-    def update(self, world: 'World'):
-        super().update(world)
-        if not self.worker: return
-        iron_ore_key = ResourceType.IRON_ORE.resource_name; iron_ingot_key = ResourceType.IRON_INGOT.resource_name; wood_key = ResourceType.WOOD.resource_name
-        if world.global_inventory[iron_ore_key] > 0:
-            self.production_progress += 1
-            if self.production_progress >= BLACKSMITH_SMELT_TIME:
-                self.production_progress = 0; world.global_inventory[iron_ore_key] -= 1; world.global_inventory[iron_ingot_key] += 1
-                logging.info(f"Blacksmith smelted 1 Iron Ingot.")
-        elif world.global_inventory[iron_ingot_key] >= 3 and world.global_inventory[wood_key] >= 1:
-            self.production_progress += 1
-            if self.production_progress >= BLACKSMITH_CRAFT_TIME:
-                self.production_progress = 0
-                tool = random.choice([ToolType.AXE, ToolType.PICKAXE])
-                can_craft = all(world.global_inventory[res] >= amt for res, amt in tool.recipe.items())
-                if can_craft:
-                    for res, amt in tool.recipe.items(): world.global_inventory[res] -= amt
-                    world.global_inventory[tool.tool_name] += 1
-                    logging.info(f"Blacksmith at ({self.pos.x},{self.pos.y}) crafted 1 {tool.tool_name}.")
+    __slots__ = ()
+    def production_cycle(self, world: 'World') -> Optional[int]:
+        stock = world.global_inventory
+        if stock.count(ResourceType.IRON_ORE.item_id) > 0: return BLACKSMITH_SMELT_TIME
+        if stock.count(ResourceType.IRON_INGOT.item_id) >= 3 and stock.count(ResourceType.WOOD.item_id) >= 1: return BLACKSMITH_CRAFT_TIME
+        return None
+    def complete_cycle(self, world: 'World'):
+        if world.global_inventory.transact(consume=((ResourceType.IRON_ORE.item_id, 1),), produce=((ResourceType.IRON_INGOT.item_id, 1),)):
+            logging.info(f"Blacksmith smelted 1 Iron Ingot.")
+        elif self.production_cycle(world):
+            tool = world.rng.production.choice([ToolType.AXE, ToolType.PICKAXE])
+            if world.global_inventory.transact(consume=tool.recipe_ids, produce=((tool.item_id, 1),)):
+                logging.info(f"Blacksmith at ({self.pos.x},{self.pos.y}) crafted 1 {tool.tool_name}.")
 
 class ConstructionSite(WorldObject):
+    __slots__ = ('structure_type', 'needed_resources', 'is_complete', 'failed_path_attempts')
     def __init__(self, pos: Point, structure_type: StructureType):
         super().__init__(pos)
         self.structure_type = structure_type
-        self.needed_resources = defaultdict(int, structure_type.recipe)
+        self.needed_resources = Inventory(structure_type.recipe)
         self.is_complete = not self.needed_resources
         self.failed_path_attempts = 0
         
@@ -0,0 +1,377 @@
+import heapq
+import logging
+from abc import ABC, abstractmethod
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from config import *
+from utils import AgentState, Point, TerrainType
+
+if TYPE_CHECKING:
+    from objects import Agent
+    from simulation import World
+
+NEIGHBORS = [(0,1),(0,-1),(1,0),(-1,0),(1,1),(1,-1),(-1,1),(-1,-1)]
+Tile = Tuple[int, int]
+BLOCKED, OPEN, ROAD = 0, 1, 2 # Cell values of a SharedGrid
+
+class WorldGrid:
+    """The pathfinding view of a World: tiles passable ignoring agents, as agents walk through each other."""
+    def __init__(self, world: 'World'): self.world = world; self.width, self.height = world.width, world.height
+    def open(self, x: int, y: int) -> bool: return self.world.placement.is_passable(x, y, ignore_agents=True)
+    def is_road(self, x: int, y: int) -> bool: return self.world.terrain[y][x] == TerrainType.ROAD
+
+class SharedGrid:
+    """The same view over a flat shared-memory array of BLOCKED/OPEN/ROAD cells, readable from worker processes."""
+    def __init__(self, cells, width: int, height: int): self.cells = cells; self.width, self.height = width, height
+    def open(self, x: int, y: int) -> bool: return 0 <= x < self.width and 0 <= y < self.height and self.cells[y * self.width + x] != BLOCKED
+    def is_road(self, x: int, y: int) -> bool: return self.cells[y * self.width + x] == ROAD
+    @staticmethod
+    def cell(world: 'World', x: int, y: int) -> int:
+        if not world.placement.is_passable(x, y, ignore_agents=True): return BLOCKED
+        return ROAD if world.terrain[y][x] == TerrainType.ROAD else OPEN
+
+def _trace(came_from: Dict[Tile, Tile], tile: Tile) -> List[Tile]:
+    path = []
+    while tile in came_from: path.append(tile); tile = came_from[tile]
+    return path[::-1]
+
+class Pathfinder(ABC):
+    """A search over an 8-connected grid view (see WorldGrid) where every move costs step_cost of the tile entered.
+
+    find_path returns the tiles from the first step through goal, [] if start == goal, or None if the goal is
+    unreachable. The goal itself may always be entered, so a path can end on a blocked tile such as a building.
+    `expanded` counts the nodes the last search expanded.
+    """
+    name = ""
+    def __init__(self): self.expanded = 0
+    def step_cost(self, grid, x: int, y: int) -> float: return 1
+    def heuristic(self, x: int, y: int, goal: Tile) -> float: return max(abs(x - goal[0]), abs(y - goal[1])) # Exact on an empty map
+    @abstractmethod
+    def find_path(self, grid, start: Tile, goal: Tile) -> Optional[List[Tile]]: ...
+
+class AStar(Pathfinder):
+    """Plain A* with a closed set and a lazily pruned open heap."""
+    name = "astar"
+    def find_path(self, grid, start: Tile, goal: Tile) -> Optional[List[Tile]]:
+        self.expanded = 0
+        if start == goal: return []
+        came_from: Dict[Tile, Tile] = {}; gscore = {start: 0}; closed = set(); seq = 0
+        heap = [(self.heuristic(*start, goal), 0, 0, start)]
+        while heap:
+            _, _, _, current = heapq.heappop(heap)
+            if current == goal: return _trace(came_from, current)
+            if current in closed: continue
+            closed.add(current); self.expanded += 1; g = gscore[current]
+            for dx, dy in NEIGHBORS:
+                nx, ny = current[0] + dx, current[1] + dy; neighbor = (nx, ny)
+                if neighbor in closed or not (neighbor == goal or grid.open(nx, ny)): continue
+                tentative = g + self.step_cost(grid, nx, ny)
+                if tentative < gscore.get(neighbor, float('inf')):
+                    gscore[neighbor] = tentative; came_from[neighbor] = current; seq += 1
+                    heapq.heappush(heap, (tentative + self.heuristic(nx, ny, goal), -tentative, seq, neighbor)) # Deeper first on ties
+        return None
+
+class RoadWeightedAStar(AStar):
+    """A* where entering a road costs ROAD_STEP_COST instead of 1, so routes bend toward the colony's roads."""
+    name = "road"
+    def step_cost(self, grid, x: int, y: int) -> float: return ROAD_STEP_COST if 0 <= x < grid.width and 0 <= y < grid.height and grid.is_road(x, y) else 1
+    def heuristic(self, x: int, y: int, goal: Tile) -> float: return max(abs(x - goal[0]), abs(y - goal[1])) * ROAD_STEP_COST
+
+class BidirectionalAStar(Pathfinder):
+    """A* run from both ends at once, expanding whichever frontier is smaller, which keeps long routes around
+    rivers and lakes from flooding one whole side of the map. Stops once either frontier's best f reaches the
+    cheapest meeting found, which is then optimal."""
+    name = "bidirectional"
+    def find_path(self, grid, start: Tile, goal: Tile) -> Optional[List[Tile]]:
+        self.expanded = 0
+        if start == goal: return []
+        ends = (start, goal); targets = (goal, start)
+        gs = ({start: 0}, {goal: 0}); parents: Tuple[Dict[Tile, Tile], Dict[Tile, Tile]] = ({}, {})
+        heaps = ([(self.heuristic(*start, goal), start)], [(self.heuristic(*goal, start), goal)]); closed = (set(), set())
+        best, meet = float('inf'), None
+        while heaps[0] and heaps[1]:
+            if max(heaps[0][0][0], heaps[1][0][0]) >= best: break
+            side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+            _, current = heapq.heappop(heaps[side])
+            if current in closed[side]: continue
+            closed[side].add(current); self.expanded += 1
+            g, other_g = gs[side][current], gs[1 - side]
+            for dx, dy in NEIGHBORS:
+                nx, ny = current[0] + dx, current[1] + dy; neighbor = (nx, ny)
+                if neighbor in closed[side] or not (neighbor in ends or grid.open(nx, ny)): continue
+                tentative = g + 1
+                if tentative < gs[side].get(neighbor, float('inf')):
+                    gs[side][neighbor] = tentative; parents[side][neighbor] = current
+                    heapq.heappush(heaps[side], (tentative + self.heuristic(nx, ny, targets[side]), neighbor))
+                    if neighbor in other_g and tentative + other_g[neighbor] < best: best, meet = tentative + other_g[neighbor], neighbor
+        if meet is None: return None
+        path = _trace(parents[0], meet); tile = meet
+        while tile != goal: tile = parents[1][tile]; path.append(tile)
+        return path
+
+class JumpPointSearch(Pathfinder):
+    """Jump Point Search: A* that only expands the jump points where an optimal path can turn, scanning straight
+    and diagonal runs of open tiles in between. Moves may cut corners, as in the other backends.
+
+    Runs stop after JPS_MAX_JUMP tiles. Unbounded runs scan to the next obstacle or the map edge in every
+    direction, and each diagonal step scans two straight runs, so even a query two tiles long could cost
+    milliseconds on an open map. With diagonals costing the same as straight steps, few tiles are prunable, and
+    in pure Python this stays a little slower than AStar (see `python benchmark.py pathfinders`).
+    """
+    name = "jps"
+    def find_path(self, grid, start: Tile, goal: Tile) -> Optional[List[Tile]]:
+        self.expanded = 0
+        if start == goal: return []
+        is_open = grid.open; gx, gy = goal
+        walkable = lambda x, y: is_open(x, y) or (x == gx and y == gy)
+        came_from: Dict[Tile, Tile] = {}; gscore = {start: 0}; closed = set(); seq = 0
+        heap = [(self.heuristic(*start, goal), 0, 0, start)]
+        while heap:
+            _, _, _, current = heapq.heappop(heap)
+            if current == goal: return self._expand_path(came_from, current)
+            if current in closed: continue
+            closed.add(current); self.expanded += 1; g = gscore[current]
+            for dx, dy in self._directions(walkable, current, came_from.get(current)):
+                point = self._jump(walkable, current[0], current[1], dx, dy, goal, JPS_MAX_JUMP)
+                if point is None or point in closed: continue
+                tentative = g + max(abs(point[0] - current[0]), abs(point[1] - current[1]))
+                if tentative < gscore.get(point, float('inf')):
+                    gscore[point] = tentative; came_from[point] = current; seq += 1
+                    heapq.heappush(heap, (tentative + self.heuristic(*point, goal), -tentative, seq, point))
+        return None
+
+    @staticmethod
+    def _directions(walkable, node: Tile, parent: Optional[Tile]) -> List[Tile]:
+        """Natural and forced neighbour directions of node when reached from parent (all eight at the start)."""
+        if parent is None: return NEIGHBORS
+        x, y = node; dx = (x > parent[0]) - (x < parent[0]); dy = (y > parent[1]) - (y < parent[1])
+        if dx and dy:
+            dirs = [(dx, 0), (0, dy), (dx, dy)]
+            if not walkable(x - dx, y): dirs.append((-dx, dy))
+            if not walkable(x, y - dy): dirs.append((dx, -dy))
+        elif dx:
+            dirs = [(dx, 0)]
+            if not walkable(x, y + 1): dirs.append((dx, 1))
+            if not walkable(x, y - 1): dirs.append((dx, -1))
+        else:
+            dirs = [(0, dy)]
+            if not walkable(x + 1, y): dirs.append((1, dy))
+            if not walkable(x - 1, y): dirs.append((-1, dy))
+        return dirs
+
+    @staticmethod
+    def _jump(walkable, x: int, y: int, dx: int, dy: int, goal: Tile, limit: int) -> Optional[Tile]:
+        """The next jump point from (x, y) in direction (dx, dy), or None if the run hits an obstacle first. A run
+        stops after `limit` tiles even without one, leaving the rest to be scanned if A* ever expands it."""
+        for _ in range(limit):
+            x += dx; y += dy
+            if not walkable(x, y): return None
+            if (x, y) == goal: return (x, y)
+            if dx and dy:
+                if (not walkable(x - dx, y) and walkable(x - dx, y + dy)) or (not walkable(x, y - dy) and walkable(x + dx, y - dy)): return (x, y)
+                if JumpPointSearch._jump(walkable, x, y, dx, 0, goal, limit) or JumpPointSearch._jump(walkable, x, y, 0, dy, goal, limit): return (x, y)
+            elif dx:
+                if (not walkable(x, y + 1) and walkable(x + dx, y + 1)) or (not walkable(x, y - 1) and walkable(x + dx, y - 1)): return (x, y)
+            elif (not walkable(x + 1, y) and walkable(x + 1, y + dy)) or (not walkable(x - 1, y) and walkable(x - 1, y + dy)): return (x, y)
+        return (x, y)
+
+    @staticmethod
+    def _expand_path(came_from: Dict[Tile, Tile], tile: Tile) -> List[Tile]:
+        """Fills in the straight and diagonal runs between consecutive jump points."""
+        path = []
+        while tile in came_from:
+            parent = came_from[tile]; dx = (tile[0] > parent[0]) - (tile[0] < parent[0]); dy = (tile[1] > parent[1]) - (tile[1] < parent[1])
+            run = []; x, y = parent
+            while (x, y) != tile: x += dx; y += dy; run.append((x, y))
+            path = run + path; tile = parent
+        return path
+
+PATHFINDERS = {cls.name: cls for cls in (AStar, JumpPointSearch, BidirectionalAStar, RoadWeightedAStar)}
+
+# Set in each worker process by _attach. A service without a pool passes its own grid instead, as several worlds
+# may share the parent process.
+_grid: Optional[SharedGrid] = None
+
+def _attach(cells, width: int, height: int):
+    global _grid
+    _grid = SharedGrid(cells, width, height)
+
+def _solve(job: Tuple[str, Tile, List[Tile]], grid: Optional[SharedGrid] = None) -> List[Optional[List[Tile]]]:
+    """Paths (first step to goal) from each start to a shared goal with the named backend over grid (in a worker,
+    the attached one); None where unreachable.
+
+    A goal on a blocked tile (a building, say) is approached from one of its four open sides, so every agent
+    bound for the same building shares a single search: one reverse search from the goal answers all starts.
+    """
+    if grid is None: grid = _grid
+    name, goal, starts = job; pathfinder = PATHFINDERS[name](); blocked = not grid.open(*goal)
+    if len(starts) > 1: return _reverse_search(grid, pathfinder, goal, starts, blocked)
+    start = starts[0]
+    if blocked:
+        sides = [(goal[0] + dx, goal[1] + dy) for dx, dy in NEIGHBORS[:4] if grid.open(goal[0] + dx, goal[1] + dy)]
+        if not sides: return [None]
+        goal = min(sides, key=lambda t: max(abs(t[0] - start[0]), abs(t[1] - start[1])))
+    return [pathfinder.find_path(grid, start, goal) or None]
+
+def _reverse_search(grid: SharedGrid, pathfinder: Pathfinder, goal: Tile, starts: List[Tile], blocked: bool) -> List[Optional[List[Tile]]]:
+    """Dijkstra outward from the goal, over the backend's step costs, until every start is settled."""
+    pending = set(starts); pending.discard(goal); dist = {goal: 0}; toward_goal: Dict[Tile, Tile] = {}; heap = [(0, goal)]; done = set()
+    while heap and pending:
+        d, current = heapq.heappop(heap)
+        if current in done: continue
+        done.add(current); pending.discard(current)
+        if current != goal and not grid.open(*current): continue # Starts may stand on blocked tiles, but searches never pass through them
+        nd = d + pathfinder.step_cost(grid, *current) # Walking forward from a neighbour onto current costs entering current
+        for dx, dy in NEIGHBORS[:4] if blocked and current == goal else NEIGHBORS:
+            neighbor = (current[0] + dx, current[1] + dy)
+            if neighbor in done or not (grid.open(*neighbor) or neighbor in pending): continue
+            if nd < dist.get(neighbor, float('inf')): dist[neighbor] = nd; toward_goal[neighbor] = current; heapq.heappush(heap, (nd, neighbor))
+    paths = []
+    for start in starts:
+        if start == goal or start not in toward_goal: paths.append(None); continue
+        path = []; tile = start
+        while tile != goal: tile = toward_goal[tile]; path.append(tile)
+        paths.append(path[:-1] if blocked else path)
+    return [path or None for path in paths]
+
+class PathRepair:
+    """Keeps routes valid as the world changes with small local searches instead of full replans.
+
+    Agents register a route with track when they start walking it. When World.add_object blocks a tile it calls
+    on_blocked, and every tracked agent whose remaining path crosses that tile gets the blocked stretch spliced
+    out: a search from the step before the blockage that may rejoin the path at any of the next
+    PATH_REPAIR_LOOKAHEAD tiles, minimising the cost of the whole spliced route under the World's pathfinder and
+    giving up after PATH_REPAIR_MAX_EXPANSIONS nodes. A route that cannot be saved that way is cut short before
+    the blockage, so the agent walks up to it and then replans as before. Deer and wolves use steer to get
+    around whatever their straight-line step runs into.
+    """
+    def __init__(self, world: 'World', lookahead: int = PATH_REPAIR_LOOKAHEAD, budget: int = PATH_REPAIR_MAX_EXPANSIONS):
+        self.world = world; self.lookahead = lookahead; self.budget = budget
+        self.walkers: Dict[object, set] = {} # agent -> every tile its route has held since track, a superset of the path
+        self.repairs = 0; self.failures = 0; self.expanded = 0
+
+    def __len__(self): return len(self.walkers)
+    def discard(self, agent): self.walkers.pop(agent, None)
+
+    def track(self, agent: 'Agent'):
+        if agent.path: self.walkers[agent] = {(p.x, p.y) for p in agent.path}
+        else: self.walkers.pop(agent, None)
+
+    def on_blocked(self, pos: Point):
+        """Repairs every tracked route through pos, which has just become impassable."""
+        tile = (pos.x, pos.y); shared: Dict[tuple, Optional[List[Tile]]] = {}
+        for agent, tiles in list(self.walkers.items()):
+            if agent.state != AgentState.MOVING or not agent.path: del self.walkers[agent]; continue
+            if tile in tiles and pos in agent.path: self.repair(agent, agent.path.index(pos), shared)
+
+    def repair(self, agent: 'Agent', i: int, shared: Optional[Dict[tuple, Optional[List[Tile]]]] = None) -> bool:
+        """Splices a detour around agent.path[i] into the path. If there is none within the lookahead and budget,
+        cuts the path before i and returns False. Routes running the same course around the blockage share one
+        search through `shared`, which is only valid while the grid is unchanged."""
+        path = agent.path; end = len(path) - 1
+        if i == end and agent.target_object is not None: return True # Routes to an object may end on its (blocked) tile
+        anchor = path[i - 1] if i else agent.pos; behind = [agent.pos] + path[:max(0, i - 1)]
+        rejoin: Dict[Tile, int] = {}
+        for j in range(i + 1, min(end, i + self.lookahead) + 1):
+            tile = (path[j].x, path[j].y)
+            if tile != (anchor.x, anchor.y) and (self.world.path_grid.open(*tile) or (j == end and agent.target_object is not None)): rejoin[tile] = j
+        detour = None
+        if rejoin:
+            step_cost, grid = self.world.pathfinder.step_cost, self.world.path_grid; rest = 0; goals: Dict[Tile, float] = {}
+            for j in range(max(rejoin.values()), i, -1): # Cost left from each rejoin tile to the last one
+                tile = (path[j].x, path[j].y)
+                if tile in rejoin and tile not in goals: goals[tile] = rest
+                rest += step_cost(grid, *tile)
+            avoid = tuple((p.x, p.y) for p in behind[-self.lookahead:]) # Never double back along the route
+            key = ((anchor.x, anchor.y), avoid, tuple(goals.items()))
+            if shared is not None and key in shared: detour = shared[key]
+            else: detour = self.detour((anchor.x, anchor.y), goals, avoid)
+            if shared is not None: shared[key] = detour
+        if detour is None: self.failures += 1; agent.path = path[:i]; return False
+        agent.path = path[:i] + [Point.at(x, y) for x, y in detour] + path[rejoin[detour[-1]] + 1:]
+        self.walkers.setdefault(agent, set()).update(detour); self.repairs += 1
+        return True
+
+    def steer(self, start: Point, goal: Point) -> Optional[List[Point]]:
+        """A short route around an obstacle for an animal heading for goal, or None if goal is not reachable locally."""
+        if not self.world.path_grid.open(goal.x, goal.y): return None
+        detour = self.detour((start.x, start.y), {(goal.x, goal.y): 0})
+        return None if detour is None else [Point.at(x, y) for x, y in detour]
+
+    def detour(self, start: Tile, goals: Dict[Tile, float], avoid: List[Tile] = ()) -> Optional[List[Tile]]:
+        """Budgeted A* from start to whichever goal minimises search cost plus that goal's remaining cost. Remaining
+        costs run to the goal with none left, and walking there from any other goal costs at least the heuristic
+        between them, so the heuristic to that one goal bounds every candidate."""
+        pathfinder, grid = self.world.pathfinder, self.world.path_grid; final = min(goals, key=goals.get)
+        h = lambda x, y: pathfinder.heuristic(x, y, final)
+        came_from: Dict[Tile, Tile] = {}; gscore = {start: 0}; closed = set(avoid); closed.discard(start); seq = 0; budget = self.budget
+        heap = [(h(*start), 0, start)]
+        while heap and budget > 0:
+            _, _, current = heapq.heappop(heap)
+            if current in goals: return _trace(came_from, current) # Goals are queued at their exact total, so this one is cheapest
+            if current in closed: continue
+            closed.add(current); budget -= 1; self.expanded += 1
+            for dx, dy in NEIGHBORS:
+                nx, ny = current[0] + dx, current[1] + dy; neighbor = (nx, ny)
+                if neighbor in closed or not (neighbor in goals or grid.open(nx, ny)): continue
+                tentative = gscore[current] + pathfinder.step_cost(grid, nx, ny)
+                if tentative < gscore.get(neighbor, float('inf')):
+                    gscore[neighbor] = tentative; came_from[neighbor] = current; seq += 1
+                    heapq.heappush(heap, (tentative + (goals[neighbor] if neighbor in goals else h(nx, ny)), seq, neighbor))
+        return None
+
+class PathfindingService:
+    """Solves agent path requests off the simulation thread and delivers them on a later tick.
+
+    Requests queued during a tick are grouped by goal when the tick ends, so any number of agents heading for the
+    same site share one search, and each group is handed to a process pool. Workers read passability from a
+    SharedGrid that the World keeps current as structures and roads come and go, and search with the World's
+    selected backend. Finished searches are delivered at the start of the first tick after they complete, through
+    Agent._path_ready; the simulation only waits on a batch once it is PATHFINDING_MAX_WAIT_TICKS old. With no
+    workers the searches run inline at the end of the tick instead, with the same one-tick delivery.
+    """
+    def __init__(self, world: 'World', workers: int = PATHFINDING_WORKERS):
+        self.width, self.height = world.width, world.height; self.backend = world.pathfinder.name
+        self.grid = RawArray('b', world.width * world.height)
+        for y in range(world.height):
+            for x in range(world.width): self.grid[y * world.width + x] = SharedGrid.cell(world, x, y)
+        self.pool = multiprocessing.Pool(workers, _attach, (self.grid, world.width, world.height)) if workers > 0 else None
+        self.inline = SharedGrid(self.grid, world.width, world.height) if self.pool is None else None
+        self.queued: Dict[Tile, Dict[Tile, List[tuple]]] = {} # goal -> start -> [(agent, ticket)]
+        self.in_flight: List[tuple] = []; self.next_ticket = 0
+
+    def on_tile_changed(self, world: 'World', pos: Point):
+        self.grid[pos.y * self.width + pos.x] = SharedGrid.cell(world, pos.x, pos.y)
+
+    def request(self, agent: 'Agent', start: Point, goal: Point) -> int:
+        self.next_ticket += 1
+        self.queued.setdefault((goal.x, goal.y), {}).setdefault((start.x, start.y), []).append((agent, self.next_ticket))
+        return self.next_ticket
+
+    def submit(self, tick: int):
+        """Dispatches this tick's requests as one batch holding a search per distinct goal."""
+        if not self.queued: return
+        groups = list(self.queued.items()); jobs = [(self.backend, goal, list(by_start)) for goal, by_start in groups]
+        result = self.pool.map_async(_solve, jobs) if self.pool else [_solve(job, self.inline) for job in jobs]
+        self.in_flight.append((tick, result, jobs, groups)); self.queued = {}
+
+    def deliver(self, world: 'World'):
+        """Hands finished paths to their agents. Batches still running are left for a later tick unless they are
+        PATHFINDING_MAX_WAIT_TICKS old, in which case they are awaited so a slow pool cannot strand agents."""
+        still_running = []
+        for entry in self.in_flight:
+            tick, result, jobs, groups = entry
+            if self.pool:
+                if not result.ready() and world.step_count - tick < PATHFINDING_MAX_WAIT_TICKS: still_running.append(entry); continue
+                result = result.get()
+            for (_, goal, starts), paths, (_, by_start) in zip(jobs, result, groups):
+                for start, path in zip(starts, paths):
+                    for agent, ticket in by_start[start]: agent._path_ready(world, ticket, [Point.at(x, y) for x, y in path] if path else None)
+        self.in_flight = still_running
+
+    def close(self):
+        if self.pool: self.pool.terminate(); self.pool.join(); self.pool = None
+        self.queued = {}; self.in_flight = []
+        logging.info("Pathfinding service stopped.")
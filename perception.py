@@ -0,0 +1,76 @@
+import math
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from config import *
+from utils import Point
+
+if TYPE_CHECKING:
+    from simulation import World
+
+class PerceptionView:
+    """The objects of one category in one neighbourhood, sorted by distance from the neighbourhood's centre."""
+    __slots__ = ('cx', 'cy', 'distances', 'objects')
+    def __init__(self, cx: int, cy: int, entries: List[Tuple[int, Any]]):
+        self.cx = cx; self.cy = cy
+        self.distances = [d for d, _ in entries]; self.objects = [o for _, o in entries]
+
+class PerceptionCache:
+    """Shared perception for World.find_nearest, so agents standing close together stop repeating the same scan.
+
+    A neighbourhood is the window of spatial-hash cells a radius query from a point covers; every point with the
+    same window sees exactly the same candidates. Views are built on first use and registered with every cell of
+    their window; adding, removing or moving an object of their category (which World reports through
+    on_add/on_remove/on_move) drops only the views covering the cells it left or entered. A query walks the view in
+    order of distance from the window's centre and stops once the triangle inequality rules out anything closer
+    than the best match, so it usually touches only a handful of candidates.
+    """
+    def __init__(self, world: 'World', radius: int = AGENT_VIEW_DISTANCE * 3):
+        self.world = world; self.radius = radius
+        self.views: Dict[tuple, PerceptionView] = {}
+        self.categories: Dict[Any, None] = {} # Every category queried so far
+        self.covering: Dict[tuple, Dict[tuple, None]] = {} # (category, cell) -> keys of the views whose window holds it
+
+    def _touch(self, obj, x: int, y: int):
+        cs = self.world.objects_grid.cell_size; cell = (x // cs, y // cs)
+        for category in self.categories:
+            if isinstance(obj, category):
+                for key in self.covering.pop((category, cell), ()): self.views.pop(key, None)
+    def on_add(self, obj): self._touch(obj, obj.x, obj.y)
+    def on_remove(self, obj): self._touch(obj, obj.x, obj.y)
+    def on_move(self, obj, old_pos: Point):
+        self._touch(obj, old_pos.x, old_pos.y)
+        cs = self.world.objects_grid.cell_size
+        if (old_pos.x // cs, old_pos.y // cs) != (obj.x // cs, obj.y // cs): self._touch(obj, obj.x, obj.y)
+    def clear(self): self.views.clear(); self.covering.clear()
+
+    def window(self, pos: Point) -> Tuple[int, int, int, int]:
+        cs, r = self.world.objects_grid.cell_size, self.radius
+        return ((pos.x - r) // cs, (pos.y - r) // cs, (pos.x + r) // cs, (pos.y + r) // cs)
+
+    def view(self, pos: Point, category) -> PerceptionView:
+        window = self.window(pos); key = (window, category)
+        view = self.views.get(key)
+        if view is None:
+            self.categories[category] = None; view = self.views[key] = self._build(window, category)
+            x0, y0, x1, y1 = window
+            for x in range(x0, x1 + 1):
+                for y in range(y0, y1 + 1): self.covering.setdefault((category, (x, y)), {})[key] = None
+        return view
+
+    def _build(self, window: Tuple[int, int, int, int], category) -> PerceptionView:
+        grid, cs = self.world.objects_grid.grid, self.world.objects_grid.cell_size
+        x0, y0, x1, y1 = window; cx, cy = (x0 + x1 + 1) * cs // 2, (y0 + y1 + 1) * cs // 2
+        entries = [(abs(o.x - cx) + abs(o.y - cy), o) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)
+                   for o in grid.get((x, y), ()) if isinstance(o, category)]
+        entries.sort(key=lambda e: e[0])
+        return PerceptionView(cx, cy, entries)
+
+    def nearest(self, pos: Point, category, condition: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """The closest (Manhattan) object of category in pos's neighbourhood that satisfies condition."""
+        view = self.view(pos, category); px, py = pos.x, pos.y
+        offset = abs(px - view.cx) + abs(py - view.cy); best, best_d = None, math.inf
+        for center_d, obj in zip(view.distances, view.objects):
+            if center_d - offset >= best_d: break
+            d = abs(obj.x - px) + abs(obj.y - py)
+            if d < best_d and (condition is None or condition(obj)): best, best_d = obj, d
+        return best
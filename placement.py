@@ -0,0 +1,182 @@
+import math
+import random
+from array import array
+from collections import deque
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+
+from config import *
+from objects import Agent, Resource, ProductionBuilding, Shelter, ConstructionSite, Well
+from utils import Point, TerrainType
+
+if TYPE_CHECKING:
+    from simulation import World
+
+STRUCTURE_TYPES = (ProductionBuilding, Shelter, ConstructionSite, Well)
+NEIGHBORS = [(0,1),(0,-1),(1,0),(-1,0),(1,1),(1,-1),(-1,1),(-1,-1)]
+FREE, BUILDABLE, NEAR_WATER = 0, 1, 2 # Placement pools, see PlacementIndex._pools_for
+WATER, STRUCTURE, AGENT, RESOURCE = 1, 2, 4, 8 # Bits of PlacementIndex.mask
+
+class TileSet:
+    """A set of tiles, held as flat y * width + x indices, with O(1) add, discard and random choice.
+
+    `slots` maps a flat index to its position in items, or -1 while absent; TileSets that can never hold the
+    same tile (the distance bands of one pool) share a single slots array.
+    """
+    __slots__ = ('width', 'items', 'slots')
+    def __init__(self, width: int, slots: array): self.width = width; self.items = array('i'); self.slots = slots
+    def __len__(self): return len(self.items)
+    def add(self, i: int):
+        if self.slots[i] < 0: self.slots[i] = len(self.items); self.items.append(i)
+    def discard(self, i: int):
+        j = self.slots[i]
+        if j < 0: return
+        self.slots[i] = -1; last = self.items.pop()
+        if j < len(self.items): self.items[j] = last; self.slots[last] = j
+    def choice(self, rng: random.Random) -> Tuple[int, int]: y, x = divmod(rng.choice(self.items), self.width); return x, y
+    def tiles(self) -> List[Tuple[int, int]]: w = self.width; return [(i % w, i // w) for i in self.items]
+
+class AnchorBands:
+    """Tiles of every placement pool, bucketed by integer distance band from one anchor point."""
+    def __init__(self, anchor: Point, width: int, height: int):
+        self.anchor = anchor; self.width = width
+        max_band = int(math.hypot(max(anchor.x, width - 1 - anchor.x), max(anchor.y, height - 1 - anchor.y)))
+        slots = [array('i', [-1]) * (width * height) for _ in range(3)]
+        self.pools = [[TileSet(width, slots[pool]) for _ in range(max_band + 1)] for pool in range(3)]
+    def band_of(self, x: int, y: int) -> int: return int(math.hypot(x - self.anchor.x, y - self.anchor.y))
+    def update(self, x: int, y: int, pools: Tuple[bool, bool, bool]):
+        band = self.band_of(x, y); i = y * self.width + x
+        for pool, member in enumerate(pools):
+            if member: self.pools[pool][band].add(i)
+            else: self.pools[pool][band].discard(i)
+    def bands(self, pool: int, radius: int) -> List[TileSet]:
+        return [b for b in self.pools[pool][int(radius * 0.2):int(radius) + 1] if b]
+
+class PlacementIndex:
+    """Incrementally maintained occupancy and placement index for a World.
+
+    Tracks per-tile counts of structures, resources and agents, folded with water into a flat bitmask (`mask`, one
+    byte of WATER/STRUCTURE/AGENT/RESOURCE bits per y * width + x) so passability is one lookup, and keeps
+    free, buildable and near-water buildable tiles bucketed by distance band around the anchor points that
+    placement queries are made from. Picking a uniformly random non-empty band and then a random tile in it
+    reproduces the radial distribution of the old polar rejection sampling without the rejections.
+    """
+    def __init__(self, world: 'World'):
+        self.world = world
+        self.structures: Dict[Tuple[int, int], int] = {}; self.resources: Dict[Tuple[int, int], int] = {}; self.agents: Dict[Tuple[int, int], int] = {}
+        self.near_water: Set[Tuple[int, int]] = set()
+        self.anchors: Dict[Point, AnchorBands] = {}
+        self.components: Optional[List[List[int]]] = None # 8-connected regions of tiles passable ignoring agents
+        self.mask = bytearray(world.width * world.height)
+
+    def rebuild(self, near_water: Optional[Set[Tuple[int, int]]] = None):
+        """Recomputes terrain-derived data and every anchor; call after terrain generation. A precomputed near_water is used as is."""
+        w = self.world; self.near_water = near_water
+        if near_water is None:
+            self.near_water = set()
+            for y in range(w.height):
+                for x in range(w.width):
+                    if w.terrain[y][x] == TerrainType.WATER:
+                        for ny in range(max(0, y-2), min(w.height, y+3)):
+                            for nx in range(max(0, x-2), min(w.width, x+3)): self.near_water.add((nx, ny))
+        self.mask = bytearray(w.width * w.height)
+        for y, row in enumerate(w.terrain):
+            for x, terrain in enumerate(row):
+                if terrain == TerrainType.WATER: self.mask[y * w.width + x] = WATER
+        for bit, counts in ((STRUCTURE, self.structures), (AGENT, self.agents), (RESOURCE, self.resources)):
+            for x, y in counts: self.mask[y * w.width + x] |= bit
+        for anchor in list(self.anchors): self.anchors[anchor] = self._build_anchor(anchor)
+        self.components = None
+
+    def on_add(self, obj, pos: Point): self._adjust(obj, (pos.x, pos.y), 1)
+    def on_remove(self, obj, pos: Point): self._adjust(obj, (pos.x, pos.y), -1)
+
+    def _adjust(self, obj, tile: Tuple[int, int], delta: int):
+        if isinstance(obj, STRUCTURE_TYPES): counts = self.structures; bit = STRUCTURE
+        elif isinstance(obj, Resource): counts = self.resources; bit = RESOURCE
+        elif isinstance(obj, Agent): counts = self.agents; bit = AGENT
+        else: return
+        count = counts.get(tile, 0) + delta; i = tile[1] * self.world.width + tile[0]
+        if count > 0: counts[tile] = count; self.mask[i] |= bit
+        else: counts.pop(tile, None); self.mask[i] &= ~bit
+        if counts is self.structures and count in (0, 1): self.components = None
+        if self.anchors:
+            pools = self._pools_for(*tile)
+            for bands in self.anchors.values(): bands.update(tile[0], tile[1], pools)
+
+    def is_passable(self, x: int, y: int, for_building: bool = False, ignore_agents: bool = False) -> bool:
+        w = self.world
+        if not (0 <= x < w.width and 0 <= y < w.height): return False
+        return not self.mask[y * w.width + x] & (WATER | STRUCTURE | (0 if ignore_agents else AGENT) | (RESOURCE if for_building else 0))
+
+    def _pools_for(self, x: int, y: int) -> Tuple[bool, bool, bool]:
+        free = self.is_passable(x, y)
+        buildable = free and (x, y) not in self.resources
+        return free, buildable, buildable and (x, y) in self.near_water
+
+    def _build_anchor(self, anchor: Point) -> AnchorBands:
+        bands = AnchorBands(anchor, self.world.width, self.world.height)
+        for y in range(self.world.height):
+            for x in range(self.world.width): bands.update(x, y, self._pools_for(x, y))
+        return bands
+
+    def _anchor(self, center: Point) -> Optional[AnchorBands]:
+        if center not in self.anchors:
+            if len(self.anchors) >= PLACEMENT_MAX_ANCHORS: return None
+            self.anchors[center] = self._build_anchor(center)
+        return self.anchors[center]
+
+    def _label_components(self):
+        w = self.world; labels = [[-1] * w.width for _ in range(w.height)]; label = 0
+        for sy in range(w.height):
+            for sx in range(w.width):
+                if labels[sy][sx] != -1 or not self.is_passable(sx, sy, ignore_agents=True): continue
+                labels[sy][sx] = label; q = deque([(sx, sy)])
+                while q:
+                    x, y = q.popleft()
+                    for dx, dy in NEIGHBORS:
+                        nx, ny = x + dx, y + dy
+                        if 0 <= nx < w.width and 0 <= ny < w.height and labels[ny][nx] == -1 and self.is_passable(nx, ny, ignore_agents=True):
+                            labels[ny][nx] = label; q.append((nx, ny))
+                label += 1
+        self.components = labels
+
+    def reachable_labels(self, start: Point) -> Set[int]:
+        """Components an A* search from start can reach: its own plus those of its passable neighbours."""
+        if self.components is None: self._label_components()
+        labels = set()
+        for dx, dy in NEIGHBORS + [(0, 0)]:
+            x, y = start.x + dx, start.y + dy
+            if 0 <= x < self.world.width and 0 <= y < self.world.height and self.components[y][x] != -1: labels.add(self.components[y][x])
+        return labels
+
+    def _is_valid_site(self, tile: Tuple[int, int], reach: Optional[Set[int]]) -> bool:
+        for dx, dy in NEIGHBORS:
+            x, y = tile[0] + dx, tile[1] + dy
+            if self.is_passable(x, y, ignore_agents=True) and (reach is None or self.components[y][x] in reach): return True
+        return False
+
+    def find_spot(self, center: Point, radius: int, pool: int, check_path_from: Optional[Point] = None,
+                  predicate: Optional[Callable[[int, int], bool]] = None) -> Optional[Point]:
+        """Returns a random tile of the pool within [0.2, 1] * radius of center, or None if no such tile exists."""
+        validate = pool != FREE
+        reach = self.reachable_labels(check_path_from) if validate and check_path_from else None
+        ok = lambda t: (not validate or self._is_valid_site(t, reach)) and (predicate is None or predicate(*t))
+        anchor = self._anchor(center); rng = self.world.rng.placement
+        if anchor:
+            bands = anchor.bands(pool, radius)
+            if not bands: return None
+            for _ in range(PLACEMENT_SAMPLE_ATTEMPTS):
+                tile = rng.choice(bands).choice(rng)
+                if ok(tile): return Point(*tile)
+            candidates = [t for band in bands for t in band.tiles()]
+        else:
+            candidates = self._scan(center, radius, pool)
+        rng.shuffle(candidates)
+        return next((Point(*t) for t in candidates if ok(t)), None)
+
+    def _scan(self, center: Point, radius: int, pool: int) -> List[Tuple[int, int]]:
+        w = self.world; lo, hi = int(radius * 0.2), int(radius); tiles = []
+        for y in range(max(0, center.y - hi), min(w.height, center.y + hi + 1)):
+            for x in range(max(0, center.x - hi), min(w.width, center.x + hi + 1)):
+                if lo <= int(math.hypot(x - center.x, y - center.y)) <= hi and self._pools_for(x, y)[pool]: tiles.append((x, y))
+        return tiles
@@ -0,0 +1,79 @@
+import heapq
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from config import *
+from objects import Agent, ProductionBuilding, Farm, FishingHut, Blacksmith
+
+if TYPE_CHECKING:
+    from simulation import World
+
+class ProductionEngine:
+    """Event scheduler for ProductionBuilding output.
+
+    A building only produces while it has a worker and its production_cycle is not None. Whenever one of those
+    inputs changes (worker assigned or released, day/night transition for farms, global inventory changes for
+    blacksmiths) the building's progress is banked and, if it is still running, a single completion event is
+    pushed for the tick its progress will reach the cycle length. Buildings that are simply progressing cost
+    nothing per tick. Stale heap entries are skipped by comparing against each building's schedule token.
+    """
+    def __init__(self):
+        self.events: List[Tuple[int, int, int, ProductionBuilding]] = []; self.tokens: Dict[ProductionBuilding, int] = {}
+        self.seq = 0; self.was_night = False; self.inventory_version = -1
+        self.farms: Dict[Farm, None] = {}; self.blacksmiths: Dict[Blacksmith, None] = {} # Staffed buildings with time- or stock-dependent inputs, in staffing order
+
+    def register(self, world: 'World', building: ProductionBuilding):
+        if isinstance(building, FishingHut): building.near_water = building._is_near_water(world)
+
+    def assign_worker(self, building: ProductionBuilding, agent: Agent, world: 'World'):
+        if building.worker and building.worker is not agent: building.worker.workplace = None
+        building.set_worker(agent); agent.workplace = building
+        if isinstance(building, Farm): self.farms[building] = None
+        if isinstance(building, Blacksmith): self.blacksmiths[building] = None
+        self.reschedule(world, building)
+
+    def release_worker(self, building: ProductionBuilding, agent: Agent, world: 'World'):
+        agent.workplace = None
+        if building.worker is not agent: return
+        building.remove_worker(); self.farms.pop(building, None); self.blacksmiths.pop(building, None)
+        self.reschedule(world, building)
+
+    def reschedule(self, world: 'World', building: ProductionBuilding):
+        """Banks progress counted before this tick and schedules the next completion from the current inputs."""
+        tick = world.step_count
+        if building.running_since is not None:
+            building.production_progress += max(0, tick - building.running_since); building.running_since = None
+        self.tokens[building] = self.tokens.get(building, 0) + 1
+        cycle = building.production_cycle(world) if building.worker else None
+        if cycle is None: return
+        building.cycle = cycle; building.running_since = tick
+        self._push(tick + max(1, cycle - building.production_progress) - 1, building)
+
+    def _push(self, due: int, building: ProductionBuilding):
+        self.seq += 1; heapq.heappush(self.events, (due, self.seq, self.tokens[building], building))
+
+    def step(self, world: 'World'):
+        tick = world.step_count
+        is_night = world.is_night()
+        if is_night != self.was_night:
+            self.was_night = is_night
+            for farm in list(self.farms): self.reschedule(world, farm)
+        version = world.global_inventory.version
+        if self.blacksmiths and version != self.inventory_version:
+            for blacksmith in list(self.blacksmiths): self.reschedule(world, blacksmith)
+        self.inventory_version = version
+        while self.events and self.events[0][0] <= tick:
+            due, _, token, building = heapq.heappop(self.events)
+            if token != self.tokens.get(building): continue
+            building.production_progress = 0; building.running_since = tick + 1
+            building.complete_cycle(world)
+            self._push(tick + building.cycle, building)
+
+    def compact(self, live: set, apply: bool = True) -> int:
+        """Forgets buildings that left the world and drops superseded heap entries; returns how many entries were stale."""
+        stale = [b for b in self.tokens if b not in live]
+        events = [e for e in self.events if e[3] in live and e[2] == self.tokens.get(e[3])]
+        if apply:
+            for building in stale: del self.tokens[building]
+            self.farms = {b: None for b in self.farms if b in live}; self.blacksmiths = {b: None for b in self.blacksmiths if b in live}
+            heapq.heapify(events); self.events = events
+        return len(stale) + len(self.events) - len(events)
@@ -1,15 +1,22 @@
-import random
 import logging
-import math
 from collections import defaultdict, deque
-from typing import Dict, List, Optional, Callable, Any
+from typing import TYPE_CHECKING, Dict, List, Optional, Callable, Any, Tuple
 
 from config import *
 from objects import (Agent, Resource, Shelter, Farm, LumberMill, 
                      Mine, Blacksmith, ConstructionSite, Tool, Deer,
                      Well, FishingHut, HuntersLodge, ProductionBuilding, Wolf)
 from utils import (Point, AgentRole, AgentState, ResourceType, StructureType, 
-                   TerrainType, ToolType, Gender, Directive, SpatialHash, a_star_search)
+                   TerrainType, ToolType, Gender, Directive, SpatialHash, Ledger, RandomStreams, FOOD_TYPES, ITEM_IDS, ITEM_SPRITES)
+from placement import PlacementIndex, FREE, BUILDABLE, NEAR_WATER
+from herd import HerdEngine, HERD_TYPES
+from production import ProductionEngine
+from perception import PerceptionCache
+from pathfinding import PathfindingService, PathRepair, WorldGrid, PATHFINDERS
+from lod import LODScheduler
+
+if TYPE_CHECKING:
+    from worlds import SharedTerrain
 
 class Oracle:
     """The AI 'brain' for the civilization, determining high-level goals."""
@@ -21,47 +28,72 @@ class Oracle:
             return
         num_agents = len(world.get_all_agents())
         if num_agents == 0: return
-        inventory = world.get_global_inventory()
+        inventory = world.global_inventory
         structures = world.get_all_structures()
         num_shelters = len([s for s in structures if isinstance(s, Shelter)])
         has_well = any(isinstance(s, Well) for s in structures)
         old_directive = self.directive
-        food_count = (inventory.get(ResourceType.FOOD.resource_name, 0) + 
-                      inventory.get(ResourceType.FISH.resource_name, 0) + 
-                      inventory.get(ResourceType.MEAT.resource_name, 0))
+        food_count = inventory.aggregate("food")
         if not has_well: self.directive = Directive.BUILD_WELL
         elif food_count < num_agents * 5:
             if not any(isinstance(s, (Farm, FishingHut, HuntersLodge)) for s in structures):
                 if world.is_terrain_present(TerrainType.WATER): self.directive = Directive.BUILD_FISHING_HUT
                 else: self.directive = Directive.BUILD_FARM
-        elif inventory.get(ResourceType.WOOD.resource_name, 0) < num_agents * 8 and not any(isinstance(s, LumberMill) for s in structures):
+        elif inventory.count(ResourceType.WOOD.item_id) < num_agents * 8 and not any(isinstance(s, LumberMill) for s in structures):
             self.directive = Directive.BUILD_LUMBER_MILL
-        elif inventory.get(ResourceType.STONE.resource_name, 0) < num_agents * 5 and not any(isinstance(s, Mine) for s in structures):
+        elif inventory.count(ResourceType.STONE.item_id) < num_agents * 5 and not any(isinstance(s, Mine) for s in structures):
             self.directive = Directive.BUILD_MINE
         elif num_shelters < (num_agents / 2) + 1: self.directive = Directive.BUILD_SHELTER
-        elif not any(isinstance(s, Blacksmith) for s in structures) and inventory.get(ResourceType.IRON_ORE.resource_name, 0) > 5:
+        elif not any(isinstance(s, Blacksmith) for s in structures) and inventory.count(ResourceType.IRON_ORE.item_id) > 5:
              self.directive = Directive.BUILD_BLACKSMITH
         else: self.directive = Directive.STOCKPILE_RESOURCES
         if old_directive != self.directive: 
             logging.info(f"ORACLE: New directive set to {self.directive.name}")
 
+class WorldObserver:
+    """Hooks for components that mirror or record world changes; register with World.add_observer."""
+    def on_add(self, obj): pass
+    def on_remove(self, obj): pass
+    def on_move(self, obj, old_pos: Point): pass
+    def on_terrain_changed(self, pos: Point): pass
+    def on_tick(self, world: 'World'): pass
+
 class World:
     """Manages all objects, terrain, and the main simulation state."""
-    def __init__(self, width: int, height: int):
+    def __init__(self, width: int, height: int, herd_engine: bool = HERD_ENGINE_ENABLED, async_pathfinding: bool = ASYNC_PATHFINDING, lod: bool = LOD_ENABLED, pathfinder: str = PATHFINDER,
+                 path_repair: bool = PATH_REPAIR, seed: Optional[int] = None, max_animals: int = MAX_ANIMALS):
         self.width, self.height = width, height
+        self.max_animals = max_animals # Deer population cap for spawn_animal; raise it with herd_engine for large herds
+        self.rng = RandomStreams(seed) # Every simulation draw goes through these, never the global random module
         self.step_count = 0
         self.time_of_day = 0
-        self.terrain: List[List[TerrainType]] = [[TerrainType.GRASS for _ in range(width)] for _ in range(height)]
+        self.terrain: List[List[TerrainType]] = [[TerrainType.GRASS for _ in range(width)] for _ in range(height)] # Rows may be shared tuples; write with set_terrain
         self.path_usage: Dict[Point, int] = defaultdict(int)
         self.objects_grid = SpatialHash(CELL_SIZE)
         self.next_agent_id = 0
         self.oracle = Oracle()
-        self.global_inventory = defaultdict(int)
+        self.global_inventory = Ledger(aggregates={"food": tuple(f.item_id for f in FOOD_TYPES)})
         self.water_distance_map: Optional[List[List[int]]] = None
+        self.placement = PlacementIndex(self)
+        self.perception = PerceptionCache(self)
+        self.herd: Optional[HerdEngine] = HerdEngine() if herd_engine else None
+        self.production = ProductionEngine()
+        self.observers: List[WorldObserver] = []
+        self.compaction_interval = COMPACTION_INTERVAL
+        self.pathfinder = PATHFINDERS[pathfinder](); self.path_grid = WorldGrid(self)
+        self.path_repair = PathRepair(self) if path_repair else None
+        self.async_pathfinding = async_pathfinding
+        self.pathfinding: Optional[PathfindingService] = None # Started by initialize_world when async_pathfinding is set
+        self.lod: Optional[LODScheduler] = LODScheduler() if lod else None
+        self.viewports: List[Tuple[int, int, int, int]] = [] # Observed (x0, y0, x1, y1) rectangles, simulated at full detail
     
-    def initialize_world(self):
-        self._generate_terrain()
-        self._calculate_water_distance_map()
+    def initialize_world(self, terrain: Optional['SharedTerrain'] = None):
+        """Generates terrain, or attaches a read-only SharedTerrain (see worlds.py), then spawns the starting colony."""
+        if terrain is None:
+            self._generate_terrain()
+            self._calculate_water_distance_map()
+            self.index_terrain()
+        else: terrain.attach(self)
         start_pos = Point(self.width // 2, self.height // 2)
         if self.terrain[start_pos.y][start_pos.x] == TerrainType.WATER:
             empty_spot = self.find_empty_spot_near(start_pos, 10)
@@ -69,8 +101,8 @@ class World:
             else: start_pos = Point(1,1)
 
         logging.info("Initializing global inventory.")
-        self.global_inventory[ToolType.AXE.tool_name] += 2
-        self.global_inventory[ToolType.PICKAXE.tool_name] += 2
+        self.global_inventory.add(ToolType.AXE.item_id, 2)
+        self.global_inventory.add(ToolType.PICKAXE.item_id, 2)
         for _ in range(25):
             self.spawn_resource_near(start_pos, ResourceType.WOOD, 20)
             self.spawn_resource_near(start_pos, ResourceType.STONE, 20)
@@ -82,23 +114,34 @@ class World:
             if not spawn_pos:
                 logging.error(f"Could not find a valid spawn location for agent {i}. Skipping.")
                 continue
-            role = AgentRole.BUILDER if i % 4 == 0 else random.choice(starter_roles)
+            role = AgentRole.BUILDER if i % 4 == 0 else self.rng.spawns.choice(starter_roles)
             self.spawn_agent(pos=spawn_pos, gender=Gender.MALE if i < STARTING_AGENTS / 2 else Gender.FEMALE, role=role, start_age=ADULT_AGE_THRESHOLD)
 
         for _ in range(40): self.spawn_resource()
         for _ in range(8): self.spawn_animal()
 
+    def index_terrain(self, near_water: Optional[set] = None):
+        """Builds everything derived from freshly generated or loaded terrain (see worldgen.WorldgenCache)."""
+        self.placement.rebuild(near_water)
+        if self.async_pathfinding: self.pathfinding = PathfindingService(self)
+
     def update(self):
         self.step_count += 1
         self.time_of_day = (self.time_of_day + 1) % DAY_NIGHT_DURATION
+        if self.pathfinding is not None: self.pathfinding.deliver(self)
         self.oracle.update_directive(self)
         if self.step_count % RESOURCE_REGEN_INTERVAL == 0: self.spawn_resource()
         if self.step_count % ANIMAL_SPAWN_INTERVAL == 0: self.spawn_animal()
         if self.step_count % ROAD_UPDATE_INTERVAL == 0: self._update_roads()
         
-        all_objects = self.get_all_objects()
+        if self.herd is not None: self.herd.step(self)
+        self.production.step(self)
+        if self.lod is not None: self.lod.wake(self)
+        all_objects = self.get_all_objects(); parked = self.lod.parked if self.lod is not None else ()
         for obj in all_objects:
-            if hasattr(obj, 'update'): obj.update(self)
+            if self.herd is not None and isinstance(obj, HERD_TYPES): continue
+            if obj in parked or not hasattr(obj, 'update') or (self.lod is not None and self.lod.park(self, obj)): continue
+            obj.update(self)
 
         if self.step_count % 10 == 0:
             sites = [obj for obj in all_objects if isinstance(obj, ConstructionSite)]
@@ -111,6 +154,9 @@ class World:
         
         for site in [obj for obj in all_objects if isinstance(obj, ConstructionSite) and obj.is_complete]:
             self.complete_construction(site)
+        if self.compaction_interval and self.step_count % self.compaction_interval == 0: self.compact()
+        if self.pathfinding is not None: self.pathfinding.submit(self.step_count)
+        for observer in self.observers: observer.on_tick(self)
 
     def spawn_agent(self, gender: Gender, role: AgentRole, pos: Point, start_age: int = 0):
         agent = Agent(pos, self.next_agent_id, role, gender, start_age=start_age)
@@ -132,12 +178,90 @@ class World:
         else:
             logging.error(f"ATTEMPTED TO CREATE SITE AT INVALID LOCATION: {pos}")
 
-    def add_object(self, obj): self.objects_grid.add(obj)
-    def remove_object(self, obj): self.objects_grid.remove(obj)
+    def add_object(self, obj):
+        self.objects_grid.add(obj); self.placement.on_add(obj, obj.pos); self.perception.on_add(obj)
+        if self.herd is not None and isinstance(obj, HERD_TYPES): self.herd.add(obj, self.step_count)
+        if isinstance(obj, ProductionBuilding): self.production.register(self, obj)
+        if self.pathfinding is not None: self.pathfinding.on_tile_changed(self, obj.pos)
+        if self.path_repair is not None and not self.placement.is_passable(obj.x, obj.y, ignore_agents=True): self.path_repair.on_blocked(obj.pos)
+        for observer in self.observers: observer.on_add(obj)
+    def remove_object(self, obj):
+        if not self.objects_grid.remove(obj): return
+        self.placement.on_remove(obj, obj.pos); self.perception.on_remove(obj)
+        if self.herd is not None: self.herd.discard(obj)
+        if self.lod is not None: self.lod.discard(obj)
+        if self.path_repair is not None: self.path_repair.discard(obj)
+        if self.pathfinding is not None:
+            self.pathfinding.on_tile_changed(self, obj.pos)
+            if isinstance(obj, Agent): obj.path_ticket = 0 # Tickets start at 1, so a path still in flight is dropped on delivery
+        for observer in self.observers: observer.on_remove(obj)
     def move_object(self, obj, new_pos: Point):
         old_pos = obj.pos
         obj.set_pos(new_pos)
-        self.objects_grid.move(obj, old_pos)
+        if self.objects_grid.move(obj, old_pos): self.placement.on_remove(obj, old_pos)
+        self.placement.on_add(obj, new_pos); self.perception.on_move(obj, old_pos)
+        for observer in self.observers: observer.on_move(obj, old_pos)
+    def move_objects(self, moves: List[Tuple[Any, Point]]):
+        """move_object for a batch of (object, new position), such as one HerdEngine pass, in a single loop."""
+        grid, placement, perception, observers = self.objects_grid, self.placement, self.perception, self.observers
+        for obj, new_pos in moves:
+            old_pos = Point.at(obj.x, obj.y); obj.x, obj.y = new_pos.x, new_pos.y
+            if grid.move(obj, old_pos): placement.on_remove(obj, old_pos)
+            placement.on_add(obj, new_pos); perception.on_move(obj, old_pos)
+            for observer in observers: observer.on_move(obj, old_pos)
+
+    def compact(self, apply: bool = True) -> Dict[str, int]:
+        """Finds references to objects that are no longer in the world and clears them (unless apply is False).
+
+        Objects leave the grid in one place but can stay reachable from shelters, partners, claims, workplaces,
+        wolf targets and the production schedule; this also drops empty grid buckets and path-usage counts for
+        tiles that can never become roads. Returns how many entries of each kind were found.
+        """
+        live = set(self.get_all_objects()); found: Dict[str, int] = defaultdict(int)
+        dead = lambda ref: ref is not None and ref not in live
+        for obj in live:
+            if isinstance(obj, Shelter):
+                stale = [a for a in obj.occupants if a not in live]
+                if stale: found["occupants"] += len(stale)
+                if apply and stale: obj.occupants = [a for a in obj.occupants if a in live]
+            elif isinstance(obj, Agent):
+                for attr in ("partner", "home", "workplace"):
+                    if dead(getattr(obj, attr)):
+                        found[attr] += 1
+                        if apply: setattr(obj, attr, None)
+            elif isinstance(obj, ProductionBuilding) and dead(obj.worker):
+                found["worker"] += 1
+                if apply: self.production.release_worker(obj, obj.worker, self)
+            elif isinstance(obj, Wolf) and dead(obj.target):
+                found["prey"] += 1
+                if apply: obj.target = None
+            if isinstance(obj, (Resource, Deer)) and dead(obj.claimed_by):
+                found["claimed_by"] += 1
+                if apply: obj.claimed_by = None
+        if self.herd is not None:
+            for i, target in enumerate(self.herd.prey):
+                if dead(target):
+                    found["prey"] += 1
+                    if apply: self.herd.prey[i] = None
+        found["production_events"] = self.production.compact(live, apply)
+        if self.path_repair is not None:
+            found["walkers"] = sum(1 for agent in self.path_repair.walkers if agent not in live)
+            if apply:
+                for agent in [a for a in self.path_repair.walkers if a not in live or a.state != AgentState.MOVING]: self.path_repair.discard(agent)
+        stale_usage = [pos for pos in self.path_usage if self.terrain[pos.y][pos.x] != TerrainType.GRASS]; found["path_usage"] = len(stale_usage)
+        found["empty_cells"] = sum(1 for bucket in self.objects_grid.grid.values() if not bucket)
+        if apply:
+            for pos in stale_usage: del self.path_usage[pos]
+            self.objects_grid.compact(); self.perception.clear()
+        return dict(found)
+
+    def close(self):
+        """Releases background resources (the pathfinding worker pool)."""
+        if self.pathfinding is not None: self.pathfinding.close(); self.pathfinding = None
+
+    def add_observer(self, observer: WorldObserver): self.observers.append(observer)
+    def remove_observer(self, observer: WorldObserver):
+        if observer in self.observers: self.observers.remove(observer)
 
     def get_objects_at(self, pos: Point) -> List: return self.objects_grid.get_at(pos)
     def get_all_objects(self) -> List: return self.objects_grid.get_all()
@@ -145,56 +269,48 @@ class World:
     def get_all_structures(self) -> List: return [o for o in self.get_all_objects() if isinstance(o, (ProductionBuilding, Shelter, Well))]
     
     def is_passable(self, pos: Point, for_building: bool = False, ignore_agents: bool = False) -> bool:
-        if not (0 <= pos.x < self.width and 0 <= pos.y < self.height): return False
-        if self.terrain[pos.y][pos.x] == TerrainType.WATER: return False
-        objects_at_pos = self.get_objects_at(pos)
-        obstacle_types = [ProductionBuilding, Shelter, ConstructionSite, Well]
-        if for_building: obstacle_types.append(Resource)
-        if not ignore_agents: obstacle_types.append(Agent)
-        return not any(isinstance(o, tuple(obstacle_types)) for o in objects_at_pos)
+        return self.placement.is_passable(pos.x, pos.y, for_building=for_building, ignore_agents=ignore_agents)
 
     def is_night(self) -> bool: return self.time_of_day > DAY_NIGHT_DURATION / 2
 
-    def find_nearest(self, start_pos: Point, condition: Callable[[Any], bool]) -> Optional[Any]:
-        valid_targets = [obj for obj in self.objects_grid.query_radius(start_pos, AGENT_VIEW_DISTANCE * 3) if condition(obj)]
+    def find_nearest(self, start_pos: Point, condition: Optional[Callable[[Any], bool]] = None, category=None) -> Optional[Any]:
+        if category is not None: return self.perception.nearest(start_pos, category, condition)
+        valid_targets = [obj for obj in self.objects_grid.query_radius(start_pos, AGENT_VIEW_DISTANCE * 3) if condition is None or condition(obj)]
         if not valid_targets: return None
         return min(valid_targets, key=lambda obj: start_pos.distance_to(obj.pos))
 
+    def find_nearest_many(self, points: List[Point], category, condition: Optional[Callable[[Any], bool]] = None,
+                          k: int = 1, radius: int = AGENT_VIEW_DISTANCE * 3) -> List[List[Any]]:
+        """Batched find_nearest: the k nearest objects of a category within radius of each point, in one pass."""
+        return self.objects_grid.knn_batch(points, category, k=k, predicate=condition, max_radius=radius)
+
+    def find_path(self, start: Point, end: Point) -> Optional[List[Point]]:
+        """A path from start to end (excluding start) with the selected pathfinder; a blocked end is swapped for a
+        random open neighbour first. Returns None if no path exists and [] if already there."""
+        if not self.is_passable(end, ignore_agents=True):
+            adjacent = self.find_adjacent_empty(end)
+            if not adjacent:
+                logging.debug(f"Pathfinding: Cannot find any accessible adjacent tile to {end}")
+                return None
+            end = adjacent
+        path = self.pathfinder.find_path(self.path_grid, (start.x, start.y), (end.x, end.y))
+        return None if path is None else [Point.at(x, y) for x, y in path]
+
     def find_adjacent_empty(self, pos: Point) -> Optional[Point]:
         neighbors = [(-1,0), (1,0), (0,-1), (0,1), (-1,-1), (1,1), (-1,-1), (1,-1)]
-        random.shuffle(neighbors)
+        self.rng.paths.shuffle(neighbors)
         for dx, dy in neighbors:
             check_pos = Point(pos.x + dx, pos.y + dy)
             if self.is_passable(check_pos, ignore_agents=True): return check_pos
         return None
 
     def find_empty_spot_near(self, pos: Point, radius: int, for_building: bool = False, check_path_from: Optional[Point] = None) -> Optional[Point]:
-        for _ in range(100):
-            r = random.uniform(radius * 0.2, radius)
-            angle = random.uniform(0, 2 * math.pi)
-            check_pos = Point(int(pos.x + r * math.cos(angle)), int(pos.y + r * math.sin(angle)))
-            if 0 <= check_pos.x < self.width and 0 <= check_pos.y < self.height:
-                if self.is_passable(check_pos, for_building=for_building):
-                    if for_building:
-                        interaction_spot = self.find_adjacent_empty(check_pos)
-                        if not interaction_spot: continue
-                        if check_path_from and not a_star_search(self, check_path_from, interaction_spot): continue
-                    return check_pos
-        return None
+        return self.placement.find_spot(pos, radius, BUILDABLE if for_building else FREE, check_path_from=check_path_from)
     
     def find_spot_near_terrain(self, center: Point, radius: int, terrain_type: TerrainType, check_path_from: Optional[Point] = None) -> Optional[Point]:
-        for _ in range(150):
-            r = random.uniform(radius * 0.2, radius)
-            angle = random.uniform(0, 2 * math.pi)
-            check_pos = Point(int(center.x + r * math.cos(angle)), int(center.y + r * math.sin(angle)))
-            if 0 <= check_pos.x < self.width and 0 <= check_pos.y < self.height:
-                if self.is_passable(check_pos, for_building=True):
-                    if not self.is_near_terrain(check_pos, terrain_type, distance=2): continue
-                    interaction_spot = self.find_adjacent_empty(check_pos)
-                    if not interaction_spot: continue
-                    if check_path_from and not a_star_search(self, check_path_from, interaction_spot): continue
-                    return check_pos
-        return None
+        if terrain_type == TerrainType.WATER: return self.placement.find_spot(center, radius, NEAR_WATER, check_path_from=check_path_from)
+        return self.placement.find_spot(center, radius, BUILDABLE, check_path_from=check_path_from,
+                                        predicate=lambda x, y: self.is_near_terrain(Point(x, y), terrain_type, distance=2))
     
     def is_near_terrain(self, pos: Point, terrain_type: TerrainType, distance: int) -> bool:
         for y in range(pos.y - distance, pos.y + distance + 1):
@@ -207,33 +323,31 @@ class World:
         return any(terrain_type in row for row in self.terrain)
 
     def get_sprite_for_item_name(self, item_name: str) -> str:
-        for res_type in ResourceType:
-            if res_type.resource_name == item_name: return res_type.sprite
-        for tool_type in ToolType:
-            if tool_type.tool_name == item_name: return tool_type.sprite
-        return "?"
+        item_id = ITEM_IDS.get(item_name)
+        return "?" if item_id is None else ITEM_SPRITES[item_id]
 
     def get_global_inventory(self) -> Dict[str, int]:
-        return dict(self.global_inventory)
+        return self.global_inventory.snapshot()
 
     def _generate_terrain(self):
+        rng = self.rng.terrain
         for _ in range(5):
-            cx, cy, r = random.randint(0, self.width-1), random.randint(0, self.height-1), random.randint(3, 7)
+            cx, cy, r = rng.randint(0, self.width-1), rng.randint(0, self.height-1), rng.randint(3, 7)
             for y in range(self.height):
                 for x in range(self.width):
                     if Point(x,y).distance_to(Point(cx, cy)) <= r: self.terrain[y][x] = TerrainType.WATER
-        if random.random() < 0.5:
-            ry = random.randint(self.height // 4, self.height * 3 // 4)
+        if rng.random() < 0.5:
+            ry = rng.randint(self.height // 4, self.height * 3 // 4)
             for x in range(self.width):
-                if random.random() > 0.2:
+                if rng.random() > 0.2:
                     self.terrain[ry][x] = TerrainType.WATER
-                    if ry + 1 < self.height and random.random() > 0.4: self.terrain[ry+1][x] = TerrainType.WATER
+                    if ry + 1 < self.height and rng.random() > 0.4: self.terrain[ry+1][x] = TerrainType.WATER
         else:
-            rx = random.randint(self.width // 4, self.width * 3 // 4)
+            rx = rng.randint(self.width // 4, self.width * 3 // 4)
             for y in range(self.height):
-                 if random.random() > 0.2:
+                 if rng.random() > 0.2:
                     self.terrain[y][rx] = TerrainType.WATER
-                    if rx + 1 < self.width and random.random() > 0.4: self.terrain[y][rx+1] = TerrainType.WATER
+                    if rx + 1 < self.width and rng.random() > 0.4: self.terrain[y][rx+1] = TerrainType.WATER
 
     def _calculate_water_distance_map(self):
         logging.info("Calculating water distance map...")
@@ -254,7 +368,7 @@ class World:
         logging.info("Water distance map calculation complete.")
 
     def spawn_resource(self):
-        res_type = random.choice(list(ResourceType))
+        res_type = self.rng.spawns.choice(list(ResourceType))
         if res_type in [ResourceType.IRON_INGOT, ResourceType.FISH, ResourceType.MEAT]: return
         pos = self.find_empty_spot_near(Point(self.width//2, self.height//2), max(self.width, self.height)//2)
         if pos: self.add_object(Resource(pos, res_type))
@@ -263,19 +377,31 @@ class World:
         pos = self.find_empty_spot_near(center, radius)
         if pos: self.add_object(Resource(pos, res_type))
 
+    def count_objects(self, object_type: type) -> int:
+        if self.herd is not None and object_type in HERD_TYPES: return self.herd.count(object_type)
+        return len([o for o in self.get_all_objects() if isinstance(o, object_type)])
+
     def spawn_animal(self):
-        if len([o for o in self.get_all_objects() if isinstance(o, Deer)]) < MAX_ANIMALS:
+        if self.count_objects(Deer) < self.max_animals:
             pos = self.find_empty_spot_near(Point(self.width//2, self.height//2), max(self.width, self.height)//2)
             if pos: self.add_object(Deer(pos))
-        if len([o for o in self.get_all_objects() if isinstance(o, Wolf)]) < MAX_WOLVES and MAX_WOLVES > 0:
+        if MAX_WOLVES > 0 and self.count_objects(Wolf) < MAX_WOLVES:
             pos = self.find_empty_spot_near(Point(self.width//2, self.height//2), max(self.width, self.height)//2)
             if pos: self.add_object(Wolf(pos))
 
+    def set_terrain(self, pos: Point, terrain_type: TerrainType):
+        """Writes one tile, first copying its row if the row is a shared read-only tuple (see worlds.SharedTerrain)."""
+        row = self.terrain[pos.y]
+        if type(row) is tuple: row = self.terrain[pos.y] = list(row)
+        row[pos.x] = terrain_type
+
     def record_path_usage(self, pos: Point): self.path_usage[pos] += 1
 
     def _update_roads(self):
         for pos, usage in list(self.path_usage.items()):
             if usage > ROAD_BUILD_THRESHOLD and self.terrain[pos.y][pos.x] == TerrainType.GRASS:
-                self.terrain[pos.y][pos.x] = TerrainType.ROAD
+                self.set_terrain(pos, TerrainType.ROAD)
+                if self.pathfinding is not None: self.pathfinding.on_tile_changed(self, pos)
+                for observer in self.observers: observer.on_terrain_changed(pos)
             self.path_usage[pos] = int(usage * PATH_DECAY_RATE)
             if self.path_usage[pos] == 0: del self.path_usage[pos]
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""Long-run soak mode: `python soak.py --ticks 2000000` runs a headless world and looks for memory growth and leaks."""
+import argparse
+import csv
+import gc
+import logging
+import random
+import time
+import tracemalloc
+from collections import Counter
+from typing import Dict, List, Optional
+
+from config import *
+from simulation import World
+from utils import Point
+
+def structure_sizes(world: World) -> Dict[str, int]:
+    """Sizes of the world's long-lived containers, the usual suspects when a long run bloats."""
+    sizes = {"grid_cells": len(world.objects_grid.grid), "path_usage": len(world.path_usage),
+             "interned_points": sum(len(column) for column in Point._interned.values()),
+             "production_events": len(world.production.events), "production_tokens": len(world.production.tokens),
+             "placement_tiles": len(world.placement.structures) + len(world.placement.resources) + len(world.placement.agents),
+             "observers": len(world.observers), "ledger_listeners": len(world.global_inventory.listeners)}
+    if world.herd is not None: sizes["herd_slots"] = len(world.herd)
+    return sizes
+
+def sample(world: World) -> Dict[str, int]:
+    row = {"tick": world.step_count, "traced_bytes": tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0}
+    row.update(structure_sizes(world))
+    row.update({f"objects.{name}": n for name, n in Counter(type(o).__name__ for o in world.get_all_objects()).items()})
+    row.update({f"dead.{kind}": n for kind, n in world.compact(apply=False).items()})
+    return row
+
+def find_growth(samples: List[Dict[str, int]], warmup: float = SOAK_WARMUP_FRACTION,
+                tolerance: float = SOAK_GROWTH_TOLERANCE) -> List[tuple]:
+    """Flags series that keep rising after warm-up: the late half's mean exceeds the early half's by more than
+    tolerance (and a small absolute floor) and the least-squares slope over the whole window is positive."""
+    window = samples[int(len(samples) * warmup):]
+    if len(window) < 4: return []
+    flagged = []
+    for key in sorted({k for row in window for k in row} - {"tick"}):
+        ticks = [row["tick"] for row in window]; values = [row.get(key, 0) for row in window]
+        half = len(values) // 2; early = sum(values[:half]) / half; late = sum(values[half:]) / (len(values) - half)
+        floor = 1 << 18 if key == "traced_bytes" else 16
+        if late - early <= max(early * tolerance, floor): continue
+        mean_t = sum(ticks) / len(ticks); mean_v = sum(values) / len(values)
+        slope = sum((t - mean_t) * (v - mean_v) for t, v in zip(ticks, values)) / (sum((t - mean_t) ** 2 for t in ticks) or 1)
+        if slope > 0: flagged.append((key, early, late, slope * 1_000_000))
+    return flagged
+
+def soak(ticks: int, seed: int = 1, interval: int = SOAK_SAMPLE_INTERVAL, compact_interval: int = COMPACTION_INTERVAL,
+         trace: bool = True, width: int = WORLD_WIDTH, height: int = WORLD_HEIGHT, csv_path: Optional[str] = None) -> List[Dict[str, int]]:
+    random.seed(seed); world = World(width, height); world.initialize_world(); world.compaction_interval = compact_interval
+    if trace: gc.collect(); tracemalloc.start()
+    samples: List[Dict[str, int]] = [sample(world)]; baseline = None; start = time.perf_counter()
+    warmup_tick = int(ticks * SOAK_WARMUP_FRACTION)
+    while world.step_count < ticks:
+        world.update()
+        if trace and baseline is None and world.step_count >= warmup_tick: gc.collect(); baseline = tracemalloc.take_snapshot()
+        if world.step_count % interval == 0 or world.step_count == ticks:
+            samples.append(sample(world)); row = samples[-1]
+            dead = sum(v for k, v in row.items() if k.startswith("dead."))
+            print(f"tick {row['tick']:>9}  heap {row['traced_bytes'] / 1024:>9.0f} KiB  objects {len(world.objects_grid.get_all()):>6}  "
+                  f"dead refs {dead:>4}  {(time.perf_counter() - start) / world.step_count * 1000:.3f} ms/tick", flush=True)
+    if csv_path:
+        keys = sorted({k for row in samples for k in row} - {"tick"})
+        with open(csv_path, "w", newline="") as f:
+            writer = csv.writer(f); writer.writerow(["tick"] + keys)
+            for row in samples: writer.writerow([row["tick"]] + [row.get(k, 0) for k in keys])
+    flagged = find_growth(samples)
+    print("\nunbounded growth:" if flagged else "\nno unbounded growth detected.")
+    for key, early, late, per_million in flagged: print(f"  {key:<28} {early:>12.0f} -> {late:>12.0f}  (+{per_million:.0f} per 1M ticks)")
+    retained = {k: v for k, v in samples[-1].items() if k.startswith("dead.") and v}
+    if retained: print("retained references to removed objects: " + ", ".join(f"{k[5:]}={v}" for k, v in retained.items()))
+    if trace and baseline is not None:
+        gc.collect(); stats = tracemalloc.take_snapshot().compare_to(baseline, "lineno")
+        print("top allocation growth since warm-up:")
+        for stat in [s for s in stats if s.size_diff > 0][:10]: print(f"  {stat.size_diff / 1024:>9.1f} KiB  {stat.traceback}")
+        tracemalloc.stop()
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless long-run soak test with memory-growth detection.")
+    parser.add_argument("--ticks", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--interval", type=int, default=SOAK_SAMPLE_INTERVAL, help="ticks between samples")
+    parser.add_argument("--compact-interval", type=int, default=COMPACTION_INTERVAL, help="ticks between compactions, 0 to disable")
+    parser.add_argument("--no-trace", action="store_true", help="skip tracemalloc (faster, no heap figures)")
+    parser.add_argument("--csv", help="write every sample to this CSV file")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+    soak(args.ticks, args.seed, args.interval, args.compact_interval, not args.no_trace, csv_path=args.csv)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Columnar time-series statistics: `python stats.py run.stats --columns agents roads` prints a range as CSV.
+
+A stats file is a header followed by chunks. Header: the magic b'CIVSTAT1', u16 downsample factor, u8 levels,
+u16 n columns, then per column a u8 array typecode and a u8-length-prefixed UTF-8 name. Chunk: u8 level, u32 rows,
+u32 first tick, u32 last tick, then each column's rows as a little-endian array. Level 0 holds every sample; level
+k holds means over factor ** k consecutive samples, stamped with their first tick and last directive, with
+integer columns widened to float32.
+"""
+import argparse
+import struct
+import sys
+from array import array
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+from config import *
+from objects import Agent, ConstructionSite
+from simulation import WorldObserver
+from utils import AgentRole, AgentState, StructureType, TerrainType, Directive, ITEM_NAMES
+
+if TYPE_CHECKING:
+    from simulation import World
+
+MAGIC = b'CIVSTAT1'
+HEADER = struct.Struct('<HBH'); COLUMN = struct.Struct('<BB'); CHUNK = struct.Struct('<BIII')
+DIRECTIVES = list(Directive); DIRECTIVE_CODES = {d: i for i, d in enumerate(DIRECTIVES)}
+ROLES = list(AgentRole); STATES = list(AgentState); STRUCTURES = list(StructureType)
+ROLE_INDEX = {id(r): i for i, r in enumerate(ROLES)}; STATE_INDEX = {id(s): i for i, s in enumerate(STATES)} # id(): Enum.__hash__ is slow
+STRUCTURE_CLASSES = {s.get_class(): i for i, s in enumerate(STRUCTURES)}
+
+COLUMNS = ([("tick", 'I'), ("agents", 'i')] + [(f"pop.{r.name}", 'i') for r in ROLES] + [(f"state.{s.name}", 'i') for s in STATES]
+           + [("energy", 'f'), ("hydration", 'f')] + [(f"inv.{name}", 'i') for name in ITEM_NAMES]
+           + [(f"built.{s.name}", 'i') for s in STRUCTURES] + [("sites", 'i'), ("directive", 'B'), ("roads", 'i')])
+
+def level_typecodes(typecodes: Sequence[str], level: int) -> List[str]:
+    """Downsampled levels store means, so their integer columns are float32; tick and directive keep their type."""
+    return list(typecodes) if level == 0 else [tc if tc in 'IBf' else 'f' for tc in typecodes]
+
+def _to_bytes(column: array) -> bytes:
+    if sys.byteorder != 'little': column = array(column.typecode, column); column.byteswap()
+    return column.tobytes()
+
+class _Level:
+    """One resolution's preallocated column buffers; rows[:written] are already in the file."""
+    def __init__(self, typecodes: List[str], rows: int):
+        self.typecodes = typecodes; self.rows = 0; self.written = 0
+        self.buffers = [array(tc, bytes(array(tc).itemsize * rows)) for tc in typecodes]
+
+class StatsRecorder(WorldObserver):
+    """Samples colony aggregates every `interval` ticks into preallocated columnar buffers (see COLUMNS).
+
+    Counts that only change through world events (structures, construction sites, road tiles, the agent roster)
+    are kept up to date by the observer hooks, so a sample only walks the agents for their role, state and vitals.
+    Each of the `levels` resolutions writes a chunk to `path` whenever `chunk_rows` rows have filled; level k + 1
+    receives one row per `factor` rows of level k, averaged column by column straight from the buffers, so a run of
+    millions of ticks can be charted from a few thousand coarse rows. Call close (or flush) to write out partly
+    filled buffers.
+    """
+    def __init__(self, world: 'World', path: str, interval: int = STATS_INTERVAL, chunk_rows: int = STATS_CHUNK_ROWS,
+                 factor: int = STATS_DOWNSAMPLE, levels: int = STATS_LEVELS):
+        if chunk_rows % factor: raise ValueError("chunk_rows must be a multiple of the downsample factor")
+        self.world = world; self.interval = interval; self.chunk_rows = chunk_rows; self.factor = factor
+        self.typecodes = [tc for _, tc in COLUMNS]
+        self.levels = [_Level(level_typecodes(self.typecodes, k), chunk_rows) for k in range(levels)]
+        self.agents = {}; self.built = [0] * len(STRUCTURES); self.sites = 0; self.roads = set()
+        for obj in world.get_all_objects(): self.on_add(obj)
+        self.roads = {(x, y) for y in range(world.height) for x in range(world.width) if world.terrain[y][x] == TerrainType.ROAD}
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + HEADER.pack(factor, levels, len(COLUMNS)))
+        for name, tc in COLUMNS: encoded = name.encode(); self.file.write(COLUMN.pack(ord(tc), len(encoded)) + encoded)
+        world.add_observer(self)
+
+    def on_add(self, obj):
+        if isinstance(obj, Agent): self.agents[obj] = None # Insertion-ordered, so sums don't depend on id()
+        elif isinstance(obj, ConstructionSite): self.sites += 1
+        elif type(obj) in STRUCTURE_CLASSES: self.built[STRUCTURE_CLASSES[type(obj)]] += 1
+    def on_remove(self, obj):
+        if isinstance(obj, Agent): self.agents.pop(obj, None)
+        elif isinstance(obj, ConstructionSite): self.sites -= 1
+        elif type(obj) in STRUCTURE_CLASSES: self.built[STRUCTURE_CLASSES[type(obj)]] -= 1
+    def on_terrain_changed(self, pos):
+        if self.world.terrain[pos.y][pos.x] == TerrainType.ROAD: self.roads.add((pos.x, pos.y))
+        else: self.roads.discard((pos.x, pos.y))
+    def on_tick(self, world: 'World'):
+        if world.step_count % self.interval == 0: self.record()
+
+    def sample(self) -> list:
+        """The current row, in COLUMNS order."""
+        roles = [0] * len(ROLES); states = [0] * len(STATES); energy = hydration = 0.0
+        for agent in self.agents:
+            roles[ROLE_INDEX[id(agent.role)]] += 1; states[STATE_INDEX[id(agent.state)]] += 1; energy += agent.energy; hydration += agent.hydration
+        n = len(self.agents)
+        return ([self.world.step_count, n] + roles + states + [energy / n if n else 0.0, hydration / n if n else 0.0]
+                + list(self.world.global_inventory.counts) + self.built + [self.sites, DIRECTIVE_CODES[self.world.oracle.directive], len(self.roads)])
+
+    def record(self): self._append(0, self.sample())
+
+    def _append(self, k: int, row: list):
+        level = self.levels[k]
+        for buffer, value in zip(level.buffers, row): buffer[level.rows] = value
+        level.rows += 1
+        if level.rows % self.factor == 0 and k + 1 < len(self.levels): self._downsample(k, level.rows - self.factor, level.rows)
+        if level.rows == self.chunk_rows: self._write(k); level.rows = level.written = 0
+
+    def _downsample(self, k: int, start: int, stop: int):
+        """Appends the mean of level k's rows [start, stop) to level k + 1."""
+        buffers = self.levels[k].buffers; n = stop - start
+        row = [sum(buffer[start:stop]) / n for buffer in buffers]; row[0] = buffers[0][start]; row[-2] = buffers[-2][stop - 1]
+        self._append(k + 1, row)
+
+    def _write(self, k: int):
+        level = self.levels[k]; start, stop = level.written, level.rows
+        if stop == start: return
+        ticks = level.buffers[0]
+        self.file.write(CHUNK.pack(k, stop - start, ticks[start], ticks[stop - 1]) + b''.join(_to_bytes(buffer[start:stop]) for buffer in level.buffers))
+        level.written = stop
+
+    def flush(self):
+        """Writes every partly filled buffer as a short chunk, so readers see all samples taken so far."""
+        for k in range(len(self.levels)): self._write(k)
+        self.file.flush()
+
+    def close(self):
+        """Averages the last partial group of each level into the next, flushes and closes the file, and detaches."""
+        for k in range(len(self.levels) - 1):
+            rows = self.levels[k].rows
+            if rows % self.factor: self._downsample(k, rows - rows % self.factor, rows)
+        self.flush(); self.file.close(); self.world.remove_observer(self)
+
+class StatsReader:
+    """Range queries over a stats file. Chunks are indexed on open, so a query reads only the chunks and columns it needs."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC: raise ValueError(f"{path} is not a stats file")
+            self.factor, levels, ncols = HEADER.unpack(f.read(HEADER.size)); self.columns: List[str] = []; typecodes = []
+            for _ in range(ncols):
+                tc, length = COLUMN.unpack(f.read(COLUMN.size)); typecodes.append(chr(tc)); self.columns.append(f.read(length).decode())
+            self.typecodes = [level_typecodes(typecodes, k) for k in range(levels)]
+            self.chunks: List[List[tuple]] = [[] for _ in range(levels)] # level -> [(offset of column data, rows, first tick, last tick)]
+            while True:
+                header = f.read(CHUNK.size)
+                if len(header) < CHUNK.size: break
+                k, rows, first, last = CHUNK.unpack(header); size = rows * sum(array(tc).itemsize for tc in self.typecodes[k])
+                self.chunks[k].append((f.tell(), rows, first, last)); f.seek(size, 1)
+        for chunks in self.chunks: chunks.sort(key=lambda c: c[2])
+
+    def span(self) -> tuple:
+        """(first tick, last tick) of the raw samples."""
+        chunks = self.chunks[0]
+        return (chunks[0][2], max(c[3] for c in chunks)) if chunks else (0, 0)
+
+    def level_for(self, start: int, end: int, max_points: int) -> int:
+        """The finest level with at most max_points rows in [start, end], or the coarsest one."""
+        for k, chunks in enumerate(self.chunks):
+            rows = sum(c[1] for c in chunks if c[3] >= start and c[2] <= end)
+            if rows and rows <= max_points: return k
+        return max((k for k, chunks in enumerate(self.chunks) if chunks), default=0)
+
+    def query(self, columns: Optional[Sequence[str]] = None, start: int = 0, end: Optional[int] = None,
+              max_points: int = STATS_MAX_POINTS, level: Optional[int] = None) -> Dict[str, list]:
+        """Values of the named columns (default: all) for ticks in [start, end], as lists keyed by column and
+        always including "tick", from `level` or else the finest resolution that fits in max_points rows."""
+        end = self.span()[1] if end is None else end
+        level = self.level_for(start, end, max_points) if level is None else level
+        names = ["tick"] + [c for c in (columns or self.columns) if c != "tick"]
+        indices = [self.columns.index(name) for name in names]; typecodes = self.typecodes[level]
+        sizes = [array(tc).itemsize for tc in typecodes]; out = {name: [] for name in names}
+        with open(self.path, 'rb') as f:
+            for offset, rows, first, last in self.chunks[level]:
+                if last < start or first > end: continue
+                values = []
+                for i in indices:
+                    f.seek(offset + rows * sum(sizes[:i])); column = array(typecodes[i]); column.frombytes(f.read(rows * sizes[i]))
+                    if sys.byteorder != 'little': column.byteswap()
+                    values.append(column)
+                keep = [r for r, tick in enumerate(values[0]) if start <= tick <= end]
+                for name, column in zip(names, values): out[name].extend(column[r] for r in keep)
+        return out
+
+def main():
+    parser = argparse.ArgumentParser(description="Print a range of a stats file as CSV.")
+    parser.add_argument("path")
+    parser.add_argument("--columns", nargs="*", help="columns to print (default: all; see --list)")
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--end", type=int)
+    parser.add_argument("--points", type=int, default=STATS_MAX_POINTS, help="pick the finest resolution with at most this many rows")
+    parser.add_argument("--list", action="store_true", help="list the columns and chunk counts per level, then exit")
+    args = parser.parse_args()
+    reader = StatsReader(args.path)
+    if args.list:
+        print("columns: " + " ".join(reader.columns))
+        for k, chunks in enumerate(reader.chunks): print(f"level {k} (1:{reader.factor ** k}): {len(chunks)} chunks, {sum(c[1] for c in chunks)} rows")
+        return
+    data = reader.query(args.columns, args.start, args.end, args.points); names = list(data)
+    print(",".join(names))
+    for row in zip(*data.values()):
+        print(",".join(DIRECTIVES[int(v)].name if name == "directive" else f"{v:g}" if isinstance(v, float) else str(v) for name, v in zip(names, row)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""Binary world-state streaming for out-of-process viewers.
+
+Every message on the wire is a little-endian u32 payload length followed by the payload. A payload starts with
+a u8 frame kind and a u32 tick, followed by sections:
+
+* KEYFRAME: u16 width, u16 height, width*height terrain bytes (TerrainType.value), then the object, inventory
+  and directive sections below with every object listed as spawned.
+* DELTA: u32 n + n * (u16 x, u16 y, u8 terrain) changed tiles, then the object, inventory and directive sections.
+
+Object section: u32 n spawned * (u32 id, u8 type, u8 variant, u16 x, u16 y), u32 n moved * (u32 id, u16 x, u16 y),
+u32 n removed * (u32 id). Inventory section: u16 n * (u8 item_id, i32 count). Directive: u8 index into Directive.
+"""
+import logging
+import os
+import socket
+import struct
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple, Union
+
+from config import *
+from objects import (Agent, Resource, Deer, Wolf, Shelter, Farm, LumberMill, Mine, Blacksmith, Well,
+                     FishingHut, HuntersLodge, ConstructionSite)
+from simulation import WorldObserver
+from utils import Point, AgentRole, ResourceType, StructureType, Directive, ITEM_NAMES
+
+if TYPE_CHECKING:
+    from simulation import World
+
+KEYFRAME, DELTA = 0, 1
+OBJECT_TYPES = [Agent, Resource, Deer, Wolf, Shelter, Farm, LumberMill, Mine, Blacksmith, Well, FishingHut, HuntersLodge, ConstructionSite]
+TYPE_CODES = {cls: i for i, cls in enumerate(OBJECT_TYPES)}
+DIRECTIVES = list(Directive); DIRECTIVE_CODES = {d: i for i, d in enumerate(DIRECTIVES)}
+VARIANT_CODES = {**{r: i for i, r in enumerate(ResourceType)}, **{r: i for i, r in enumerate(AgentRole)}, **{s: i for i, s in enumerate(StructureType)}}
+
+LENGTH = struct.Struct('<I'); HEADER = struct.Struct('<BI'); SIZE = struct.Struct('<HH'); COUNT = struct.Struct('<I'); SHORT_COUNT = struct.Struct('<H')
+SPAWN = struct.Struct('<IBBHH'); MOVE = struct.Struct('<IHH'); REMOVE = struct.Struct('<I'); TILE = struct.Struct('<HHB')
+ITEM = struct.Struct('<Bi'); DIRECTIVE = struct.Struct('<B')
+
+def _variant(obj) -> int:
+    kind = getattr(obj, 'resource_type', None) or getattr(obj, 'role', None) or getattr(obj, 'structure_type', None)
+    return VARIANT_CODES.get(kind, 0)
+
+def _pack_section(entry: struct.Struct, rows, count: struct.Struct = COUNT) -> bytes:
+    return count.pack(len(rows)) + b''.join(entry.pack(*row) for row in rows)
+
+class DeltaRecorder(WorldObserver):
+    """Assigns stable stream ids to world objects and accumulates one tick's changes for encoding."""
+    def __init__(self, world: 'World'):
+        self.world = world; self.ids: Dict[object, int] = {}; self.next_id = 1
+        self.spawned: Dict[int, object] = {}; self.moved: Dict[int, object] = {}; self.removed: Set[int] = set()
+        self.tiles: Set[Point] = set(); self.items: Set[int] = set()
+        world.add_observer(self); world.global_inventory.subscribe(self._on_item)
+        for obj in world.get_all_objects(): self._id_for(obj)
+
+    def _on_item(self, item_id: int, old: int, new: int): self.items.add(item_id)
+    def close(self): self.world.remove_observer(self); self.world.global_inventory.unsubscribe(self._on_item)
+
+    def _id_for(self, obj) -> int:
+        sid = self.ids.get(obj)
+        if sid is None: sid = self.ids[obj] = self.next_id; self.next_id += 1
+        return sid
+
+    def on_add(self, obj): sid = self._id_for(obj); self.spawned[sid] = obj; self.removed.discard(sid)
+    def on_remove(self, obj):
+        sid = self.ids.pop(obj, None)
+        if sid is None: return
+        self.moved.pop(sid, None)
+        if self.spawned.pop(sid, None) is None: self.removed.add(sid)
+    def on_move(self, obj, old_pos: Point):
+        if obj not in self.ids: self.on_add(obj); return
+        sid = self.ids[obj]
+        if sid not in self.spawned: self.moved[sid] = obj
+    def on_terrain_changed(self, pos: Point): self.tiles.add(pos)
+
+    @staticmethod
+    def _object_sections(spawned, moved, removed) -> bytes:
+        return (_pack_section(SPAWN, [(sid, TYPE_CODES.get(type(o), 255), _variant(o), o.x, o.y) for sid, o in spawned])
+                + _pack_section(MOVE, [(sid, o.x, o.y) for sid, o in moved])
+                + _pack_section(REMOVE, [(sid,) for sid in removed]))
+
+    def _tail(self, item_ids) -> bytes:
+        counts = self.world.global_inventory.counts
+        return _pack_section(ITEM, [(i, counts[i]) for i in item_ids], SHORT_COUNT) + DIRECTIVE.pack(DIRECTIVE_CODES[self.world.oracle.directive])
+
+    def keyframe(self) -> bytes:
+        w = self.world
+        terrain = bytes(w.terrain[y][x].value for y in range(w.height) for x in range(w.width))
+        payload = (HEADER.pack(KEYFRAME, w.step_count) + SIZE.pack(w.width, w.height) + terrain
+                   + self._object_sections([(self._id_for(o), o) for o in w.get_all_objects()], (), ())
+                   + self._tail(range(len(ITEM_NAMES))))
+        return LENGTH.pack(len(payload)) + payload
+
+    def flush_delta(self) -> bytes:
+        """Encodes and clears the changes recorded since the last flush."""
+        w = self.world
+        tiles = [(p.x, p.y, w.terrain[p.y][p.x].value) for p in self.tiles]
+        payload = (HEADER.pack(DELTA, w.step_count) + _pack_section(TILE, tiles)
+                   + self._object_sections(self.spawned.items(), self.moved.items(), self.removed) + self._tail(sorted(self.items)))
+        self.spawned, self.moved, self.removed, self.tiles, self.items = {}, {}, set(), set(), set()
+        return LENGTH.pack(len(payload)) + payload
+
+class _Viewer:
+    def __init__(self, sock: socket.socket): self.sock = sock; self.buffer = bytearray(); self.needs_keyframe = True
+
+class StreamServer(WorldObserver):
+    """Non-blocking socket server that streams a keyframe to each new viewer and one delta per tick afterwards.
+
+    `address` is a (host, port) tuple for TCP or a filesystem path for a Unix socket. The server is pumped from
+    World.update via on_tick and never blocks the simulation: a viewer whose unsent backlog exceeds
+    STREAM_MAX_BACKLOG stops receiving deltas and is resynchronised with a fresh keyframe once it has drained,
+    so slow viewers see fewer ticks instead of stalling the run.
+    """
+    def __init__(self, world: 'World', address: Union[Tuple[str, int], str] = (STREAM_HOST, STREAM_PORT)):
+        self.world = world; self.recorder = DeltaRecorder(world); self.viewers: List[_Viewer] = []
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.path = address if family == socket.AF_UNIX else None # Unlinked again by close
+        self.sock = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET: self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind(address); self.sock.listen(); self.sock.setblocking(False)
+        self.address = self.sock.getsockname()
+        world.add_observer(self)
+        logging.info(f"Streaming world state on {self.address}.")
+
+    def on_tick(self, world: 'World'):
+        self._accept()
+        delta = self.recorder.flush_delta(); keyframe = None
+        for viewer in list(self.viewers):
+            if viewer.needs_keyframe:
+                if viewer.buffer: self._send(viewer); continue
+                keyframe = keyframe or self.recorder.keyframe()
+                viewer.buffer += keyframe; viewer.needs_keyframe = False
+            elif len(viewer.buffer) > STREAM_MAX_BACKLOG: viewer.needs_keyframe = True
+            else: viewer.buffer += delta
+            self._send(viewer)
+
+    def _accept(self):
+        while True:
+            try: sock, _ = self.sock.accept()
+            except (BlockingIOError, InterruptedError): return
+            sock.setblocking(False); self.viewers.append(_Viewer(sock))
+            logging.info(f"Stream viewer connected ({len(self.viewers)} total).")
+
+    def _send(self, viewer: _Viewer):
+        try:
+            sent = viewer.sock.send(viewer.buffer)
+            del viewer.buffer[:sent]
+        except (BlockingIOError, InterruptedError): pass
+        except OSError: self._drop(viewer)
+
+    def _drop(self, viewer: _Viewer):
+        viewer.sock.close(); self.viewers.remove(viewer)
+        logging.info(f"Stream viewer disconnected ({len(self.viewers)} total).")
+
+    def close(self):
+        for viewer in list(self.viewers): self._drop(viewer)
+        self.sock.close(); self.world.remove_observer(self); self.recorder.close()
+        if self.path:
+            try: os.unlink(self.path)
+            except FileNotFoundError: pass
+
+def parse_address(text: str) -> Union[Tuple[str, int], str]:
+    """Parses "host:port" into a TCP address; anything else is taken as a Unix socket path."""
+    host, sep, port = text.rpartition(':')
+    return (host or STREAM_HOST, int(port)) if sep and port.isdigit() else text
+
+def decode_frame(payload: bytes) -> dict:
+    """Decodes one payload (without its length prefix) into a dict of its sections."""
+    kind, tick = HEADER.unpack_from(payload, 0); offset = HEADER.size; frame = {'kind': kind, 'tick': tick}
+    def rows(entry: struct.Struct, count: struct.Struct = COUNT):
+        nonlocal offset
+        n, = count.unpack_from(payload, offset); offset += count.size
+        out = [entry.unpack_from(payload, offset + i * entry.size) for i in range(n)]; offset += n * entry.size
+        return out
+    if kind == KEYFRAME:
+        frame['width'], frame['height'] = SIZE.unpack_from(payload, offset); offset += SIZE.size
+        size = frame['width'] * frame['height']; frame['terrain'] = payload[offset:offset + size]; offset += size
+    else: frame['tiles'] = rows(TILE)
+    frame['spawned'] = rows(SPAWN); frame['moved'] = rows(MOVE); frame['removed'] = rows(REMOVE)
+    frame['items'] = rows(ITEM, SHORT_COUNT)
+    frame['directive'] = DIRECTIVES[DIRECTIVE.unpack_from(payload, offset)[0]]
+    return frame
+
+class StreamClient:
+    """Minimal viewer-side client that reassembles frames and keeps a mirror of the streamed world state."""
+    def __init__(self, address: Union[Tuple[str, int], str]):
+        self.sock = socket.socket(socket.AF_UNIX if isinstance(address, str) else socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.connect(address); self.sock.setblocking(False); self.pending = bytearray()
+        self.tick = 0; self.width = self.height = 0; self.terrain = bytearray(); self.directive: Optional[Directive] = None
+        self.objects: Dict[int, Tuple[int, int, int, int]] = {}; self.inventory: Dict[str, int] = {}
+
+    def poll(self) -> int:
+        """Reads whatever has arrived and applies every complete frame; returns the number of frames applied."""
+        try:
+            while True:
+                chunk = self.sock.recv(1 << 16)
+                if not chunk: break
+                self.pending += chunk
+        except (BlockingIOError, InterruptedError): pass
+        applied = 0
+        while len(self.pending) >= LENGTH.size:
+            size, = LENGTH.unpack_from(self.pending, 0)
+            if len(self.pending) < LENGTH.size + size: break
+            self.apply(decode_frame(bytes(self.pending[LENGTH.size:LENGTH.size + size]))); del self.pending[:LENGTH.size + size]; applied += 1
+        return applied
+
+    def apply(self, frame: dict):
+        self.tick = frame['tick']; self.directive = frame['directive']
+        if frame['kind'] == KEYFRAME:
+            self.width, self.height, self.terrain = frame['width'], frame['height'], bytearray(frame['terrain']); self.objects = {}
+        else:
+            for x, y, terrain in frame['tiles']: self.terrain[y * self.width + x] = terrain
+        for sid, type_code, variant, x, y in frame['spawned']: self.objects[sid] = (type_code, variant, x, y)
+        for sid, x, y in frame['moved']:
+            type_code, variant, _, _ = self.objects[sid]; self.objects[sid] = (type_code, variant, x, y)
+        for sid, in frame['removed']: self.objects.pop(sid, None)
+        for item_id, count in frame['items']:
+            if count: self.inventory[ITEM_NAMES[item_id]] = count
+            else: self.inventory.pop(ITEM_NAMES[item_id], None)
+
+    def close(self): self.sock.close()
@@ -0,0 +1,6 @@
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The modules live flat in the repo root
+logging.disable(logging.CRITICAL)
@@ -0,0 +1,73 @@
+"""Every PATHFINDERS backend against a reference Dijkstra on random obstacle-and-road maps and a generated world."""
+import heapq
+import random
+
+import pytest
+
+from pathfinding import PATHFINDERS, NEIGHBORS, SharedGrid, BLOCKED, OPEN, ROAD
+from simulation import World
+
+WIDTH, HEIGHT = 60, 45
+
+def _optimal_cost(pathfinder, grid, start, goal):
+    """Reference Dijkstra over the backend's step costs; None if goal is unreachable."""
+    dist = {start: 0}; heap = [(0, start)]
+    while heap:
+        d, (x, y) = heapq.heappop(heap)
+        if (x, y) == goal: return d
+        if d > dist[(x, y)]: continue
+        for dx, dy in NEIGHBORS:
+            nx, ny = x + dx, y + dy
+            if (nx, ny) != goal and not grid.open(nx, ny): continue
+            nd = d + pathfinder.step_cost(grid, nx, ny)
+            if nd < dist.get((nx, ny), float('inf')): dist[(nx, ny)] = nd; heapq.heappush(heap, (nd, (nx, ny)))
+    return None
+
+def _check_path(pathfinder, grid, start, goal, path, optimum) -> str:
+    """Why path is not a valid, optimal answer for start -> goal, or '' if it is."""
+    if path is None: return "" if optimum is None else "missed a reachable goal"
+    if optimum is None: return "path to an unreachable goal"
+    if start == goal: return "" if path == [] else "non-empty path to itself"
+    if not path or path[-1] != goal: return "does not end at goal"
+    x, y = start
+    for nx, ny in path:
+        if max(abs(nx - x), abs(ny - y)) != 1: return f"jump from {(x, y)} to {(nx, ny)}"
+        if (nx, ny) != goal and not grid.open(nx, ny): return f"steps onto blocked {(nx, ny)}"
+        x, y = nx, ny
+    cost = sum(pathfinder.step_cost(grid, *tile) for tile in path)
+    return "" if abs(cost - optimum) < 1e-9 else f"cost {cost} vs optimum {optimum}"
+
+def _obstacle_grid(rng: random.Random, density: float) -> SharedGrid:
+    cells = [BLOCKED if rng.random() < density else (ROAD if rng.random() < 0.1 else OPEN) for _ in range(WIDTH * HEIGHT)]
+    for _ in range(6): # Some walls with gaps, so searches have to go around
+        x0 = rng.randrange(WIDTH); y0 = rng.randrange(HEIGHT); horizontal = rng.random() < 0.5
+        for i in range(rng.randint(10, 40)):
+            x, y = (x0 + i, y0) if horizontal else (x0, y0 + i)
+            if x < WIDTH and y < HEIGHT and i % 13: cells[y * WIDTH + x] = BLOCKED
+    return SharedGrid(cells, WIDTH, HEIGHT)
+
+@pytest.fixture(scope="module")
+def cases():
+    """(grid, [(start, goal)]) for four obstacle maps of rising density and a generated world, with long random
+    queries and short local ones; goals may be blocked or unreachable."""
+    rng = random.Random(1); grids = [_obstacle_grid(rng, 0.15 + 0.1 * m) for m in range(4)]
+    world = World(WIDTH, HEIGHT, seed=1, async_pathfinding=False); world.initialize_world()
+    grids.append(SharedGrid([SharedGrid.cell(world, x, y) for y in range(HEIGHT) for x in range(WIDTH)], WIDTH, HEIGHT)); world.close()
+    tiles = [(x, y) for y in range(HEIGHT) for x in range(WIDTH)]; out = []
+    for grid in grids:
+        starts = [t for t in tiles if grid.open(*t)]; pairs = [(rng.choice(starts), rng.choice(tiles)) for _ in range(40)]
+        for _ in range(20):
+            x, y = rng.choice(starts); pairs.append(((x, y), (min(WIDTH - 1, max(0, x + rng.randint(-3, 3))), min(HEIGHT - 1, max(0, y + rng.randint(-3, 3))))))
+        pairs.append((starts[0], starts[0]))
+        out.append((grid, pairs))
+    return out
+
+@pytest.mark.parametrize("name", sorted(PATHFINDERS))
+def test_paths_are_valid_and_optimal(name, cases):
+    pathfinder = PATHFINDERS[name](); failures = []
+    for grid, pairs in cases:
+        for start, goal in pairs:
+            path = pathfinder.find_path(grid, start, goal)
+            problem = _check_path(pathfinder, grid, start, goal, path, _optimal_cost(pathfinder, grid, start, goal))
+            if problem: failures.append(f"{start} -> {goal}: {problem}")
+    assert not failures, "\n".join(failures[:10])
@@ -0,0 +1,34 @@
+"""PathfindingService: requests come back through Agent._path_ready, removed agents' tickets are dropped, and
+close() shuts the worker pool down."""
+import pytest
+
+from config import PATHFINDING_MAX_WAIT_TICKS
+from pathfinding import PathfindingService
+from simulation import World
+from utils import AgentState, Point
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_requests_are_delivered_and_stale_tickets_dropped(workers):
+    world = World(60, 45, seed=1, async_pathfinding=False); world.initialize_world()
+    service = world.pathfinding = PathfindingService(world, workers=workers)
+    try:
+        agents = world.get_all_agents()[:3]; goal = world.find_empty_spot_near(Point(world.width // 2 + 8, world.height // 2 + 6), 10)
+        assert len(agents) == 3 and goal is not None and world.find_path(agents[0].pos, goal)
+        for agent in agents: agent._request_path(world, goal, None, goal, None)
+        assert all(agent.state == AgentState.WAITING_FOR_PATH and agent.path_ticket for agent in agents)
+        gone = agents.pop(); world.remove_object(gone)
+        service.submit(world.step_count)
+        assert len(service.in_flight[0][2]) == 1 # Agents bound for one goal share a single search
+        world.step_count += PATHFINDING_MAX_WAIT_TICKS; service.deliver(world)
+        assert not service.in_flight
+        for agent in agents:
+            assert agent.state == AgentState.MOVING and agent.path and agent.path[-1] == goal
+            x, y = agent.x, agent.y
+            for step in agent.path:
+                assert max(abs(step.x - x), abs(step.y - y)) == 1; x, y = step.x, step.y
+        assert gone.state == AgentState.WAITING_FOR_PATH and not gone.path # Its ticket was cleared on removal
+    finally:
+        pool = service.pool; processes = list(pool._pool) if pool else [] # Held, so only close() can stop them
+        world.close()
+    assert service.pool is None and world.pathfinding is None and not service.queued and not service.in_flight
+    assert not any(process.is_alive() for process in processes)
@@ -0,0 +1,32 @@
+"""PerceptionCache.nearest against a brute-force radius scan, as the world changes under the cached views."""
+import pytest
+
+from objects import Agent, Resource, Deer, Shelter, ConstructionSite, Well
+from simulation import World
+from utils import Point, ResourceType
+
+QUERIES = [(Resource, None), (Resource, lambda o: o.resource_type == ResourceType.WOOD and o.claimed_by is None),
+           (Agent, lambda o: o.is_adult()), (Deer, lambda o: o.claimed_by is None), (Shelter, lambda o: len(o.occupants) < 2),
+           (ConstructionSite, lambda o: o.needed_resources), (Well, None)]
+
+def _brute_force(world: World, pos: Point, category, condition):
+    """The scan World.find_nearest ran before it had a perception cache: distance to the nearest match, or None."""
+    found = [o for o in world.objects_grid.query_radius(pos, world.perception.radius) if isinstance(o, category) and (condition is None or condition(o))]
+    return min((pos.distance_to(o.pos) for o in found), default=None)
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_nearest_matches_brute_force(seed):
+    world = World(80, 60, seed=seed, async_pathfinding=False); world.initialize_world(); mismatches = []; checked = 0
+    try:
+        for checkpoint in range(6):
+            for _ in range(50 * checkpoint): world.update()
+            for y in range(0, world.height, 3):
+                for x in range(0, world.width, 3):
+                    pos = Point(x, y)
+                    for category, condition in QUERIES:
+                        found = world.perception.nearest(pos, category, condition); checked += 1
+                        expected = _brute_force(world, pos, category, condition)
+                        if (None if found is None else pos.distance_to(found.pos)) != expected: mismatches.append((world.step_count, pos, category.__name__))
+                        elif found is not None and not (isinstance(found, category) and (condition is None or condition(found))): mismatches.append((world.step_count, pos, category.__name__, "condition"))
+    finally: world.close()
+    assert checked and not mismatches, mismatches[:10]
@@ -0,0 +1,24 @@
+"""World.find_nearest_many (SpatialHash.knn_batch) against World.find_nearest, as the world changes under the packed arrays."""
+import pytest
+
+from objects import Agent, Resource, Deer, Wolf
+from simulation import World
+from utils import Point, ResourceType
+
+QUERIES = [(Resource, None), (Resource, lambda o: o.resource_type == ResourceType.WOOD and o.claimed_by is None),
+           (Agent, lambda o: o.is_adult()), (Deer, None), (Wolf, None)]
+
+@pytest.mark.parametrize("seed", [1, 2])
+def test_find_nearest_many_matches_find_nearest(seed):
+    world = World(80, 60, seed=seed, async_pathfinding=False); world.initialize_world(); mismatches = []; checked = 0
+    try:
+        for checkpoint in range(5):
+            for _ in range(40 * checkpoint): world.update()
+            points = [Point(x, y) for y in range(0, world.height, 3) for x in range(0, world.width, 3)]
+            for category, condition in QUERIES:
+                for pos, found in zip(points, world.find_nearest_many(points, category, condition)):
+                    expected = world.find_nearest(pos, condition, category); checked += 1
+                    got = pos.distance_to(found[0].pos) if found else None
+                    if got != (None if expected is None else pos.distance_to(expected.pos)): mismatches.append((world.step_count, pos, category.__name__))
+    finally: world.close()
+    assert checked and not mismatches, mismatches[:10]
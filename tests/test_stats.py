@@ -0,0 +1,48 @@
+"""StatsRecorder samples against brute-force recounts of the world, and StatsReader levels against recomputed means."""
+import pytest
+
+from objects import Agent, ConstructionSite
+from simulation import World
+from stats import StatsRecorder, StatsReader, COLUMNS, ROLES, STATES, STRUCTURE_CLASSES, DIRECTIVE_CODES
+from utils import TerrainType
+
+FACTOR, LEVELS = 4, 3
+
+def _recount(world: World) -> list:
+    """A sample row in COLUMNS order, counted from scratch."""
+    objects = world.get_all_objects(); agents = [o for o in objects if isinstance(o, Agent)]; n = len(agents)
+    built = [sum(1 for o in objects if STRUCTURE_CLASSES.get(type(o)) == i) for i in range(len(STRUCTURE_CLASSES))]
+    roads = sum(1 for row in world.terrain for t in row if t == TerrainType.ROAD)
+    return ([world.step_count, n] + [sum(1 for a in agents if a.role == r) for r in ROLES] + [sum(1 for a in agents if a.state == s) for s in STATES]
+            + [sum(a.energy for a in agents) / n if n else 0.0, sum(a.hydration for a in agents) / n if n else 0.0]
+            + list(world.global_inventory.counts) + built
+            + [sum(1 for o in objects if isinstance(o, ConstructionSite)), DIRECTIVE_CODES[world.oracle.directive], roads])
+
+def _downsample(rows: list) -> list:
+    """What the next level holds for rows: column means per FACTOR rows, keeping the first tick and last directive."""
+    out = []
+    for start in range(0, len(rows), FACTOR):
+        group = rows[start:start + FACTOR]; row = [sum(column) / len(group) for column in zip(*group)]
+        row[0] = group[0][0]; row[-2] = group[-1][-2]; out.append(row)
+    return out
+
+def _assert_rows(actual: dict, expected: list):
+    names = [name for name, _ in COLUMNS]
+    assert len(actual["tick"]) == len(expected)
+    for i, row in enumerate(expected):
+        for name, value in zip(names, row): assert actual[name][i] == pytest.approx(value, rel=1e-5, abs=1e-4), (i, name)
+
+def test_recorder_matches_recounts(tmp_path):
+    world = World(80, 60, seed=3, async_pathfinding=False); world.initialize_world(); path = str(tmp_path / "run.stats")
+    recorder = StatsRecorder(world, path, interval=1, chunk_rows=16, factor=FACTOR, levels=LEVELS); raw = []
+    try:
+        for tick in range(1, 403):
+            world.update(); raw.append(_recount(world))
+            assert recorder.sample() == pytest.approx(raw[-1]), world.step_count
+            if tick in (100, 250): recorder.flush() # Partial chunks mid-run must not disturb the later ones
+    finally: recorder.close(); world.close()
+    reader = StatsReader(path); levels = [raw]
+    for _ in range(LEVELS - 1): levels.append(_downsample(levels[-1]))
+    for k, expected in enumerate(levels): _assert_rows(reader.query(level=k), expected)
+    middle = reader.query(["agents", "directive"], start=120, end=180, level=0)
+    assert middle["tick"] == list(range(120, 181)) and middle["agents"] == [row[1] for row in raw if 120 <= row[0] <= 180]
@@ -1,24 +1,35 @@
 import heapq
+from array import array
 from enum import Enum
 from collections import namedtuple, defaultdict
 import math
-import logging
+import random
+from typing import Callable, Dict, List, Optional
 
 class Point:
+    """An immutable grid coordinate. Instances are shared freely (see Point.at), so never mutate one."""
+    __slots__ = ('x', 'y')
+    _interned: Dict[int, Dict[int, 'Point']] = {}
     def __init__(self, x, y): self.x = x; self.y = y
+    @staticmethod
+    def at(x: int, y: int) -> 'Point':
+        """Returns the shared Point for (x, y), creating it on first use. Only intern in-world coordinates."""
+        column = Point._interned.get(x)
+        if column is None: column = Point._interned[x] = {}
+        point = column.get(y)
+        if point is None: point = column[y] = Point(x, y)
+        return point
     def __eq__(self, other): return self.x == other.x and self.y == other.y
     def __hash__(self): return hash((self.x, self.y))
     def __lt__(self, other): return self.y < other.y or (self.y == other.y and self.x < other.x)
     def distance_to(self, other): return abs(self.x - other.x) + abs(self.y - other.y)
     def __repr__(self): return f"Point({self.x}, {self.y})"
 
-def heuristic(a, b): return abs(a.x - b.x) + abs(a.y - b.y)
-
 class Gender(Enum): MALE = 1; FEMALE = 2
 
 class AgentState(Enum):
     IDLE=1; MOVING=2; WORKING=3; RESTING=4; SEEKING_FOOD=5; SEEKING_WATER=6; SEEKING_SHELTER=7
-    SEEKING_PARTNER=8; PREGNANT=9; SUPPORTING_PARTNER=10; BUILDING=11; SEEKING_TOOL=12; COMBAT=13
+    SEEKING_PARTNER=8; PREGNANT=9; SUPPORTING_PARTNER=10; BUILDING=11; SEEKING_TOOL=12; COMBAT=13; WAITING_FOR_PATH=14
 
 class ToolType(Enum):
     AXE = ("Axe", "🪓", {"Iron Ingot": 2}, ["Wood"])
@@ -57,55 +68,222 @@ class Directive(Enum):
 
 class TerrainType(Enum): GRASS=1; WATER=2; ROAD=3
 
+ITEM_NAMES = [r.resource_name for r in ResourceType] + [t.tool_name for t in ToolType]
+ITEM_IDS = {name: i for i, name in enumerate(ITEM_NAMES)}
+ITEM_SPRITES = [r.sprite for r in ResourceType] + [t.sprite for t in ToolType]
+RESOURCE_BY_NAME = {r.resource_name: r for r in ResourceType}
+for _item in list(ResourceType) + list(ToolType): _item.item_id = ITEM_IDS[_item.resource_name if isinstance(_item, ResourceType) else _item.tool_name]
+for _item in list(StructureType) + list(ToolType): _item.recipe_ids = tuple((ITEM_IDS[name], amount) for name, amount in _item.recipe.items())
+FOOD_TYPES = (ResourceType.FOOD, ResourceType.MEAT, ResourceType.FISH) # In the order agents prefer to eat them
+
+class Inventory:
+    """Fixed-layout item counts indexed by ITEM_IDS, with the dict-like interface of the old defaultdict(int).
+
+    Only non-zero counts are visible through iteration, keys(), items() and len(), so `dict(inventory)` and
+    truthiness behave as they did when empty entries were never created. Hot paths should use the integer
+    `item_id` of a ResourceType/ToolType with count() and add() instead of the display name.
+    """
+    __slots__ = ('counts',)
+    def __init__(self, items: Optional[Dict[str, int]] = None):
+        self.counts = array('i', bytes(4 * len(ITEM_NAMES)))
+        if items:
+            for name, amount in items.items(): self._set(ITEM_IDS[name], amount)
+    def _set(self, item_id: int, amount: int): self.counts[item_id] = amount
+    def count(self, item_id: int) -> int: return self.counts[item_id]
+    def add(self, item_id: int, amount: int = 1): self._set(item_id, self.counts[item_id] + amount)
+    def __getitem__(self, name: str) -> int: return self.counts[ITEM_IDS[name]]
+    def __setitem__(self, name: str, amount: int): self._set(ITEM_IDS[name], amount)
+    def __delitem__(self, name: str): self._set(ITEM_IDS[name], 0)
+    def __contains__(self, name: str) -> bool: return name in ITEM_IDS and self.counts[ITEM_IDS[name]] != 0
+    def __iter__(self): return (ITEM_NAMES[i] for i, c in enumerate(self.counts) if c != 0)
+    def __len__(self): return sum(1 for c in self.counts if c != 0)
+    def __bool__(self): return any(self.counts)
+    def __repr__(self): return f"{type(self).__name__}({dict(self)})"
+    def get(self, name: str, default: int = 0) -> int: return self.counts[ITEM_IDS[name]] if name in ITEM_IDS else default
+    def keys(self): return list(self)
+    def values(self): return [c for c in self.counts if c != 0]
+    def items(self): return [(ITEM_NAMES[i], c) for i, c in enumerate(self.counts) if c != 0]
+    def clear(self):
+        for i, c in enumerate(self.counts):
+            if c: self._set(i, 0)
+
+class Ledger(Inventory):
+    """An Inventory with atomic transactions, change notifications and incrementally maintained aggregates.
+
+    Every write bumps `version` and is reported to subscribers as callback(item_id, old, new). Aggregates are
+    named sums over a group of item IDs (e.g. all food) kept up to date on each write, so readers like the
+    Oracle never have to copy or rescan the counts.
+    """
+    __slots__ = ('version', 'listeners', 'aggregates', 'aggregate_of', '_snapshot', '_snapshot_version')
+    def __init__(self, items: Optional[Dict[str, int]] = None, aggregates: Optional[Dict[str, tuple]] = None):
+        self.version = 0; self.listeners: List[Callable[[int, int, int], None]] = []
+        self.aggregates: Dict[str, int] = {}; self.aggregate_of: List[List[str]] = [[] for _ in ITEM_NAMES]
+        self._snapshot: Dict[str, int] = {}; self._snapshot_version = -1
+        for name, item_ids in (aggregates or {}).items():
+            self.aggregates[name] = 0
+            for item_id in item_ids: self.aggregate_of[item_id].append(name)
+        super().__init__(items)
+    def _set(self, item_id: int, amount: int):
+        old = self.counts[item_id]
+        if old == amount: return
+        self.counts[item_id] = amount; self.version += 1
+        for name in self.aggregate_of[item_id]: self.aggregates[name] += amount - old
+        for listener in self.listeners: listener(item_id, old, amount)
+    def subscribe(self, listener: Callable[[int, int, int], None]): self.listeners.append(listener)
+    def unsubscribe(self, listener: Callable[[int, int, int], None]):
+        if listener in self.listeners: self.listeners.remove(listener)
+    def aggregate(self, name: str) -> int: return self.aggregates[name]
+    def can_afford(self, consume) -> bool: return all(self.counts[item_id] >= amount for item_id, amount in consume)
+    def transact(self, consume=(), produce=()) -> bool:
+        """Atomically consumes (item_id, amount) pairs and then produces others; does nothing if any input is short."""
+        if not self.can_afford(consume): return False
+        for item_id, amount in consume: self._set(item_id, self.counts[item_id] - amount)
+        for item_id, amount in produce: self._set(item_id, self.counts[item_id] + amount)
+        return True
+    def snapshot(self) -> Dict[str, int]:
+        """A dict of the non-zero counts, rebuilt only when the ledger has changed since the last call."""
+        if self._snapshot_version != self.version: self._snapshot = dict(self); self._snapshot_version = self.version
+        return self._snapshot
+
+RNG_STREAMS = ("terrain", "spawns", "placement", "agents", "animals", "production", "paths")
+
+class CountingRandom(random.Random):
+    """A random.Random that counts the 32-bit Mersenne Twister words it has consumed since seeding. Two generators
+    seeded alike are in the same state exactly when their counts match, which is far cheaper to compare than
+    getstate(). Every method bottoms out in random() or getrandbits(), so the sequence itself is unchanged."""
+    def __init__(self, x=None): self.words = 0; super().__init__(x)
+    def seed(self, *args, **kwargs): super().seed(*args, **kwargs); self.words = 0
+    def random(self) -> float: self.words += 2; return super().random()
+    def getrandbits(self, k: int) -> int: self.words += (k + 31) // 32; return super().getrandbits(k)
+    def getstate(self): return super().getstate(), self.words
+    def setstate(self, state): super().setstate(state[0]); self.words = state[1]
+
+class RandomStreams:
+    """One random.Random per simulation subsystem (see RNG_STREAMS), each seeded from the world seed and its name.
+
+    Subsystems never share a generator, so a change in how often one of them draws leaves every other stream
+    untouched, and a divergence between two runs shows up in the stream of the subsystem that caused it.
+    """
+    __slots__ = RNG_STREAMS
+    def __init__(self, seed: Optional[int] = None): self.seed(seed)
+    def seed(self, seed: Optional[int] = None):
+        """Reseeds every stream. Without a seed, one is drawn from the global `random`, so random.seed(n) before
+        creating a World still reproduces the run."""
+        if seed is None: seed = random.getrandbits(64)
+        for name in RNG_STREAMS: setattr(self, name, CountingRandom(f"{seed}:{name}"))
+    def getstate(self) -> Dict[str, tuple]: return {name: getattr(self, name).getstate() for name in RNG_STREAMS}
+    def setstate(self, state: Dict[str, tuple]):
+        for name in RNG_STREAMS: getattr(self, name).setstate(state[name])
+
 class SpatialHash:
-    def __init__(self, cell_size): self.cell_size=cell_size; self.grid=defaultdict(set)
+    """Objects bucketed by cell. Buckets are insertion-ordered dicts (obj -> None), so every query visits objects in
+    an order that depends only on the simulation's history, never on object addresses."""
+    def __init__(self, cell_size):
+        self.cell_size=cell_size; self.grid=defaultdict(dict)
+        self.members: Dict[type, Dict[object, None]] = {} # knn_batch category -> its objects, kept by add/remove
+        self.packed: Dict[type, tuple] = {} # knn_batch category -> packed arrays, dropped when a member changes
     def _get_cell_coords(self, pos: Point): return (pos.x // self.cell_size, pos.y // self.cell_size)
-    def add(self, obj): self.grid[self._get_cell_coords(obj.pos)].add(obj)
-    def remove(self, obj):
-        cell = self._get_cell_coords(obj.pos)
-        if obj in self.grid[cell]: self.grid[cell].remove(obj)
+    def add(self, obj): self.grid[self._get_cell_coords(obj.pos)][obj] = None; self._remember(obj)
+    def remove(self, obj) -> bool:
+        removed = self._discard(obj, self._get_cell_coords(obj.pos)); self._forget(obj); return removed
+
+    def _remember(self, obj):
+        for category, members in self.members.items():
+            if isinstance(obj, category): members[obj] = None; self.packed.pop(category, None)
+
+    def _forget(self, obj):
+        for category, members in self.members.items():
+            if obj in members: del members[obj]; self.packed.pop(category, None)
+
+    def _discard(self, obj, cell) -> bool:
+        """Removes obj from a cell, dropping the bucket once it is empty so the grid never accumulates dead cells."""
+        bucket = self.grid.get(cell)
+        if bucket is None or obj not in bucket: return False
+        del bucket[obj]
+        if not bucket: del self.grid[cell]
+        return True
     
-    def move(self, obj, old_pos: Point):
-        old_cell = self._get_cell_coords(old_pos)
-        if obj in self.grid[old_cell]: self.grid[old_cell].remove(obj)
-        new_cell = self._get_cell_coords(obj.pos); self.grid[new_cell].add(obj)
+    def move(self, obj, old_pos: Point) -> bool:
+        cs = self.cell_size; was_present = self._discard(obj, (old_pos.x // cs, old_pos.y // cs))
+        self.grid[(obj.x // cs, obj.y // cs)][obj] = None
+        if not was_present: self._remember(obj); return False
+        for category, members in self.members.items():
+            if obj in members: self.packed.pop(category, None)
+        return True
 
-    def get_at(self, pos: Point): return list(self.grid[self._get_cell_coords(pos)])
+    def compact(self) -> int:
+        """Drops empty buckets (e.g. left behind by direct grid access); returns how many were removed."""
+        empty = [cell for cell, bucket in self.grid.items() if not bucket]
+        for cell in empty: del self.grid[cell]
+        return len(empty)
+
+    def get_at(self, pos: Point): return [obj for obj in self.grid.get(self._get_cell_coords(pos), ()) if obj.x == pos.x and obj.y == pos.y]
     def query_radius(self, pos: Point, radius: int):
-        res = set()
+        res = {}
         x_min,y_min=(pos.x-radius)//self.cell_size,(pos.y-radius)//self.cell_size
         x_max,y_max=(pos.x+radius)//self.cell_size,(pos.y+radius)//self.cell_size
         for x in range(x_min, x_max + 1):
-            for y in range(y_min, y_max + 1): res.update(self.grid.get((x, y), set()))
+            for y in range(y_min, y_max + 1): res.update(self.grid.get((x, y), ()))
         return list(res)
     def get_all(self): return [obj for cell in self.grid.values() for obj in cell]
 
-def a_star_search(world, start, end):
-    # --- MODIFIED: The check for a valid destination now ALSO ignores agents. This is the fix.
-    if not world.is_passable(end, ignore_agents=True):
-        accessible_end = world.find_adjacent_empty(end)
-        if not accessible_end: 
-            logging.debug(f"A* Search: Cannot find any accessible adjacent tile to {end}")
-            return None 
-        end = accessible_end
-        
-    neighbors = [(0,1),(0,-1),(1,0),(-1,0),(1,1),(1,-1),(-1,1),(-1,-1)]
-    close_set=set(); came_from={}; gscore={start: 0}; fscore={start:heuristic(start,end)}
-    oheap=[(fscore[start], start)]
-    while oheap:
-        current = heapq.heappop(oheap)[1]
-        if current == end:
-            path=[]
-            while current in came_from: path.append(current); current=came_from[current]
-            return path[::-1]
-        close_set.add(current)
-        for i,j in neighbors:
-            neighbor = Point(current.x+i, current.y+j)
-            if not (0 <= neighbor.x < world.width and 0 <= neighbor.y < world.height): continue
-            if not world.is_passable(neighbor, ignore_agents=True) and neighbor != end: continue
-            tentative_g_score = gscore[current] + 1
-            if tentative_g_score < gscore.get(neighbor, float('inf')):
-                came_from[neighbor] = current; gscore[neighbor] = tentative_g_score
-                fscore[neighbor] = tentative_g_score + heuristic(neighbor, end)
-                if neighbor not in [item[1] for item in oheap]: heapq.heappush(oheap, (fscore[neighbor], neighbor))
-    return None
\ No newline at end of file
+    def _pack(self, category) -> tuple:
+        """category's objects as cell-grouped coordinate arrays plus each cell's span in them. Built from the
+        members index on the first query after one of them was added, removed or moved, and reused until then."""
+        packed = self.packed.get(category)
+        if packed is not None: return packed
+        members = self.members.get(category)
+        if members is None: members = self.members[category] = {obj: None for obj in self.get_all() if isinstance(obj, category)}
+        cs = self.cell_size; xs = array('i'); ys = array('i'); objs: List = []; spans: Dict[tuple, tuple] = {}
+        for obj in sorted(members, key=lambda o: (o.x // cs, o.y // cs)): # Stable, so ties keep insertion order
+            cell = (obj.x // cs, obj.y // cs); span = spans.get(cell)
+            spans[cell] = (span[0] if span else len(objs), len(objs) + 1)
+            objs.append(obj); xs.append(obj.x); ys.append(obj.y)
+        packed = self.packed[category] = (xs, ys, objs, spans)
+        return packed
+
+    def knn_batch(self, points: List[Point], category, k: int = 1, predicate: Optional[Callable] = None,
+                  max_radius: Optional[int] = None) -> List[List]:
+        """Returns, for each point, up to k nearest (Manhattan) objects that are instances of category.
+
+        With max_radius, only the cells query_radius(point, max_radius) would visit are searched, as in
+        World.find_nearest. Each query walks rings of cells outward over the packed arrays (see _pack), computing
+        distances a whole cell at a time, and only runs `predicate` on candidates in distance order, stopping as
+        soon as no unvisited cell can hold anything closer than the k-th match.
+        """
+        cs = self.cell_size; xs, ys, objs, spans = self._pack(category)
+        if not spans: return [[] for _ in points]
+        min_cx = min(c[0] for c in spans); max_cx = max(c[0] for c in spans)
+        min_cy = min(c[1] for c in spans); max_cy = max(c[1] for c in spans)
+        results = []
+        for p in points:
+            px, py = p.x, p.y; cx, cy = px // cs, py // cs
+            x0, y0, x1, y1 = min_cx, min_cy, max_cx, max_cy
+            if max_radius is not None:
+                x0 = max(x0, (px - max_radius) // cs); y0 = max(y0, (py - max_radius) // cs)
+                x1 = min(x1, (px + max_radius) // cs); y1 = min(y1, (py + max_radius) // cs)
+            last_ring = max(cx - x0, x1 - cx, cy - y0, y1 - cy)
+            found: List = []; pending: List[tuple] = []; r = 0
+            while len(found) < k:
+                if r <= last_ring:
+                    for cell in _ring_cells(cx, cy, r):
+                        span = spans.get(cell)
+                        if not span or not (x0 <= cell[0] <= x1 and y0 <= cell[1] <= y1): continue
+                        s, e = span
+                        for i, d in zip(range(s, e), [abs(x - px) + abs(y - py) for x, y in zip(xs[s:e], ys[s:e])]):
+                            heapq.heappush(pending, (d, i))
+                # Anything outside the visited square of cells is at least this far away.
+                bound = min(px - (cx - r) * cs + 1, (cx + r + 1) * cs - px, py - (cy - r) * cs + 1, (cy + r + 1) * cs - py)
+                if r >= last_ring: bound = math.inf
+                while pending and pending[0][0] <= bound and len(found) < k:
+                    obj = objs[heapq.heappop(pending)[1]]
+                    if predicate is None or predicate(obj): found.append(obj)
+                if bound == math.inf: break
+                r += 1
+            results.append(found)
+        return results
+
+def _ring_cells(cx: int, cy: int, r: int):
+    if r == 0: yield (cx, cy); return
+    for x in range(cx - r, cx + r + 1): yield (x, cy - r); yield (x, cy + r)
+    for y in range(cy - r + 1, cy + r): yield (cx - r, y); yield (cx + r, y)
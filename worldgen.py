@@ -0,0 +1,149 @@
+"""On-disk cache of generated worlds, keyed by seed, size, the generator's source and the config it reads.
+
+A cache file is the magic b'CIVWGEN1', a header (32-byte key digest, u32 width, u32 height, u32 layout length),
+then width * height u8 terrain codes, u8 near-water flags and little-endian i32 water distances in row-major
+order, then the initial layout as UTF-8 JSON: the objects in spawn order as constructor arguments (see LAYOUT),
+the global inventory counts, the next agent ID and the state of the world's random streams after generation.
+Nothing in a file is executed on load, so a tampered cache can at worst fail to decode. Files are read through mmap.
+"""
+import hashlib
+import inspect
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+from array import array
+from typing import List, Optional
+
+import config
+import objects
+import placement
+import utils
+from simulation import World, WorldObserver
+from objects import Agent, Resource, Deer, Wolf
+from utils import AgentRole, Gender, Point, ResourceType, TerrainType
+
+MAGIC = b'CIVWGEN2'
+HEADER = struct.Struct('<32sIII')
+TERRAIN = list(TerrainType); TERRAIN_CODES = {t: i for i, t in enumerate(TERRAIN)}
+GENERATOR = (World.initialize_world, World.index_terrain, World._generate_terrain, World._calculate_water_distance_map,
+             World.spawn_agent, World.spawn_resource, World.spawn_resource_near, World.spawn_animal, World.find_empty_spot_near,
+             World.count_objects, placement, objects.WorldObject, objects.Agent.__init__, objects.Resource.__init__,
+             objects.Deer.__init__, objects.Wolf.__init__, utils.Inventory.__init__, utils.RandomStreams, utils.CountingRandom, sys.modules[__name__]) # Everything a cached world depends on
+
+# Freshly spawned objects of each type a generated world holds, as [type name, x, y, constructor arguments...]
+LAYOUT = {Agent: lambda o: [o.agent_id, o.role.name, o.gender.name, o.age], Resource: lambda o: [o.resource_type.name],
+          Deer: lambda o: [], Wolf: lambda o: []}
+LAYOUT_TYPES = {cls.__name__: cls for cls in LAYOUT}
+
+_fingerprint: Optional[str] = None
+
+def fingerprint() -> str:
+    """Digest of the generator's source and of every config constant it mentions; any edit to either busts the cache."""
+    global _fingerprint
+    if _fingerprint is None:
+        source = "\n".join(inspect.getsource(part) for part in GENERATOR)
+        names = sorted(set(re.findall(r'\b[A-Z][A-Z0-9_]+\b', source)) & set(vars(config)))
+        settings = repr([(name, getattr(config, name)) for name in names] + [sys.version_info[:2]])
+        _fingerprint = hashlib.sha256((source + settings).encode()).hexdigest()
+    return _fingerprint
+
+def _encode(obj) -> list:
+    encode = LAYOUT.get(type(obj))
+    if encode is None: raise TypeError(f"{type(obj).__name__} cannot be stored in a world cache")
+    return [type(obj).__name__, obj.x, obj.y] + encode(obj)
+
+def _decode(row: list):
+    name, x, y, *args = row; pos = Point(x, y)
+    if name == "Agent": agent_id, role, gender, age = args; return Agent(pos, agent_id, AgentRole[role], Gender[gender], start_age=age)
+    if name == "Resource": return Resource(pos, ResourceType[args[0]])
+    return LAYOUT_TYPES[name](pos)
+
+def _le(column: array) -> array:
+    if sys.byteorder != 'little': column.byteswap()
+    return column
+
+class _Spawns(WorldObserver):
+    """Records the objects generation adds, in order, so a load replays them exactly."""
+    def __init__(self): self.objects: List = []
+    def on_add(self, obj): self.objects.append(obj)
+    def on_remove(self, obj): self.objects.remove(obj)
+
+class WorldgenCache:
+    """Initializes worlds from `directory`, generating and storing them on a miss.
+
+    A hit skips terrain generation, the water distance flood fill, the near-water scan and every spawn
+    placement; what is left is decoding the arrays and adding the stored objects. The world continues exactly
+    as a freshly generated one would, including its random streams. Writes go through a temporary file and a
+    rename, so concurrent sweeps sharing a directory never see a partial file.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory; self.hits = self.misses = 0
+
+    def path_for(self, seed: int, width: int, height: int) -> str:
+        return os.path.join(self.directory, f"{seed}-{width}x{height}-{self.key(seed, width, height)[:16]}.wgen")
+
+    @staticmethod
+    def key(seed: int, width: int, height: int) -> str:
+        return hashlib.sha256(f"{fingerprint()}:{seed}:{width}:{height}".encode()).hexdigest()
+
+    def initialize(self, world: World, seed: int) -> bool:
+        """Seeds world.rng and initializes world from the cache or by generating it; returns whether it was a hit."""
+        world.rng.seed(seed); path = self.path_for(seed, world.width, world.height)
+        cached = self._read(path, seed, world.width, world.height) if os.path.exists(path) else None
+        if cached is not None:
+            self._apply(world, *cached); self.hits += 1
+            logging.info(f"Loaded world {seed} ({world.width}x{world.height}) from {path}.")
+            return True
+        spawns = _Spawns(); world.add_observer(spawns)
+        try: world.initialize_world()
+        finally: world.remove_observer(spawns)
+        world.placement.anchors.clear() # Rebuilt lazily, as after a load, so both continue identically
+        self._write(path, world, seed, spawns.objects); self.misses += 1
+        return False
+
+    def _read(self, path: str, seed: int, width: int, height: int) -> Optional[tuple]:
+        """Decodes a cache file completely before anything touches the world; None if it is stale or unreadable."""
+        try:
+            with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if mm[:len(MAGIC)] != MAGIC: return None
+                digest, w, h, layout = HEADER.unpack_from(mm, len(MAGIC))
+                if digest != bytes.fromhex(self.key(seed, width, height)) or (w, h) != (width, height): return None
+                n = w * h; offset = len(MAGIC) + HEADER.size
+                codes = mm[offset:offset + n]; flags = mm[offset + n:offset + 2 * n]
+                distances = array('i'); distances.frombytes(mm[offset + 2 * n:offset + 6 * n]); _le(distances)
+                state = json.loads(mm[offset + 6 * n:offset + 6 * n + layout].decode())
+            spawned = [_decode(row) for row in state["objects"]]
+            rng = {name: ((version, tuple(internal), gauss), words) for name, ((version, internal, gauss), words) in state["rng"].items()}
+        except (OSError, ValueError, struct.error, KeyError, TypeError) as e:
+            logging.warning(f"Ignoring unreadable world cache {path}: {e}"); return None
+        terrain = [list(map(TERRAIN.__getitem__, codes[y * w:(y + 1) * w])) for y in range(h)]
+        water = [distances[y * w:(y + 1) * w].tolist() for y in range(h)]
+        near_water = set(); start = flags.find(1)
+        while start != -1: near_water.add((start % w, start // w)); start = flags.find(1, start + 1)
+        return terrain, water, near_water, spawned, state["inventory"], state["next_agent_id"], rng
+
+    def _apply(self, world: World, terrain, water, near_water, spawned, inventory, next_agent_id, rng):
+        world.terrain = terrain; world.water_distance_map = water; world.index_terrain(near_water)
+        for item_id, count in enumerate(inventory):
+            if count: world.global_inventory.add(item_id, count)
+        for obj in spawned: world.add_object(obj)
+        world.next_agent_id = next_agent_id; world.rng.setstate(rng)
+
+    def _write(self, path: str, world: World, seed: int, spawned: List):
+        w, h = world.width, world.height
+        codes = bytes(TERRAIN_CODES[t] for row in world.terrain for t in row)
+        flags = bytearray(w * h)
+        for x, y in world.placement.near_water: flags[y * w + x] = 1
+        distances = _le(array('i', (d for row in world.water_distance_map for d in row)))
+        layout = json.dumps({"objects": [_encode(obj) for obj in spawned], "inventory": list(world.global_inventory.counts),
+                             "next_agent_id": world.next_agent_id, "rng": world.rng.getstate()}, separators=(',', ':')).encode()
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC + HEADER.pack(bytes.fromhex(self.key(seed, w, h)), w, h, len(layout)) + codes + flags + distances.tobytes() + layout)
+        os.replace(tmp, path)
@@ -0,0 +1,51 @@
+"""Many independent Worlds in one process over one read-only terrain: see SharedTerrain, make_worlds and step_all."""
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from simulation import World
+from utils import TerrainType
+
+class SharedTerrain:
+    """Terrain and the maps derived from it, generated once and read by any number of Worlds without copying.
+
+    Rows are tuples, so no world can write through them by accident: a world that lays a road copies only that
+    row (World.set_terrain). What each world keeps for itself is its road rows, its occupancy and placement index,
+    and its objects. Forked workers share the buffers too when this is built before forking and gc.freeze() is
+    called, so the children's garbage collector never touches their pages.
+    """
+    def __init__(self, width: int, height: int, terrain: Tuple[Tuple[TerrainType, ...], ...],
+                 water_distance_map: Tuple[Tuple[int, ...], ...], near_water: frozenset):
+        self.width, self.height = width, height
+        self.terrain = terrain; self.water_distance_map = water_distance_map; self.near_water = near_water
+
+    @classmethod
+    def from_world(cls, world: World) -> 'SharedTerrain':
+        """Freezes a copy of world's current terrain and derived maps."""
+        return cls(world.width, world.height, tuple(map(tuple, world.terrain)), tuple(map(tuple, world.water_distance_map)),
+                   frozenset(world.placement.near_water))
+
+    @classmethod
+    def generate(cls, width: int, height: int, seed: Optional[int] = None) -> 'SharedTerrain':
+        """Runs only the terrain half of World.initialize_world on a world seeded with seed."""
+        world = World(width, height, async_pathfinding=False, seed=seed)
+        world._generate_terrain(); world._calculate_water_distance_map(); world.placement.rebuild()
+        return cls.from_world(world)
+
+    def attach(self, world: World):
+        if (world.width, world.height) != (self.width, self.height):
+            raise ValueError(f"terrain is {self.width}x{self.height}, world is {world.width}x{world.height}")
+        world.terrain = list(self.terrain); world.water_distance_map = self.water_distance_map
+        world.index_terrain(self.near_water)
+
+def make_worlds(terrain: SharedTerrain, seeds: Iterable[int], **options) -> List[World]:
+    """One World per seed on the shared terrain, each populated and stepped from its own seeded random streams.
+    Keyword options are passed to World."""
+    worlds = []
+    for seed in seeds:
+        world = World(terrain.width, terrain.height, seed=seed, **options); world.initialize_world(terrain); worlds.append(world)
+    return worlds
+
+def step_all(worlds: Sequence[World], n: int = 1):
+    """Advances every world n ticks, interleaved one tick at a time. Worlds draw only from their own random
+    streams (World.rng), so sharing a process never changes one colony's outcome."""
+    for _ in range(n):
+        for world in worlds: world.update()